@@ -14,6 +14,24 @@ a = Analysis(
     datas=[
         ('.venv/Lib/site-packages/escpos/capabilities.json', 'escpos'),
         ('data_base/database.py', 'data_base'),
+        ('data_base/connection_manager.py', 'data_base'),
+        ('data_base/migrations.py', 'data_base'),
+        ('data_base/rollups.py', 'data_base'),
+        ('data_base/bill_writer.py', 'data_base'),
+        ('data_base/catalog_cache.py', 'data_base'),
+        ('data_base/settings_store.py', 'data_base'),
+        ('data_base/csv_import.py', 'data_base'),
+        ('data_base/money.py', 'data_base'),
+        ('data_base/archive.py', 'data_base'),
+        ('data_base/backup.py', 'data_base'),
+        ('data_base/customers.py', 'data_base'),
+        ('data_base/query_stats.py', 'data_base'),
+        ('data_base/maintenance.py', 'data_base'),
+        ('data_base/sync.py', 'data_base'),
+        ('data_base/sync_server.py', 'data_base'),
+        ('data_base/sync_client.py', 'data_base'),
+        ('data_base/change_log.py', 'data_base'),
+        ('data_base/stock.py', 'data_base'),
         # Do NOT include billing.db here!
         ('data_base/images/ImageNotFound.png', 'data_base/images'),
     ],
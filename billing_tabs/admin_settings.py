@@ -1,10 +1,11 @@
 import sys
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QLineEdit, QCheckBox, QMessageBox,
-                             QFrame, QSizePolicy, QDialog, QFormLayout, QGroupBox)
+                             QFrame, QSizePolicy, QDialog, QFormLayout, QGroupBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QTextEdit)
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QFont
-from data_base.database import Database
+from data_base.database import get_database
 import random
 import smtplib
 from email.mime.text import MIMEText
@@ -314,13 +315,15 @@ class EditDetailsDialog(QDialog):
 class AdminSettingsWindow(QMainWindow):
     # Signal emitted when shop details are updated
     shop_details_updated = pyqtSignal()
+    # Signal emitted after any admin detail or app setting is saved
+    settings_changed = pyqtSignal()
     
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Admin Settings")
         self.resize(600, 500)
         
-        self.db = Database()
+        self.db = get_database()
         self.admin_details = self.db.get_admin_details()
         self.init_ui()
         self.load_admin_details()
@@ -560,6 +563,76 @@ class AdminSettingsWindow(QMainWindow):
         
         main_layout.addWidget(printer_group)
         
+        # Diagnostics Group
+        diagnostics_group = QGroupBox("Diagnostics")
+        diagnostics_group.setFont(QFont("Poppins", 14, QFont.Bold))
+        diagnostics_group.setStyleSheet("""
+            QGroupBox {
+                font-weight: bold;
+                border: 2px solid #bdc3c7;
+                border-radius: 10px;
+                margin-top: 10px;
+                padding-top: 10px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 5px 0 5px;
+            }
+        """)
+        
+        diagnostics_layout = QVBoxLayout()
+        diagnostics_group.setLayout(diagnostics_layout)
+        
+        self.query_timing_check = QCheckBox("Record database query timings")
+        self.query_timing_check.setFont(QFont("Poppins", 11))
+        self.query_timing_check.setChecked(self.db.query_stats.enabled)
+        self.query_timing_check.toggled.connect(self.toggle_query_timing)
+        diagnostics_layout.addWidget(self.query_timing_check)
+        
+        # Top offenders by total time spent
+        self.query_stats_table = QTableWidget(0, 6)
+        self.query_stats_table.setHorizontalHeaderLabels(["Call / Statement", "Calls", "Avg ms", "p95 ms", "Max ms", "Total ms"])
+        self.query_stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.query_stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.query_stats_table.setFont(QFont("Poppins", 10))
+        self.query_stats_table.setFixedHeight(200)
+        diagnostics_layout.addWidget(self.query_stats_table)
+        
+        diagnostics_layout.addWidget(QLabel("Slow statements:"))
+        self.slow_log_view = QTextEdit()
+        self.slow_log_view.setReadOnly(True)
+        self.slow_log_view.setFont(QFont("Consolas", 9))
+        self.slow_log_view.setFixedHeight(120)
+        diagnostics_layout.addWidget(self.slow_log_view)
+        
+        diagnostics_buttons_layout = QHBoxLayout()
+        refresh_stats_btn = QPushButton("Refresh")
+        refresh_stats_btn.clicked.connect(self.refresh_diagnostics)
+        diagnostics_buttons_layout.addWidget(refresh_stats_btn)
+        reset_stats_btn = QPushButton("Reset")
+        reset_stats_btn.clicked.connect(self.reset_diagnostics)
+        diagnostics_buttons_layout.addWidget(reset_stats_btn)
+        diagnostics_layout.addLayout(diagnostics_buttons_layout)
+        
+        # Last idle-time maintenance run
+        diagnostics_layout.addWidget(QLabel("Database maintenance:"))
+        self.maintenance_view = QTextEdit()
+        self.maintenance_view.setReadOnly(True)
+        self.maintenance_view.setFont(QFont("Consolas", 9))
+        self.maintenance_view.setFixedHeight(90)
+        diagnostics_layout.addWidget(self.maintenance_view)
+        
+        self.run_maintenance_btn = QPushButton("Run Maintenance Now")
+        self.run_maintenance_btn.clicked.connect(self.run_maintenance)
+        diagnostics_layout.addWidget(self.run_maintenance_btn)
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self.refresh_maintenance)
+        
+        main_layout.addWidget(diagnostics_group)
+        self.refresh_diagnostics()
+        self.refresh_maintenance()
+        
         # Add stretch to push everything to top
         main_layout.addStretch()
         
@@ -584,10 +657,12 @@ class AdminSettingsWindow(QMainWindow):
                 use_credentials=self.admin_details['use_credentials'],
                 username=self.admin_details['username'],
                 password=dialog.new_password,
-                location=self.admin_details['location']
+                location=self.admin_details['location'],
+                gmail=self.admin_details.get('gmail', '')
             )
             if success:
                 self.admin_details = db.get_admin_details()
+                self.settings_changed.emit()
                 QMessageBox.information(self, "Success", "Password changed successfully!")
             else:
                 QMessageBox.critical(self, "Error", "Failed to update password.")
@@ -631,6 +706,7 @@ class AdminSettingsWindow(QMainWindow):
                         self.load_admin_details()
                         # Emit signal to notify other components
                         self.shop_details_updated.emit()
+                        self.settings_changed.emit()
                         QMessageBox.information(self, "Success", "Shop details updated successfully!")
                     else:
                         QMessageBox.critical(self, "Error", "Failed to update shop details.")
@@ -658,10 +734,12 @@ class AdminSettingsWindow(QMainWindow):
                     use_credentials=new_state,                            # use_credentials (boolean)
                     username=self.admin_details['username'],        # username (string)
                     password=self.admin_details['password'],        # password (string)
-                    location=self.admin_details['location']        # location (string)
+                    location=self.admin_details['location'],        # location (string)
+                    gmail=self.admin_details.get('gmail', '')
                 )
                 if success:
                     self.admin_details['use_credentials'] = new_state
+                    self.settings_changed.emit()
                     self.update_cred_toggle_btn()
                     QMessageBox.information(self, 'Success', f'Credentials requirement {"enabled" if new_state else "disabled"}!')
                 else:
@@ -683,12 +761,73 @@ class AdminSettingsWindow(QMainWindow):
                     "112mm": "112mm - Wide format (48 characters)"
                 }
                 self.paper_width_desc.setText(descriptions.get(width, "Unknown width"))
+                self.settings_changed.emit()
                 QMessageBox.information(self, "Success", f"Paper width changed to {width}")
             else:
                 QMessageBox.warning(self, "Error", "Failed to change paper width")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error changing paper width: {str(e)}")
     
+    def toggle_query_timing(self, enabled):
+        """Turn database query timing on or off"""
+        if not self.db.set_query_timing(enabled):
+            QMessageBox.warning(self, "Error", "Failed to save the query timing setting.")
+        self.refresh_diagnostics()
+    
+    def refresh_diagnostics(self):
+        """Show the slowest calls and statements recorded so far"""
+        stats = self.db.query_stats
+        rows = stats.top(limit=15)
+        self.query_stats_table.setRowCount(len(rows))
+        for row_idx, row in enumerate(rows):
+            name = row['name'] if row['kind'] == 'method' else f"SQL: {row['name']}"
+            values = [name, str(row['calls']), f"{row['avg_ms']:.1f}",
+                      f"{row['p95_ms']:g}" if row['p95_ms'] != float('inf') else "> 1000",
+                      f"{row['max_ms']:.1f}", f"{row['total_ms']:.1f}"]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setToolTip(row['name'])
+                self.query_stats_table.setItem(row_idx, col, item)
+        
+        lines = []
+        for entry in stats.slow_log()[:20]:
+            lines.append(f"[{entry['at']}] {entry['ms']:.1f} ms  {entry['sql'].strip()}")
+            lines.extend(f"    {step}" for step in entry['plan'])
+        if not stats.enabled and not rows:
+            lines.append("Query timing is off. Tick the box above to start recording.")
+        self.slow_log_view.setPlainText("\n".join(lines))
+    
+    def reset_diagnostics(self):
+        """Clear recorded query timings"""
+        self.db.query_stats.reset()
+        self.refresh_diagnostics()
+    
+    def refresh_maintenance(self):
+        """Show the last maintenance report and whether a run is in progress"""
+        running = self.db.maintenance_scheduler.running
+        report = self.db.last_maintenance()
+        lines = ["Maintenance is running..."] if running else []
+        if report is None:
+            lines.append("Maintenance has not run yet. It runs once a day when billing has been idle.")
+        else:
+            lines.append(f"Last run finished {report['finished_at']}")
+            for result in report['results']:
+                status = "OK" if result['ok'] else "FAILED"
+                lines.append(f"  {result['step']}: {status} - {result['detail']} ({result['ms']:.0f} ms)")
+        self.maintenance_view.setPlainText("\n".join(lines))
+        self.run_maintenance_btn.setEnabled(not running)
+        if not running:
+            self.maintenance_timer.stop()
+    
+    def run_maintenance(self):
+        """Start a maintenance run on the scheduler thread and poll for its result"""
+        self.db.maintenance_scheduler.run_now()
+        self.run_maintenance_btn.setEnabled(False)
+        self.maintenance_view.setPlainText("Maintenance is running...")
+        # Poll until the scheduler thread has picked the run up and finished it
+        QTimer.singleShot(1000, lambda: self.maintenance_timer.start(1000))
+    
     def test_print(self):
         """Print a test page"""
         try:
@@ -881,7 +1020,7 @@ class ForgotPasswordDialog(QDialog):
         title_label.setFont(QFont("Poppins", 16, QFont.Bold))
         title_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(title_label)
-        db = Database()
+        db = get_database()
         admin_details = db.get_admin_details()
         self.email = admin_details.get('gmail', '')
         self.masked_email = self.mask_email(self.email)
@@ -1068,7 +1207,7 @@ class NewPasswordDialog(QDialog):
             self.status_label.setText("Passwords do not match.")
             return
         # Update password in DB
-        db = Database()
+        db = get_database()
         admin_details = db.get_admin_details()
         success = db.update_admin_details(
             shop_name=admin_details['shop_name'],
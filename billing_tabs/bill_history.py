@@ -7,12 +7,86 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QHeaderView, QAbstractItemView, QComboBox,
                              QDateEdit, QGroupBox, QRadioButton, QSizePolicy,
                              QApplication)
-from PyQt5.QtCore import Qt, QDate, QEvent
+from PyQt5.QtCore import Qt, QDate, QEvent, QThread, pyqtSignal
 from PyQt5.QtGui import QFont
-from data_base.database import Database
+from data_base.database import get_database
 from billing_tabs.thermal_printer import ThermalPrinter
 
+class BillQueryThread(QThread):
+    """Thread running one bill query on a read-only reporting connection"""
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, query, *args):
+        super().__init__()
+        self.query = query
+        self.args = args
+    
+    def run(self):
+        try:
+            with get_database().reporting():
+                result = self.query(*self.args)
+            self.loaded.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class BillExportThread(QThread):
+    """Thread writing (bill, items) pairs to CSV from a read-only reporting connection"""
+    # Not named finished: start_worker() releases the thread on QThread.finished
+    export_done = pyqtSignal(bool, str)
+    
+    def __init__(self, source, file_path):
+        super().__init__()
+        # source() returns the (bill, items) iterable; it is called on this thread
+        self.source = source
+        self.file_path = file_path
+    
+    def run(self):
+        try:
+            with get_database().reporting():
+                self._write_csv(self.source())
+            self.export_done.emit(True, f"Bills exported successfully to:\n{self.file_path}")
+        except Exception as e:
+            self.export_done.emit(False, f"Failed to export bills: {str(e)}")
+    
+    def _write_csv(self, bills):
+        with open(self.file_path, 'w', newline='', encoding='utf-8') as csvfile:
+            fieldnames = [
+                'Bill ID', 'Customer Name', 'Mobile Number', 'Date', 'Time', 
+                'Total Items', 'Items', 'Total Amount'
+            ]
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            
+            writer.writeheader()
+            
+            for bill, items in bills:
+                # Format date and time separately
+                try:
+                    date_time = datetime.strptime(bill['created_at'], '%Y-%m-%d %H:%M')
+                    date_str = date_time.strftime('%d/%m/%Y')
+                    time_str = date_time.strftime('%H:%M')
+                except:
+                    date_str = bill['created_at']
+                    time_str = "N/A"
+                
+                # Get all item names separated by comma
+                item_names = ", ".join([item['name'] for item in items])
+                
+                writer.writerow({
+                    'Bill ID': bill['id'],
+                    'Customer Name': bill['customer_name'],
+                    'Mobile Number': bill['customer_phone'] or 'N/A',
+                    'Date': date_str,
+                    'Time': time_str,
+                    'Total Items': bill['total_items'],
+                    'Items': item_names,
+                    'Total Amount': bill['total_amount']
+                })
+
 class BillHistoryWindow(QMainWindow):
+    # Bills fetched per page while scrolling the unfiltered history
+    PAGE_SIZE = 200
+    
     def __init__(self, printer_instance=None):
         super().__init__()
         self.setWindowTitle("Bill History")
@@ -29,7 +103,9 @@ class BillHistoryWindow(QMainWindow):
         self.setMinimumSize(800, 600)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         
-        self.db = Database()
+        self.db = get_database()
+        # Worker threads still running (kept referenced until they finish)
+        self.worker_threads = []
         # Use provided printer instance or create new one
         self.thermal_printer = printer_instance if printer_instance else ThermalPrinter()
         
@@ -68,10 +144,10 @@ class BillHistoryWindow(QMainWindow):
         
         # Customer name search
         customer_layout = QHBoxLayout()
-        customer_layout.addWidget(QLabel("Search Customer:"))
+        customer_layout.addWidget(QLabel("Search Bills:"))
         self.search_input = QLineEdit()
         self.search_input.setFont(QFont("Arial", 12))
-        self.search_input.setPlaceholderText("Enter customer name...")
+        self.search_input.setPlaceholderText("Customer name, phone, bill no. or item...")
         self.search_input.textChanged.connect(self.search_bills)
         customer_layout.addWidget(self.search_input)
         search_layout.addLayout(customer_layout)
@@ -203,6 +279,9 @@ class BillHistoryWindow(QMainWindow):
         header.setSectionResizeMode(7, QHeaderView.Stretch)  # Actions (was ResizeToContents)
         header.setSectionResizeMode(8, QHeaderView.ResizeToContents)  # Reprint
         
+        # Fetch the next page of history when scrolled near the bottom
+        self.bills_table.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
+        
         main_layout.addWidget(self.bills_table)
         
         # Set main window style
@@ -230,21 +309,50 @@ class BillHistoryWindow(QMainWindow):
         
         # Store current bills for filtering
         self.current_bills = []
+        # Keyset pagination state for the unfiltered history
+        self.paging_active = False
+        self.has_more_bills = False
+        # (start_date, end_date) of the date filter shown, or None
+        self.date_filter = None
     
     def load_bills(self):
-        """Load all bills from database"""
+        """Load the first page of bills from database"""
         try:
-            bills = self.db.get_all_bills()
+            bills = self.db.get_bills_page(limit=self.PAGE_SIZE)
+            self.paging_active = True
+            self.has_more_bills = len(bills) == self.PAGE_SIZE
+            self.date_filter = None
             self.current_bills = bills
             self.display_bills(bills)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load bills: {str(e)}")
     
-    def display_bills(self, bills):
-        """Display bills in the table"""
-        self.bills_table.setRowCount(len(bills))
+    def load_next_page(self):
+        """Append the next page of bills after the last one shown"""
+        if not self.paging_active or not self.has_more_bills or not self.current_bills:
+            return
+        try:
+            last_bill = self.current_bills[-1]
+            bills = self.db.get_bills_page(last_bill['created_at'], last_bill['id'], self.PAGE_SIZE)
+            self.has_more_bills = len(bills) == self.PAGE_SIZE
+            self.current_bills.extend(bills)
+            self.display_bills(bills, append=True)
+        except Exception as e:
+            self.has_more_bills = False
+            QMessageBox.critical(self, "Error", f"Failed to load more bills: {str(e)}")
+    
+    def on_table_scrolled(self, value):
+        """Load more history when the table is scrolled close to the end"""
+        scroll_bar = self.bills_table.verticalScrollBar()
+        if value >= scroll_bar.maximum() - 5:
+            self.load_next_page()
+    
+    def display_bills(self, bills, append=False):
+        """Display bills in the table (optionally after the rows already shown)"""
+        start_row = self.bills_table.rowCount() if append else 0
+        self.bills_table.setRowCount(start_row + len(bills))
         
-        for row, bill in enumerate(bills):
+        for row, bill in enumerate(bills, start=start_row):
             # Bill ID
             self.bills_table.setItem(row, 0, QTableWidgetItem(str(bill['id'])))
             
@@ -324,12 +432,14 @@ class BillHistoryWindow(QMainWindow):
             self.bills_table.setCellWidget(row, 8, reprint_btn)
     
     def search_bills(self):
-        """Search bills by customer name"""
+        """Search bills by customer name, phone, bill number or item name"""
         search_text = self.search_input.text().strip()
         
         if search_text:
             try:
-                bills = self.db.search_bills(search_text)
+                bills = self.db.search_bills_fts(search_text, limit=500)
+                self.paging_active = False
+                self.date_filter = None
                 self.current_bills = bills
                 self.display_bills(bills)
             except Exception as e:
@@ -342,12 +452,22 @@ class BillHistoryWindow(QMainWindow):
         start_date = self.start_date.date().toString("yyyy-MM-dd")
         end_date = self.end_date.date().toString("yyyy-MM-dd")
         
-        try:
-            bills = self.db.get_bills_by_date_range(start_date, end_date)
-            self.current_bills = bills
-            self.display_bills(bills)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Date filter failed: {str(e)}")
+        # A long range runs on the reporting pool off the GUI thread
+        thread = BillQueryThread(self.db.get_bills_by_date_range, start_date, end_date)
+        thread.loaded.connect(lambda bills: self.show_filtered_bills(bills, (start_date, end_date)))
+        thread.failed.connect(lambda message: QMessageBox.critical(self, "Error", f"Date filter failed: {message}"))
+        self.start_worker(thread)
+    
+    def show_filtered_bills(self, bills, date_filter):
+        self.paging_active = False
+        self.date_filter = date_filter
+        self.current_bills = bills
+        self.display_bills(bills)
+    
+    def start_worker(self, thread):
+        thread.finished.connect(lambda: self.worker_threads.remove(thread))
+        self.worker_threads.append(thread)
+        thread.start()
     
     def view_bill_details(self, bill_id):
         """View detailed bill information"""
@@ -424,24 +544,36 @@ class BillHistoryWindow(QMainWindow):
     def export_all_to_csv(self):
         """Export all bills to CSV file"""
         try:
-            bills = self.db.get_all_bills()
-            self._export_bills_to_csv(bills, "all_bills")
+            if not self.db.get_bills_page(limit=1):
+                QMessageBox.warning(self, "No Data", "No bills to export!")
+                return
+            # Streamed with constant memory however long the history is
+            self._export_bills_to_csv(self.db.iter_bills_with_items, "all_bills")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to export all bills: {str(e)}")
     
     def export_filtered_to_csv(self):
         """Export currently filtered bills to CSV file"""
         try:
-            self._export_bills_to_csv(self.current_bills, "filtered_bills")
+            if not self.current_bills:
+                QMessageBox.warning(self, "No Data", "No bills to export!")
+                return
+            if self.paging_active:
+                # Only the first pages are loaded; the view holds every bill
+                source = self.db.iter_bills_with_items
+            elif self.date_filter is not None:
+                start_date, end_date = self.date_filter
+                source = lambda: self.db.iter_bills_with_items(start_date, end_date)
+            else:
+                # Search results are complete; their items are fetched in batches
+                bill_ids = [bill['id'] for bill in self.current_bills]
+                source = lambda: ((bill, bill['items']) for bill in self.db.get_bills_with_items(bill_ids))
+            self._export_bills_to_csv(source, "filtered_bills")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to export filtered bills: {str(e)}")
     
-    def _export_bills_to_csv(self, bills, filename_prefix):
-        """Export bills to CSV file"""
-        if not bills:
-            QMessageBox.warning(self, "No Data", "No bills to export!")
-            return
-        
+    def _export_bills_to_csv(self, source, filename_prefix):
+        """Export the (bill, items) pairs returned by source() to CSV file on a worker thread"""
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Export Bills to CSV", 
             f"{filename_prefix}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
@@ -451,43 +583,16 @@ class BillHistoryWindow(QMainWindow):
         if not file_path:
             return
         
-        with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = [
-                'Bill ID', 'Customer Name', 'Mobile Number', 'Date', 'Time', 
-                'Total Items', 'Items', 'Total Amount'
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            
-            for bill in bills:
-                # Get bill details
-                detailed_bill = self.db.get_bill_by_id(bill['id'])
-                
-                # Format date and time separately
-                try:
-                    date_time = datetime.strptime(bill['created_at'], '%Y-%m-%d %H:%M')
-                    date_str = date_time.strftime('%d/%m/%Y')
-                    time_str = date_time.strftime('%H:%M')
-                except:
-                    date_str = bill['created_at']
-                    time_str = "N/A"
-                
-                # Get all item names separated by comma
-                item_names = ", ".join([item['name'] for item in detailed_bill['items']])
-                
-                writer.writerow({
-                    'Bill ID': bill['id'],
-                    'Customer Name': bill['customer_name'],
-                    'Mobile Number': bill['customer_phone'] or 'N/A',
-                    'Date': date_str,
-                    'Time': time_str,
-                    'Total Items': bill['total_items'],
-                    'Items': item_names,
-                    'Total Amount': bill['total_amount']
-                })
-        
-        QMessageBox.information(self, "Success", f"Bills exported successfully to:\n{file_path}")
+        thread = BillExportThread(source, file_path)
+        thread.export_done.connect(self.on_export_finished)
+        self.start_worker(thread)
+    
+    def on_export_finished(self, success, message):
+        """Handle export completion"""
+        if success:
+            QMessageBox.information(self, "Success", message)
+        else:
+            QMessageBox.critical(self, "Error", message)
 
     def resizeEvent(self, event):
         """Handle window resize events"""
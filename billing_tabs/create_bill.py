@@ -7,7 +7,8 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QHeaderView, QToolButton, QCompleter, QApplication)
 from PyQt5.QtCore import Qt, QTimer, QEvent, QSize, QStringListModel
 from PyQt5.QtGui import QFont, QPixmap, QIcon, QImage
-from data_base.database import Database
+from data_base.database import get_database
+from data_base import money
 from billing_tabs.thermal_printer import ThermalPrinter
 from billing_tabs.whatsapp_dialog import WhatsAppDialog
 from PIL import Image, ImageDraw, ImageFont
@@ -19,7 +20,7 @@ import qrcode
 import random
 
 class CustomerInfoDialog(QDialog):
-    def __init__(self, customer_names=None, parent=None):
+    def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Customer Information")
         self.setModal(True)
@@ -27,8 +28,7 @@ class CustomerInfoDialog(QDialog):
         
         self.customer_name = ""
         self.customer_phone = ""
-        self.customer_names = customer_names or []
-        self.db = Database()
+        self.db = get_database()
         self._last_lookup_name = None
         self._last_lookup_phone = None
         
@@ -42,12 +42,12 @@ class CustomerInfoDialog(QDialog):
         self.name_input = QLineEdit()
         self.name_input.setFont(QFont("Poppins", 12))
         
-        # Setup autocomplete
-        if self.customer_names:
-            completer = QCompleter(self.customer_names)
-            completer.setCaseSensitivity(Qt.CaseInsensitive)
-            completer.setFilterMode(Qt.MatchContains)
-            self.name_input.setCompleter(completer)
+        # Setup autocomplete: the model is filled per keystroke from a prefix query
+        self.name_model = QStringListModel(self)
+        self.name_completer = QCompleter(self.name_model, self)
+        self.name_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.name_input.setCompleter(self.name_completer)
+        self.name_input.textEdited.connect(self.update_name_suggestions)
         
         layout.addWidget(self.name_input)
         
@@ -59,6 +59,7 @@ class CustomerInfoDialog(QDialog):
         layout.addWidget(QLabel("Customer Phone (Required):"))
         self.phone_input = QLineEdit()
         self.phone_input.setFont(QFont("Poppins", 12))
+        self.phone_input.editingFinished.connect(self.autofill_name_for_phone)
         layout.addWidget(self.phone_input)
         
         # Buttons
@@ -75,6 +76,25 @@ class CustomerInfoDialog(QDialog):
         layout.addLayout(button_layout)
         self.setLayout(layout)
     
+    def update_name_suggestions(self, text):
+        names = self.db.search_customer_names(text)
+        self.name_model.setStringList(names)
+        if names:
+            self.name_completer.complete()
+    
+    def autofill_name_for_phone(self):
+        # A returning customer can be found by phone when the name is left blank
+        if self.name_input.text().strip():
+            return
+        phone_digits = re.sub(r'\D', '', self.phone_input.text())
+        if len(phone_digits) == 10:
+            phone_digits = '91' + phone_digits
+        customer = self.db.get_customer_by_phone(f'+{phone_digits}')
+        if customer:
+            self.name_input.blockSignals(True)
+            self.name_input.setText(customer['name'])
+            self.name_input.blockSignals(False)
+    
     def autofill_phone_for_name(self):
         name = self.name_input.text().strip()
         if not name:
@@ -85,12 +105,7 @@ class CustomerInfoDialog(QDialog):
                 self.phone_input.setText(self._last_lookup_phone)
             return
         # Query the database for the most recent phone for this customer
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT customer_phone FROM bills WHERE customer_name = ? AND customer_phone IS NOT NULL AND customer_phone != "" ORDER BY id DESC LIMIT 1', (name,))
-        result = cursor.fetchone()
-        conn.close()
-        phone = result[0] if result and result[0] else ""
+        phone = self.db.get_last_phone_for_customer(name)
         self._last_lookup_name = name
         self._last_lookup_phone = phone
         if phone:
@@ -221,7 +236,7 @@ class LooseCategoryDialog(QDialog):
         self.setModal(True)
         self.resize(900, 600)
         
-        self.db = Database()
+        self.db = get_database()
         self.selected_item = None
         
         self.init_ui()
@@ -346,13 +361,14 @@ class CreateBillWindow(QMainWindow):
         self.setMinimumSize(800, 600)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         
-        self.db = Database()
+        self.db = get_database()
         # Use provided printer instance or create new one
         self.thermal_printer = printer_instance if printer_instance else ThermalPrinter()
         
         # Bill data
         self.bill_items = []
         self.total_amount = 0.0
+        self.total_amount_paise = 0
         self.total_items = 0
         self.total_weight = 0.0
         self.total_sgst = 0.0
@@ -433,6 +449,15 @@ class CreateBillWindow(QMainWindow):
         
         left_layout.addWidget(totals_frame)
         
+        # Bills queued for saving but not yet written to disk
+        self.pending_writes_label = QLabel("")
+        self.pending_writes_label.setFont(QFont("Poppins", 10))
+        self.pending_writes_label.setStyleSheet("color: #e67e22;")
+        left_layout.addWidget(self.pending_writes_label)
+        self.pending_writes_timer = QTimer(self)
+        self.pending_writes_timer.timeout.connect(self.update_pending_writes_label)
+        self.pending_writes_timer.start(1000)
+        
         # Finish button
         finish_btn = QPushButton("Finish & Print Bill")
         finish_btn.setFont(QFont("Poppins", 14, QFont.Bold))
@@ -513,6 +538,28 @@ class CreateBillWindow(QMainWindow):
             }
         """)
     
+    def update_pending_writes_label(self):
+        """Show how many finished bills are still waiting to be saved"""
+        writer = self.db.bill_writer
+        pending = writer.pending_count()
+        failed = writer.failed_count()
+        sync_client = self.db.sync_client
+        if pending == 0 and failed:
+            # Set-aside bills need someone to look at them; the file keeps them safe until then
+            self.pending_writes_label.setText(f"⚠ {failed} bill(s) could not be saved; kept in {writer.failed_path}")
+        elif pending == 0 and sync_client is not None and sync_client.rejected:
+            self.pending_writes_label.setText(f"⚠ Sync server refused {sync_client.rejected} bill(s); "
+                                              f"see {sync_client.rejected_path}")
+        elif pending == 0 and sync_client is not None and sync_client.last_error:
+            # Bills are safe locally and go to the server once it is reachable again
+            self.pending_writes_label.setText(f"⚠ Sync server unreachable; {sync_client.pending_count()} bill(s) waiting to sync")
+        elif pending == 0:
+            self.pending_writes_label.setText("")
+        elif writer.last_error:
+            self.pending_writes_label.setText(f"⚠ {pending} bill(s) waiting to save (retrying: {writer.last_error})")
+        else:
+            self.pending_writes_label.setText(f"Saving {pending} bill(s)...")
+    
     def on_barcode_input(self, text):
         """Handle barcode input with timer for keyboard wedge scanner"""
         self.barcode_buffer = text
@@ -554,7 +601,8 @@ class CreateBillWindow(QMainWindow):
             'sgst_percent': sgst_percent,
             'cgst_percent': cgst_percent,
             'item_type': 'barcode',
-            'barcode': barcode
+            'barcode': barcode,
+            'item_ref_id': item['id']
         }
         
         self.calculate_item_totals(bill_item)
@@ -562,15 +610,8 @@ class CreateBillWindow(QMainWindow):
         self.update_bill_display()
     
     def calculate_item_totals(self, item):
-        """Calculate SGST, CGST, and final price for an item"""
-        base_amount = item['quantity'] * item['base_price']
-        sgst_amount = base_amount * item['sgst_percent'] / 100
-        cgst_amount = base_amount * item['cgst_percent'] / 100
-        final_price = base_amount + sgst_amount + cgst_amount
-        
-        item['sgst_amount'] = sgst_amount
-        item['cgst_amount'] = cgst_amount
-        item['final_price'] = final_price
+        """Calculate SGST, CGST, and final price for an item (exact paise)"""
+        money.apply_line_amounts(item)
     
     def add_loose_items(self):
         """Add loose items"""
@@ -587,14 +628,16 @@ class CreateBillWindow(QMainWindow):
                     # Always use DB values for SGST/CGST
                     'sgst_percent': dialog.selected_item.get('sgst_percent', 0),
                     'cgst_percent': dialog.selected_item.get('cgst_percent', 0),
-                    'item_type': 'loose'
+                    'item_type': 'loose',
+                    'item_ref_id': dialog.selected_item['id'],
+                    'category_id': dialog.selected_item.get('category_id')
                 }
                 self.calculate_item_totals(new_item)
-                # Check for existing loose item with same name and price
+                # Check for existing loose item with same item and price
                 for existing_item in self.bill_items:
                     if (
                         existing_item.get('item_type') == 'loose' and
-                        existing_item.get('name') == new_item['name'] and
+                        existing_item.get('item_ref_id') == new_item['item_ref_id'] and
                         abs(existing_item.get('base_price', 0) - new_item['base_price']) < 0.01  # Allow small float diff
                     ):
                         # Same item and price: add quantity and update totals
@@ -608,11 +651,9 @@ class CreateBillWindow(QMainWindow):
     
     def update_bill_display(self):
         """Update the bill table and totals"""
+        self.db.note_activity()
         self.bill_table.setRowCount(len(self.bill_items))
-        total_amount = 0
         total_items = len(self.bill_items)
-        total_sgst = 0
-        total_cgst = 0
         sgst_percent_sum = 0
         cgst_percent_sum = 0
         sgst_count = 0
@@ -660,7 +701,7 @@ class CreateBillWindow(QMainWindow):
             self.bill_table.setItem(row, 5, QTableWidgetItem(f"{item['cgst_percent']:.1f}%"))
             
             # Final price
-            self.bill_table.setItem(row, 6, QTableWidgetItem(f"₹{item['final_price']:.2f}"))
+            self.bill_table.setItem(row, 6, QTableWidgetItem(money.format_rupees(money.item_paise(item)[3])))
             
             # Actions (Edit)
             edit_btn = QPushButton("Edit")
@@ -699,27 +740,26 @@ class CreateBillWindow(QMainWindow):
             remove_btn.clicked.connect(lambda checked, r=row: self.remove_item(r))
             self.bill_table.setCellWidget(row, 8, remove_btn)
             
-            # Calculate totals
-            total_amount += item['final_price']
-            total_sgst += item['sgst_amount']
-            total_cgst += item['cgst_amount']
+            # Average GST rates for the summary labels
             if item.get('sgst_percent', 0) > 0:
                 sgst_percent_sum += item['sgst_percent']
                 sgst_count += 1
             if item.get('cgst_percent', 0) > 0:
                 cgst_percent_sum += item['cgst_percent']
                 cgst_count += 1
-        # Update totals display
-        self.total_amount = total_amount
+        # Update totals display (summed as integer paise)
+        totals = money.sum_items(self.bill_items)
+        self.total_amount_paise = totals['amount']
+        self.total_amount = money.from_paise(totals['amount'])
         self.total_items = total_items
-        self.total_sgst = total_sgst
-        self.total_cgst = total_cgst
+        self.total_sgst = money.from_paise(totals['sgst'])
+        self.total_cgst = money.from_paise(totals['cgst'])
         self.items_count_label.setText(f"Total Items: {total_items}")
         avg_sgst = (sgst_percent_sum / sgst_count) if sgst_count else 0
         avg_cgst = (cgst_percent_sum / cgst_count) if cgst_count else 0
         self.total_sgst_label.setText(f"Avg SGST%: {avg_sgst:.2f}%")
         self.total_cgst_label.setText(f"Avg CGST%: {avg_cgst:.2f}%")
-        self.total_amount_label.setText(f"Total Amount: ₹{total_amount:.2f}")
+        self.total_amount_label.setText(f"Total Amount: {money.format_rupees(totals['amount'])}")
     
     def increase_quantity(self, row):
         """Increase item quantity"""
@@ -815,11 +855,8 @@ class CreateBillWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Please add items to the bill first!")
             return
         
-        # Get customer names for autocomplete
-        customer_names = self.db.get_customer_names()
-        
         # Get customer information
-        customer_dialog = CustomerInfoDialog(customer_names, self)
+        customer_dialog = CustomerInfoDialog(self)
         if customer_dialog.exec_() != QDialog.Accepted:
             return
         
@@ -838,26 +875,24 @@ class CreateBillWindow(QMainWindow):
             QMessageBox.warning(self, "Invalid Phone Number", "Please enter a valid 10-digit phone number. Only Indian numbers (+91) are supported for WhatsApp sending.")
             return
         
-        # Save bill to database
-        bill_id = self.db.save_bill(
-            customer_name, customer_phone, self.bill_items,
-            self.total_amount, self.total_items, self.total_weight,
-            self.total_sgst, self.total_cgst
-        )
-        
-        # Prepare bill data for printing
+        # Prepare bill data for saving and printing
         bill_data = {
-            'id': bill_id,
             'customer_name': customer_name,
             'customer_phone': customer_phone,
             'total_amount': self.total_amount,
+            'total_amount_paise': self.total_amount_paise,
             'total_items': self.total_items,
             'total_weight': self.total_weight,
             'total_sgst': self.total_sgst,
             'total_cgst': self.total_cgst,
-            'items': self.bill_items
+            'items': [dict(item) for item in self.bill_items]
         }
         
+        # Queue the bill for saving; the ID is reserved immediately and the
+        # write happens on the background writer thread
+        self.db.bill_writer.submit(bill_data)
+        self.update_pending_writes_label()
+        
         # --- Print to console and perform both actions ---
         print("[INFO] Starting thermal print...")
         thermal_success = False
@@ -926,16 +961,11 @@ class CreateBillWindow(QMainWindow):
         layout = QVBoxLayout()
         widget.setLayout(layout)
 
-        # --- SHOP DETAILS (fetch once and reuse) ---
-        if hasattr(self, '_cached_admin_details'):
-            admin_details = self._cached_admin_details
-        else:
-            db = Database()
-            admin_details = db.get_admin_details() or {}
-            self._cached_admin_details = admin_details
-        shop_name = admin_details.get('shop_name', 'Shop Name')
-        shop_address = admin_details.get('address', 'Shop Address')
-        shop_phone = admin_details.get('phone_number', 'Shop Phone')
+        # --- SHOP DETAILS (served from the settings cache) ---
+        settings = self.db.settings
+        shop_name = settings.get_str('shop_name', 'Shop Name')
+        shop_address = settings.get_str('address', 'Shop Address')
+        shop_phone = settings.get_str('phone_number', 'Shop Phone')
         # Shop name bold, address and phone not bold, emojis
         shop_label = QLabel(f"<b>{shop_name}</b><br/>📍{shop_address}<br/>📞{shop_phone}")
         shop_label.setFont(QFont("Poppins", 15))
@@ -1011,45 +1041,32 @@ class CreateBillWindow(QMainWindow):
         table.horizontalHeader().setFixedHeight(table_header_height)
 
         # --- FILL TABLE ROWS ---
-        total_base = 0
-        total_sgst = 0
-        total_cgst = 0
-        total_final = 0
         for row, item in enumerate(bill_data['items']):
             hsn = str(item.get('hsn_code', ''))
             name = str(item.get('name', ''))
             qty = f"{item.get('quantity', 0):.2f}"
-            base_price_val = item.get('base_price', 0)
-            base_price = f"₹{base_price_val:.2f}"
+            base_price_paise, sgst_paise, cgst_paise, final_paise = money.item_paise(item)
             sgst_percent = item.get('sgst_percent', 0)
-            sgst_amt = item.get('sgst_amount', 0)
             cgst_percent = item.get('cgst_percent', 0)
-            cgst_amt = item.get('cgst_amount', 0)
-            final_price_val = item.get('final_price', 0)
-            final_price = f"₹{final_price_val:.2f}"
 
             table.setItem(row, 0, QTableWidgetItem(hsn))
             table.setItem(row, 1, QTableWidgetItem(name))
             table.setItem(row, 2, QTableWidgetItem(qty))
-            table.setItem(row, 3, QTableWidgetItem(base_price))
-            table.setItem(row, 4, QTableWidgetItem(f"{sgst_percent:.1f}%\n₹{sgst_amt:.2f}"))
-            table.setItem(row, 5, QTableWidgetItem(f"{cgst_percent:.1f}%\n₹{cgst_amt:.2f}"))
-            table.setItem(row, 6, QTableWidgetItem(final_price))
-
-            total_base += base_price_val
-            total_sgst += sgst_amt
-            total_cgst += cgst_amt
-            total_final += final_price_val
+            table.setItem(row, 3, QTableWidgetItem(money.format_rupees(base_price_paise)))
+            table.setItem(row, 4, QTableWidgetItem(f"{sgst_percent:.1f}%\n{money.format_rupees(sgst_paise)}"))
+            table.setItem(row, 5, QTableWidgetItem(f"{cgst_percent:.1f}%\n{money.format_rupees(cgst_paise)}"))
+            table.setItem(row, 6, QTableWidgetItem(money.format_rupees(final_paise)))
 
-        # --- TOTAL ROW ---
+        # --- TOTAL ROW (exact paise sums) ---
+        totals = money.sum_items(bill_data['items'])
         total_row = n_items
         table.setItem(total_row, 0, QTableWidgetItem(""))
         table.setItem(total_row, 1, QTableWidgetItem("Total"))
         table.setItem(total_row, 2, QTableWidgetItem(""))
-        table.setItem(total_row, 3, QTableWidgetItem(f"₹{total_base:.2f}"))
-        table.setItem(total_row, 4, QTableWidgetItem(f"₹{total_sgst:.2f}"))
-        table.setItem(total_row, 5, QTableWidgetItem(f"₹{total_cgst:.2f}"))
-        table.setItem(total_row, 6, QTableWidgetItem(f"₹{total_final:.2f}"))
+        table.setItem(total_row, 3, QTableWidgetItem(money.format_rupees(totals['base'])))
+        table.setItem(total_row, 4, QTableWidgetItem(money.format_rupees(totals['sgst'])))
+        table.setItem(total_row, 5, QTableWidgetItem(money.format_rupees(totals['cgst'])))
+        table.setItem(total_row, 6, QTableWidgetItem(money.format_rupees(totals['amount'])))
         for col in [1,3,4,5,6]:
             item = table.item(total_row, col)
             if item:
@@ -1061,16 +1078,13 @@ class CreateBillWindow(QMainWindow):
         layout.addWidget(table)
 
         # --- GRAND TOTAL FOOTER ---
-        total_label = QLabel(f"GRAND TOTAL: ₹{total_final:.2f}")
+        total_label = QLabel(f"GRAND TOTAL: {money.format_rupees(totals['amount'])}")
         total_label.setFont(QFont("Poppins", 16, QFont.Bold))
         total_label.setAlignment(Qt.AlignCenter)
         total_label.setStyleSheet("padding: 10px; background-color: #e8f4fd; border: 2px solid #3498db;")
         layout.addWidget(total_label)
 
         # Footer label with random thank you message
-        db = Database()
-        admin_details = db.get_admin_details() or {}
-        shop_name = admin_details.get('shop_name', 'Shop Name')
         thank_you_messages = [
             f"Thank you for shopping in {shop_name}!",
             f"We appreciate your business at {shop_name}.",
@@ -1089,7 +1103,7 @@ class CreateBillWindow(QMainWindow):
         layout.addWidget(footer_label)
 
         # --- QR CODE (randomly positioned at bottom left or right) ---
-        qr_data = admin_details.get('location', 'https://maps.app.goo.gl/qthz7Drt5WBdwBj49?g_st=aw')
+        qr_data = settings.get('location', 'https://maps.app.goo.gl/qthz7Drt5WBdwBj49?g_st=aw')
         # Generate QR code with better parameters
         try:
             qr = qrcode.QRCode(
@@ -1177,9 +1191,7 @@ class CreateBillWindow(QMainWindow):
             # Send via WhatsApp if phone number is valid
             if customer_phone and customer_phone.startswith('+') and len(customer_phone) > 7:
                 try:
-                    db = Database()
-                    admin_details = db.get_admin_details() or {}
-                    shop_name = admin_details.get('shop_name', 'Shop Name')
+                    shop_name = self.db.settings.get_str('shop_name', 'Shop Name')
                     greetings = ["Hi", "Hello", "Hey", "Dear"]
                     thanks = [
                         "Thanks for shopping with us!",
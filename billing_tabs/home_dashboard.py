@@ -1,6 +1,7 @@
 import sys
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLabel, QApplication, QFrame, QSizePolicy, QSpacerItem)
+                             QPushButton, QLabel, QApplication, QFrame, QSizePolicy, QSpacerItem,
+                             QMessageBox)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QPixmap, QIcon
 from billing_tabs.create_bill import CreateBillWindow
@@ -9,6 +10,7 @@ from billing_tabs.inventory import InventoryWindow
 from billing_tabs.admin_settings import AdminSettingsWindow
 from billing_tabs.sales_report import SalesReportWindow
 from billing_tabs.thermal_printer import ThermalPrinter
+from data_base.database import get_database
 
 class HomeDashboard(QMainWindow):
     def __init__(self):
@@ -232,7 +234,7 @@ class HomeDashboard(QMainWindow):
         if self.admin_settings_window is None:
             self.admin_settings_window = AdminSettingsWindow()
             # Connect signal to refresh printer shop details
-            self.admin_settings_window.shop_details_updated.connect(self.refresh_printer_details)
+            self.admin_settings_window.settings_changed.connect(self.refresh_printer_details)
         # Always restore and bring to front
         self.admin_settings_window.showNormal()
         self.admin_settings_window.raise_()
@@ -245,6 +247,18 @@ class HomeDashboard(QMainWindow):
     
     def closeEvent(self, event):
         """Handle window close event"""
+        # Make sure every finished bill is on disk before exiting
+        bill_writer = get_database().bill_writer
+        if not bill_writer.flush(timeout=10):
+            reply = QMessageBox.warning(
+                self, "Bills Not Saved",
+                f"{bill_writer.pending_count()} bill(s) could not be saved yet.\n"
+                "Wait for them to be saved before closing?",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if reply == QMessageBox.Yes:
+                event.ignore()
+                return
+        
         # Close all child windows
         if self.create_bill_window:
             self.create_bill_window.close()
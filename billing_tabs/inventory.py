@@ -5,12 +5,40 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QTableWidgetItem, QTabWidget, QDialog, QGridLayout,
                              QDoubleSpinBox, QMessageBox, QFileDialog, QComboBox,
                              QHeaderView, QAbstractItemView, QDialogButtonBox,
-                             QSpinBox, QSizePolicy, QApplication, QFormLayout)
-from PyQt5.QtCore import Qt, QEvent
+                             QSpinBox, QSizePolicy, QApplication, QFormLayout,
+                             QProgressDialog)
+from PyQt5.QtCore import Qt, QEvent, QThread, pyqtSignal
 from PyQt5.QtGui import QFont, QPixmap
-from data_base.database import Database
+from data_base.database import get_database
 from PIL import Image
 
+class CsvImportThread(QThread):
+    """Thread for streaming a CSV inventory import to avoid blocking UI"""
+    progress = pyqtSignal(int, int)  # percent of file read, rows processed
+    completed = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, import_func, file_path, upsert=False):
+        super().__init__()
+        self.import_func = import_func
+        self.file_path = file_path
+        self.upsert = upsert
+        self._cancel_requested = False
+    
+    def cancel(self):
+        self._cancel_requested = True
+    
+    def run(self):
+        try:
+            result = self.import_func(self.file_path, upsert=self.upsert,
+                                      progress=self.progress.emit,
+                                      should_cancel=lambda: self._cancel_requested)
+            self.completed.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            get_database().release_reader()
+
 class BarcodeItemDialog(QDialog):
     def __init__(self, item_data=None, parent=None):
         super().__init__(parent)
@@ -456,7 +484,7 @@ class InventoryWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle("Inventory Management")
         self.setMinimumSize(900, 600)
-        self.db = Database()
+        self.db = get_database()
         # Store original data for filtering
         self.all_barcode_items = []
         self.all_loose_items = []
@@ -475,6 +503,12 @@ class InventoryWindow(QMainWindow):
         header_label.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(header_label)
 
+        # Items running out, from the stock ledger
+        self.low_stock_label = QLabel("")
+        self.low_stock_label.setWordWrap(True)
+        self.low_stock_label.setStyleSheet("color: #e74c3c; font-weight: bold;")
+        main_layout.addWidget(self.low_stock_label)
+
         # Tabs
         self.tab_widget = QTabWidget()
         main_layout.addWidget(self.tab_widget)
@@ -763,6 +797,16 @@ class InventoryWindow(QMainWindow):
     def load_data(self):
         self.load_barcode_items()
         self.load_loose_items()
+        self.update_low_stock_label()
+
+    def update_low_stock_label(self):
+        """List the items that are running out of stock"""
+        items = self.db.get_low_stock(10)
+        if items:
+            names = ", ".join(f"{item['name']} ({item['quantity']:g})" for item in items)
+            self.low_stock_label.setText(f"Low stock: {names}")
+        else:
+            self.low_stock_label.setText("")
 
     def load_barcode_items(self):
         self.all_barcode_items = self.db.get_all_barcode_items()
@@ -869,16 +913,59 @@ class InventoryWindow(QMainWindow):
             "CSV Files (*.csv);;All Files (*)"
         )
         if file_path:
-            try:
-                success, fail, fail_rows = self.db.import_barcode_items_from_csv(file_path)
-                msg = f"Successfully added: {success}\nSkipped: {fail}"
-                if fail_rows:
-                    msg += "\n\nRows skipped due to errors:\n"
-                    msg += "\n".join([f"Row {row}: {reason}" for row, reason in fail_rows])
-                QMessageBox.information(self, "CSV Import Result", msg)
-                self.load_barcode_items()
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to import barcode items from CSV: {e}")
+            self.start_csv_import(self.db.import_barcode_items_from_csv, file_path,
+                                  "barcode items", "barcodes", self.load_barcode_items)
+
+    def start_csv_import(self, import_func, file_path, what, key_name, reload_func):
+        """Run a CSV import on a worker thread behind a cancellable progress dialog"""
+        reply = QMessageBox.question(
+            self, "CSV Import",
+            f"Update prices of existing {key_name} found in the file?\n\n"
+            f"Yes - update their prices and tax rates\n"
+            f"No - skip them as duplicates",
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.No)
+        if reply == QMessageBox.Cancel:
+            return
+        progress_dialog = QProgressDialog(f"Importing {what}...", "Cancel", 0, 100, self)
+        progress_dialog.setWindowTitle("CSV Import")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
+        
+        self.import_thread = CsvImportThread(import_func, file_path, upsert=(reply == QMessageBox.Yes))
+        
+        def on_progress(percent, rows):
+            progress_dialog.setValue(percent)
+            progress_dialog.setLabelText(f"Importing {what}... {rows} rows processed")
+        
+        def on_completed(result):
+            progress_dialog.close()
+            msg = f"Successfully added: {result['added']}"
+            if result['updated']:
+                msg += f"\nPrices updated: {result['updated']}"
+            msg += f"\nSkipped: {result['failed']}"
+            if result['cancelled']:
+                msg = "Import cancelled. Rows imported before cancelling were kept.\n\n" + msg
+            fail_rows = result['fail_rows']
+            if fail_rows:
+                msg += "\n\nRows skipped due to errors:\n"
+                msg += "\n".join([f"Row {row}: {reason}" for row, reason in fail_rows[:20]])
+                if len(fail_rows) > 20:
+                    msg += f"\n... and {len(fail_rows) - 20} more"
+            QMessageBox.information(self, "CSV Import Result", msg)
+            reload_func()
+        
+        def on_failed(error):
+            progress_dialog.close()
+            QMessageBox.warning(self, "Error", f"Failed to import {what} from CSV: {error}")
+            reload_func()
+        
+        self.import_thread.progress.connect(on_progress)
+        self.import_thread.completed.connect(on_completed)
+        self.import_thread.failed.connect(on_failed)
+        progress_dialog.canceled.connect(self.import_thread.cancel)
+        self.import_thread.start()
 
     # --- Loose Items Logic ---
     def load_loose_items(self):
@@ -1034,18 +1121,13 @@ class InventoryWindow(QMainWindow):
                 # Find category id
                 cat_id = next((cat['id'] for cat in categories if cat['name'] == cat_name), None)
                 if cat_id is not None:
-                    conn = self.db.get_connection()
-                    try:
-                        cursor = conn.cursor()
-                        cursor.execute('DELETE FROM loose_items WHERE category_id = ?', (cat_id,))
-                        cursor.execute('DELETE FROM loose_categories WHERE id = ?', (cat_id,))
-                        conn.commit()
+                    if self.db.delete_loose_category(cat_id):
                         QMessageBox.information(self, "Success", f"Category '{cat_name}' and its items deleted.")
                         self.load_loose_items()
                         self.load_data()  # Ensure all UI is refreshed
                         self.update_category_filter()
-                    finally:
-                        conn.close()
+                    else:
+                        QMessageBox.warning(self, "Error", f"Failed to delete category '{cat_name}'.")
                 else:
                     QMessageBox.warning(self, "Error", "Category not found.")
     
@@ -1097,16 +1179,8 @@ class InventoryWindow(QMainWindow):
             "CSV Files (*.csv);;All Files (*)"
         )
         if file_path:
-            try:
-                success, fail, fail_rows = self.db.import_loose_items_from_csv(file_path)
-                msg = f"Successfully added: {success}\nSkipped: {fail}"
-                if fail_rows:
-                    msg += "\n\nRows skipped due to errors:\n"
-                    msg += "\n".join([f"Row {row}: {reason}" for row, reason in fail_rows])
-                QMessageBox.information(self, "CSV Import Result", msg)
-                self.load_loose_items()
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to import loose items from CSV: {e}")
+            self.start_csv_import(self.db.import_loose_items_from_csv, file_path,
+                                  "loose items", "items", self.load_loose_items)
 
     # --- Search Functionality ---
     def filter_barcode_items(self):
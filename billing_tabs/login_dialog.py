@@ -3,7 +3,7 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QLineEdit, QPushButton, QMessageBox, QFormLayout, QWidget, QGridLayout)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-from data_base.database import Database
+from data_base.database import get_database
 
 class LoginDialog(QDialog):
     """Login dialog for admin authentication"""
@@ -13,7 +13,7 @@ class LoginDialog(QDialog):
         self.setModal(True)
         self.setFixedSize(600, 420)
         
-        self.db = Database()
+        self.db = get_database()
         self.admin_details = self.db.get_admin_details()
         
         self.username = ""
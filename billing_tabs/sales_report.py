@@ -11,12 +11,42 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.dates as mdates
-from data_base.database import Database
+from data_base.database import get_database
+from data_base import money
 import numpy as np
 
+class ReportDataThread(QThread):
+    """Thread running the report queries on a read-only reporting connection"""
+    loaded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    
+    TOP_ITEMS_LIMIT = 20
+    
+    def __init__(self, start_date, end_date):
+        super().__init__()
+        self.start_date = start_date
+        self.end_date = end_date
+    
+    def run(self):
+        try:
+            db = get_database()
+            with db.reporting():
+                data = {
+                    'start_date': self.start_date,
+                    'end_date': self.end_date,
+                    'daily_sales': db.get_daily_sales(self.start_date, self.end_date),
+                    'top_loose_items': db.get_top_items(self.start_date, self.end_date, 'loose', self.TOP_ITEMS_LIMIT),
+                    'top_barcode_items': db.get_top_items(self.start_date, self.end_date, 'barcode', self.TOP_ITEMS_LIMIT),
+                    'categories': db.get_category_sales(self.start_date, self.end_date)
+                }
+            self.loaded.emit(data)
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class ReportGeneratorThread(QThread):
     """Thread for generating reports to avoid blocking UI"""
-    finished = pyqtSignal(bool, str)
+    # Not named finished: that would shadow QThread.finished
+    export_done = pyqtSignal(bool, str)
     
     def __init__(self, report_data, file_path, format_type):
         super().__init__()
@@ -30,9 +60,9 @@ class ReportGeneratorThread(QThread):
                 self._export_csv()
             elif self.format_type == 'pdf':
                 self._export_pdf()
-            self.finished.emit(True, f"Report exported successfully to {self.file_path}")
+            self.export_done.emit(True, f"Report exported successfully to {self.file_path}")
         except Exception as e:
-            self.finished.emit(False, f"Failed to export report: {str(e)}")
+            self.export_done.emit(False, f"Failed to export report: {str(e)}")
     
     def _export_csv(self):
         """Export sales report data to CSV"""
@@ -49,9 +79,14 @@ class ReportGeneratorThread(QThread):
             writer.writerow([])
             
             # Write top selling items
-            writer.writerow(['Top Selling Items'])
+            writer.writerow(['Top Loose Items'])
+            writer.writerow(['Item Name', 'Weight Sold', 'Revenue'])
+            for item in self.report_data.get('top_loose_items', []):
+                writer.writerow([item['name'], item['weight'], f"₹{item['revenue']:.2f}"])
+            writer.writerow([])
+            writer.writerow(['Top Barcode Items'])
             writer.writerow(['Item Name', 'Quantity Sold', 'Revenue'])
-            for item in self.report_data['top_items']:
+            for item in self.report_data.get('top_barcode_items', []):
                 writer.writerow([item['name'], item['quantity'], f"₹{item['revenue']:.2f}"])
             writer.writerow([])
             
@@ -60,6 +95,17 @@ class ReportGeneratorThread(QThread):
             writer.writerow(['Category', 'Revenue', 'Percentage'])
             for category in self.report_data['category_sales']:
                 writer.writerow([category['name'], f"₹{category['revenue']:.2f}", f"{category['percentage']:.1f}%"])
+            writer.writerow([])
+            
+            # Write every bill in the range, streamed from the database on this thread
+            writer.writerow(['Bills'])
+            writer.writerow(['Bill ID', 'Date', 'Customer Name', 'Mobile Number', 'Total Items', 'Total Amount'])
+            db = get_database()
+            with db.reporting():
+                for bill in db.iter_bills(self.report_data['start_date'], self.report_data['end_date']):
+                    writer.writerow([bill['id'], bill['created_at'], bill['customer_name'],
+                                     bill['customer_phone'] or 'N/A', bill['total_items'],
+                                     f"₹{bill['total_amount']:.2f}"])
     
     def _export_pdf(self):
         """Export sales report data to PDF"""
@@ -325,11 +371,12 @@ class SalesReportWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle("Sales Report")
         self.setMinimumSize(1200, 800)
-        self.db = Database()
+        self.db = get_database()
         
         # Initialize date range
         self.start_date = date.today() - timedelta(days=30)  # Default: Last 30 days
         self.end_date = date.today()
+        self.report_threads = []
         
         self.init_ui()
         self.load_report_data()
@@ -676,49 +723,67 @@ class SalesReportWindow(QMainWindow):
         
         self.load_report_data()
     
+    def date_range_strings(self):
+        """Selected report range as inclusive YYYY-MM-DD strings"""
+        return self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')
+    
     def load_report_data(self):
-        """Load and display sales report data"""
+        """Load sales report data on a worker thread and display it when ready"""
+        # Queries run on the read-only reporting pool so checkout is never held up
+        thread = ReportDataThread(*self.date_range_strings())
+        thread.loaded.connect(self.on_report_data_loaded)
+        thread.failed.connect(self.on_report_data_failed)
+        thread.finished.connect(lambda: self.report_threads.remove(thread))
+        self.report_threads.append(thread)
+        thread.start()
+    
+    def on_report_data_failed(self, message):
+        QMessageBox.critical(self, "Error", f"Failed to load report data: {message}")
+    
+    def on_report_data_loaded(self, data):
+        """Display report data loaded by ReportDataThread"""
+        # Ignore results for a date range that has since been changed
+        if (data['start_date'], data['end_date']) != self.date_range_strings():
+            return
         try:
-            # Get bills data for the selected date range
-            start_date_str = self.start_date.strftime('%Y-%m-%d')
-            end_date_str = self.end_date.strftime('%Y-%m-%d')
+            daily_sales = data['daily_sales']
             
-            bills = self.db.get_bills_by_date_range(start_date_str, end_date_str)
-            
-            if not bills:
+            if not daily_sales:
                 self.show_no_data_message()
                 return
             
-            # Calculate summary statistics
-            total_revenue = sum(bill['total_amount'] for bill in bills)
-            total_bills = len(bills)
-            total_items = sum(bill['total_items'] for bill in bills)
-            avg_bill_value = total_revenue / total_bills if total_bills > 0 else 0
+            # Calculate summary statistics from the daily rollups (exact paise sums)
+            self.total_revenue_paise = sum(day['revenue_paise'] for day in daily_sales)
+            total_bills = sum(day['bill_count'] for day in daily_sales)
+            total_items = sum(day['total_items'] for day in daily_sales)
+            avg_bill_paise = round(self.total_revenue_paise / total_bills) if total_bills > 0 else 0
+            total_revenue = money.from_paise(self.total_revenue_paise)
+            avg_bill_value = money.from_paise(avg_bill_paise)
             
             # Update summary labels
-            self.total_revenue_label.setText(f"₹{total_revenue:.2f}")
+            self.total_revenue_label.setText(money.format_rupees(self.total_revenue_paise))
             self.total_bills_label.setText(str(total_bills))
             self.total_items_label.setText(str(total_items))
-            self.avg_bill_label.setText(f"₹{avg_bill_value:.2f}")
+            self.avg_bill_label.setText(money.format_rupees(avg_bill_paise))
             
             # Generate charts data
-            self.generate_top_items_charts_separate()
-            self.generate_category_chart()
-            self.generate_daily_trend_chart(bills)
-            self.generate_top_categories_chart()
-            self.generate_monthly_comparison_chart(bills)
+            self.generate_top_items_charts_separate(data['top_loose_items'], data['top_barcode_items'])
+            self.generate_category_chart(data['categories'])
+            self.generate_daily_trend_chart(daily_sales)
+            self.generate_top_categories_chart(data['categories'])
+            self.generate_monthly_comparison_chart(daily_sales)
             
             # Store data for export
             self.current_report_data = {
-                'start_date': start_date_str,
-                'end_date': end_date_str,
+                'start_date': data['start_date'],
+                'end_date': data['end_date'],
                 'total_revenue': total_revenue,
                 'total_bills': total_bills,
                 'total_items': total_items,
                 'avg_bill_value': avg_bill_value,
-                'top_loose_items': self.get_top_loose_items_data(),
-                'top_barcode_items': self.get_top_barcode_items_data(),
-                'category_sales': self.get_category_sales_data()
+                'top_loose_items': self.get_top_loose_items_data(data['top_loose_items']),
+                'top_barcode_items': self.get_top_barcode_items_data(data['top_barcode_items']),
+                'category_sales': self.get_category_sales_data(data['categories'])
             }
             
         except Exception as e:
@@ -743,6 +808,7 @@ class SalesReportWindow(QMainWindow):
     def show_no_data_message(self):
         """Show message when no data is available"""
         # Clear all charts and show no data message
+        self.total_revenue_paise = 0
         self.total_revenue_label.setText("₹0.00")
         self.total_bills_label.setText("0")
         self.total_items_label.setText("0")
@@ -758,86 +824,27 @@ class SalesReportWindow(QMainWindow):
         
         QMessageBox.information(self, "No Data", "No sales data for this period.")
 
-    def generate_top_items_charts_separate(self):
+    def generate_top_items_charts_separate(self, loose_items, barcode_items):
         """Generate separate bar charts for top loose and barcode items"""
         # Loose items (by weight sold)
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT bi.item_name, SUM(bi.quantity) as total_weight
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'loose'
-            GROUP BY bi.item_name
-            ORDER BY total_weight DESC
-            LIMIT 10
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        loose_results = cursor.fetchall()
-        loose_data = [{'name': row[0], 'value': row[1]} for row in loose_results]
+        loose_data = [{'name': item['name'], 'value': item['quantity']} for item in loose_items[:10]]
         self.top_loose_items_chart.create_bar_chart(loose_data, "Top Loose Items", "Items", "Weight Sold (kg)")
 
         # Barcode items (by quantity sold)
-        cursor.execute('''
-            SELECT bi.item_name, SUM(bi.quantity) as total_quantity
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'barcode'
-            GROUP BY bi.item_name
-            ORDER BY total_quantity DESC
-            LIMIT 10
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        barcode_results = cursor.fetchall()
-        barcode_data = [{'name': row[0], 'value': row[1]} for row in barcode_results]
+        barcode_data = [{'name': item['name'], 'value': item['quantity']} for item in barcode_items[:10]]
         self.top_barcode_items_chart.create_bar_chart(barcode_data, "Top Barcode Items", "Items", "Quantity Sold")
-        conn.close()
 
-    def generate_category_chart(self):
+    def generate_category_chart(self, categories):
         """Generate bar chart for category-wise sales"""
-        # Get category sales data
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get loose items category sales
-        cursor.execute('''
-            SELECT lc.name, SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            JOIN loose_items li ON bi.item_name = li.name
-            JOIN loose_categories lc ON li.category_id = lc.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'loose'
-            GROUP BY lc.name
-            ORDER BY total_revenue DESC
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        
-        loose_results = cursor.fetchall()
-        
-        # Get barcode items sales (as one category)
-        cursor.execute('''
-            SELECT SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'barcode'
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        
-        barcode_result = cursor.fetchone()
-        conn.close()
-        
-        data = [{'name': row[0], 'value': row[1]} for row in loose_results]
-        if barcode_result and barcode_result[0]:
-            data.append({'name': 'Barcode Items', 'value': barcode_result[0]})
+        # Category sales: loose categories plus barcode items as one
+        data = [{'name': row['name'], 'value': money.from_paise(row['revenue_paise'])} for row in categories]
         
         self.category_chart.create_bar_chart(data, "Category-wise Sales", "Categories", "Revenue (₹)")
     
-    def generate_daily_trend_chart(self, bills):
+    def generate_daily_trend_chart(self, daily_rows):
         """Generate line chart for daily sales trend"""
-        # Group bills by date
-        daily_sales = {}
-        for bill in bills:
-            bill_date = bill['created_at'][:10]  # Extract date part
-            if bill_date in daily_sales:
-                daily_sales[bill_date] += bill['total_amount']
-            else:
-                daily_sales[bill_date] = bill['total_amount']
+        # Daily rollup rows are already one per date
+        daily_sales = {row['day']: row['revenue'] for row in daily_rows}
         
         # Fill missing dates with 0
         current_date = self.start_date
@@ -853,58 +860,20 @@ class SalesReportWindow(QMainWindow):
         
         self.daily_trend_chart.create_line_chart(data, "Daily Sales Trend", "Date", "Revenue (₹)")
     
-    def generate_top_categories_chart(self):
+    def generate_top_categories_chart(self, categories):
         """Generate pie chart for top categories by revenue"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get total revenue for percentage calculation
-        total_revenue = float(self.total_revenue_label.text().replace('₹', '').replace(',', ''))
-        
-        # Get loose items category sales
-        cursor.execute('''
-            SELECT lc.name, SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            JOIN loose_items li ON bi.item_name = li.name
-            JOIN loose_categories lc ON li.category_id = lc.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'loose'
-            GROUP BY lc.name
-            ORDER BY total_revenue DESC
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        
-        loose_results = cursor.fetchall()
-        
-        # Get barcode items sales (as one category)
-        cursor.execute('''
-            SELECT SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'barcode'
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        
-        barcode_result = cursor.fetchone()
-        conn.close()
-        
-        data = []
-        for row in loose_results:
-            data.append({'name': row[0], 'value': row[1]})
-        
-        if barcode_result and barcode_result[0]:
-            data.append({'name': 'Barcode Items', 'value': barcode_result[0]})
+        data = [{'name': row['name'], 'value': money.from_paise(row['revenue_paise'])} for row in categories]
         
         self.top_categories_chart.create_pie_chart(data, "Top Categories by Revenue")
     
-    def generate_monthly_comparison_chart(self, bills):
+    def generate_monthly_comparison_chart(self, daily_rows):
         """Generate bar chart for monthly sales comparison (last 12 months, always show 12 bars)"""
-        # Group bills by month
-        monthly_sales = {}
-        for bill in bills:
-            bill_date = bill['created_at'][:7] # YYYY-MM
-            if bill_date in monthly_sales:
-                monthly_sales[bill_date] += bill['total_amount']
-            else:
-                monthly_sales[bill_date] = bill['total_amount']
+        # Group daily rollups by month
+        monthly_paise = {}
+        for row in daily_rows:
+            month = row['day'][:7] # YYYY-MM
+            monthly_paise[month] = monthly_paise.get(month, 0) + row['revenue_paise']
+        monthly_sales = {month: money.from_paise(paise) for month, paise in monthly_paise.items()}
         # Find the latest month in the data or use today
         if monthly_sales:
             latest_month = max(monthly_sales.keys())
@@ -933,81 +902,22 @@ class SalesReportWindow(QMainWindow):
             fixed_labels=fixed_labels
         )
     
-    def get_top_loose_items_data(self):
+    def get_top_loose_items_data(self, items):
         """Get top loose items data for export"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT bi.item_name, SUM(bi.quantity) as total_weight, SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'loose'
-            GROUP BY bi.item_name
-            ORDER BY total_weight DESC
-            LIMIT 20
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        results = cursor.fetchall()
-        conn.close()
-        return [{'name': row[0], 'weight': row[1], 'revenue': row[2]} for row in results]
+        return [{'name': item['name'], 'weight': item['quantity'], 'revenue': item['revenue']} for item in items]
 
-    def get_top_barcode_items_data(self):
+    def get_top_barcode_items_data(self, items):
         """Get top barcode items data for export"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT bi.item_name, SUM(bi.quantity) as total_quantity, SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'barcode'
-            GROUP BY bi.item_name
-            ORDER BY total_quantity DESC
-            LIMIT 20
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        results = cursor.fetchall()
-        conn.close()
-        return [{'name': row[0], 'quantity': row[1], 'revenue': row[2]} for row in results]
+        return [{'name': item['name'], 'quantity': item['quantity'], 'revenue': item['revenue']} for item in items]
     
-    def get_category_sales_data(self):
+    def get_category_sales_data(self, categories):
         """Get category sales data for export"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get total revenue for percentage calculation
-        total_revenue = float(self.total_revenue_label.text().replace('₹', '').replace(',', ''))
-        
-        # Get loose items category sales
-        cursor.execute('''
-            SELECT lc.name, SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            JOIN loose_items li ON bi.item_name = li.name
-            JOIN loose_categories lc ON li.category_id = lc.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'loose'
-            GROUP BY lc.name
-            ORDER BY total_revenue DESC
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        
-        loose_results = cursor.fetchall()
-        
-        # Get barcode items sales
-        cursor.execute('''
-            SELECT SUM(bi.final_price) as total_revenue
-            FROM bill_items bi
-            JOIN bills b ON bi.bill_id = b.id
-            WHERE DATE(b.created_at) BETWEEN ? AND ? AND bi.item_type = 'barcode'
-        ''', (self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d')))
-        
-        barcode_result = cursor.fetchone()
-        conn.close()
-        
+        # Percentages against the exact paise total of the report
+        total_revenue_paise = getattr(self, 'total_revenue_paise', 0)
         data = []
-        for row in loose_results:
-            percentage = (row[1] / total_revenue * 100) if total_revenue > 0 else 0
-            data.append({'name': row[0], 'revenue': row[1], 'percentage': percentage})
-        
-        if barcode_result and barcode_result[0]:
-            percentage = (barcode_result[0] / total_revenue * 100) if total_revenue > 0 else 0
-            data.append({'name': 'Barcode Items', 'revenue': barcode_result[0], 'percentage': percentage})
+        for row in categories:
+            percentage = (row['revenue_paise'] / total_revenue_paise * 100) if total_revenue_paise > 0 else 0
+            data.append({'name': row['name'], 'revenue': money.from_paise(row['revenue_paise']), 'percentage': percentage})
         
         return data
     
@@ -1040,7 +950,7 @@ class SalesReportWindow(QMainWindow):
         
         # Start export thread
         self.export_thread = ReportGeneratorThread(self.current_report_data, file_path, format_type)
-        self.export_thread.finished.connect(self.on_export_finished)
+        self.export_thread.export_done.connect(self.on_export_finished)
         self.export_thread.start()
     
     def on_export_finished(self, success, message):
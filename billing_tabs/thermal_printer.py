@@ -3,7 +3,8 @@ from escpos.exceptions import Error as EscposError
 from datetime import datetime
 from typing import Dict, List, Optional
 import os
-from data_base.database import Database
+from data_base.database import get_database
+from data_base import money
 
 class ThermalPrinter:
     # Paper width configurations
@@ -34,19 +35,15 @@ class ThermalPrinter:
     def __init__(self):
         self.printer = None
         self.is_connected = False
-        self.db = Database()
+        self.db = get_database()
         self.paper_width = '80mm'  # Default paper width
         self.load_shop_details()
         self.load_printer_settings()
     
     def load_printer_settings(self):
-        """Load printer settings from database"""
+        """Load printer settings from the cached settings store"""
         try:
-            admin_details = self.db.get_admin_details()
-            if admin_details and admin_details.get('paper_width'):
-                self.paper_width = admin_details.get('paper_width', '80mm')
-            else:
-                self.paper_width = '80mm'
+            self.paper_width = self.db.settings.get_str('paper_width', '80mm')
         except Exception as e:
             print(f"Error loading printer settings: {e}")
             self.paper_width = '80mm'
@@ -68,18 +65,12 @@ class ThermalPrinter:
         return False
     
     def load_shop_details(self):
-        """Load shop details from database"""
+        """Load shop details from the cached settings store"""
         try:
-            admin_details = self.db.get_admin_details()
-            if admin_details:
-                self.shop_name = admin_details.get('shop_name', 'Your Shop Name')
-                self.shop_address = admin_details.get('address', 'Your Shop Address')
-                self.shop_phone = admin_details.get('phone_number', 'Your Phone Number')
-            else:
-                # Fallback to defaults if no admin details found
-                self.shop_name = "Your Shop Name"
-                self.shop_address = "Your Shop Address"
-                self.shop_phone = "Your Phone Number"
+            settings = self.db.settings
+            self.shop_name = settings.get_str('shop_name', 'Your Shop Name')
+            self.shop_address = settings.get_str('address', 'Your Shop Address')
+            self.shop_phone = settings.get_str('phone_number', 'Your Phone Number')
         except Exception as e:
             print(f"Error loading shop details: {e}")
             # Fallback to defaults
@@ -160,10 +151,6 @@ class ThermalPrinter:
             self.printer.text(separator + "\n")
             
             # Items as table rows
-            total_base_amount = 0
-            total_sgst_amount = 0
-            total_cgst_amount = 0
-            
             for item in bill_data['items']:
                 name = item['name'][:config['name_width']-8] if len(item['name']) > config['name_width']-8 else item['name']
                 hsn_code = item.get('hsn_code', '')
@@ -183,20 +170,16 @@ class ThermalPrinter:
                 if item['item_type'] == 'loose':
                     qty += "kg"
                 
-                rate = f"{item['base_price']:.2f}"
-                amount = f"{item.get('final_price', 0):.2f}"
+                base_price_paise, _, _, final_paise = money.item_paise(item)
+                rate = money.format_rupees(base_price_paise, symbol='')
+                amount = money.format_rupees(final_paise, symbol='')
                 
                 # Print item line
                 item_format = f"{{:<{config['name_width']}}}{{:>{config['qty_width']}}}{{:>{config['rate_width']}}}{{:>{config['amount_width']}}}\n"
                 self.printer.text(item_format.format(name_hsn, qty, rate, amount))
-                
-                # Add to totals
-                sgst_amt = item.get('sgst_amount', 0)
-                cgst_amt = item.get('cgst_amount', 0)
-                total_base_amount += item['quantity'] * item['base_price']
-                total_sgst_amount += sgst_amt
-                total_cgst_amount += cgst_amt
             
+            # Exact paise totals
+            totals = money.sum_items(bill_data['items'])
             self.printer.text(separator + "\n")
             
             # Bill summary
@@ -208,16 +191,16 @@ class ThermalPrinter:
             if bill_data.get('total_weight', 0) > 0:
                 self.printer.text(f"Total Weight: {bill_data['total_weight']:.2f}kg\n")
             
-            self.printer.text(f"Base Amount: ₹{total_base_amount:.2f}\n")
+            self.printer.text(f"Base Amount: {money.format_rupees(totals['base'])}\n")
             
-            if total_sgst_amount > 0:
-                self.printer.text(f"Total SGST: ₹{total_sgst_amount:.2f}\n")
-            if total_cgst_amount > 0:
-                self.printer.text(f"Total CGST: ₹{total_cgst_amount:.2f}\n")
+            if totals['sgst'] > 0:
+                self.printer.text(f"Total SGST: {money.format_rupees(totals['sgst'])}\n")
+            if totals['cgst'] > 0:
+                self.printer.text(f"Total CGST: {money.format_rupees(totals['cgst'])}\n")
             
             self.printer.text(separator + "\n")
             self.printer.set(bold=True, double_height=True)
-            self.printer.text(f"GRAND TOTAL: ₹{bill_data['total_amount']:.2f}\n")
+            self.printer.text(f"GRAND TOTAL: {money.format_rupees(money.to_paise(bill_data['total_amount']))}\n")
             self.printer.set(bold=False, double_height=False)
             self.printer.text(separator + "\n")
             self.printer.set(align='center')
@@ -355,8 +338,9 @@ class ThermalPrinter:
             return False
     
     def refresh_shop_details(self):
-        """Refresh shop details from database (useful after admin settings changes)"""
+        """Refresh shop details and printer settings (useful after admin settings changes)"""
         self.load_shop_details()
+        self.load_printer_settings()
     
     def close_connection(self):
         """Close printer connection"""
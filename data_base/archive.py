@@ -0,0 +1,89 @@
+"""Fiscal-year archives of old bills.
+
+A closed Indian fiscal year (1 April - 31 March) of bills and bill_items
+can be moved out of billing.db into billing_YYYY.db next to it, where YYYY
+is the year the fiscal year starts in. The hot database keeps an archives
+registry table, plus the daily rollups for every year, so reports over
+any range never need the archive files. Bill queries ATTACH an archive
+only when their date range (or bill ID) falls inside it.
+"""
+
+import os
+import re
+from datetime import date, datetime
+from typing import List, Tuple
+
+FISCAL_YEAR_START_MONTH = 4
+ARCHIVED_TABLES = ('bills', 'bill_items')
+
+def create_registry(cursor):
+    """Create the archives registry table in the hot database"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archives (
+            fiscal_year INTEGER PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            bill_count INTEGER NOT NULL DEFAULT 0,
+            first_bill_id INTEGER,
+            last_bill_id INTEGER,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def fiscal_year_of(day) -> int:
+    """Fiscal year (by starting calendar year) containing a date or YYYY-MM-DD string"""
+    if isinstance(day, str):
+        day = datetime.strptime(day[:10], '%Y-%m-%d').date()
+    return day.year if day.month >= FISCAL_YEAR_START_MONTH else day.year - 1
+
+def fiscal_year_bounds(year: int) -> Tuple[str, str]:
+    """Half-open [start, end) created_at bounds of a fiscal year"""
+    return (date(year, FISCAL_YEAR_START_MONTH, 1).isoformat(),
+            date(year + 1, FISCAL_YEAR_START_MONTH, 1).isoformat())
+
+def fiscal_years_between(start_date: str, end_date: str) -> List[int]:
+    """Fiscal years touched by an inclusive YYYY-MM-DD date range"""
+    return list(range(fiscal_year_of(start_date), fiscal_year_of(end_date) + 1))
+
+def file_name(year: int) -> str:
+    return f'billing_{year}.db'
+
+def alias(year: int) -> str:
+    """Schema name an archive is attached under"""
+    return f'archive_{year}'
+
+def archive_path(db_path: str, year: int) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), file_name(year))
+
+def table_columns(cursor, schema: str, table: str) -> List[Tuple[str, str]]:
+    """(name, declared type) of each column of schema.table"""
+    cursor.execute(f'PRAGMA {schema}.table_info({table})')
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+def create_archive_tables(cursor, schema: str) -> List[Tuple[str, str]]:
+    """Create bills/bill_items in an attached archive with the hot tables' layout.
+
+    Archives made before a later migration get any missing columns added;
+    the (table, column) pairs added are returned.
+    """
+    added = []
+    for table in ARCHIVED_TABLES:
+        cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        ddl = cursor.fetchone()[0]
+        ddl = re.sub(r'^CREATE TABLE\s+"?\w+"?', f'CREATE TABLE IF NOT EXISTS {schema}.{table}', ddl, count=1)
+        cursor.execute(ddl)
+        existing = {name for name, _ in table_columns(cursor, schema, table)}
+        for name, col_type in table_columns(cursor, 'main', table):
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN {name} {col_type}')
+                added.append((table, name))
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_bills_created_at ON bills (created_at)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_bill_items_bill_id ON bill_items (bill_id)')
+    cursor.execute(f'''CREATE INDEX IF NOT EXISTS {schema}.idx_bill_items_sales
+                      ON bill_items (bill_id, item_type, category_id, final_price_paise)''')
+    return added
+
+def union_all(template: str, schemas: List[str]) -> str:
+    """Repeat a SELECT for each schema ({schema} placeholder) joined by UNION ALL"""
+    return ' UNION ALL '.join(template.format(schema=schema) for schema in schemas)
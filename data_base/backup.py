@@ -0,0 +1,248 @@
+"""Online backups of billing.db through the SQLite backup API.
+
+Snapshots are copied page by page from a dedicated read connection, so
+the shared writer lock is never taken and save_bill is not delayed (in WAL
+mode readers never block the writer). Each snapshot is written to a .tmp
+file, checked with PRAGMA integrity_check and only then renamed into
+place; the newest KEEP snapshots are kept. The fiscal-year archive files
+listed in the archives table hold the only copy of their bills, so they
+are snapshotted alongside, into a billing-<stamp>.archives directory next
+to the snapshot, and restored with it.
+"""
+
+import glob
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+KEEP = 7
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.01
+# A throttled backup restarts whenever another connection writes; after
+# this many restarts the copy is finished in one step from a WAL snapshot
+MAX_RESTARTS = 3
+SNAPSHOT_PREFIX = 'billing-'
+
+class BackupRestarted(Exception):
+    pass
+
+def default_backup_dir(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+
+def integrity_check(path: str) -> str:
+    """Result of PRAGMA integrity_check on a database file ('ok' if healthy)"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute('PRAGMA integrity_check').fetchall()
+        return '; '.join(row[0] for row in rows)
+    finally:
+        conn.close()
+
+def archives_dir(snapshot_path: str) -> str:
+    """Directory holding the archive files taken with a snapshot"""
+    return os.path.splitext(snapshot_path)[0] + '.archives'
+
+def archive_files(conn: sqlite3.Connection) -> List[str]:
+    """File names of the fiscal-year archives registered in a database"""
+    try:
+        return [row[0] for row in conn.execute('SELECT file_name FROM archives ORDER BY fiscal_year')]
+    except sqlite3.OperationalError:
+        # Databases from before the archive registry have none
+        return []
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int, sleep: float):
+    """Run a backup, falling back to a single step if it keeps restarting"""
+    restarts = [0]
+    last_remaining = [None]
+
+    def progress(status, remaining, total):
+        if last_remaining[0] is not None and remaining > last_remaining[0]:
+            restarts[0] += 1
+            if restarts[0] > MAX_RESTARTS:
+                raise BackupRestarted()
+        last_remaining[0] = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except BackupRestarted:
+        source.backup(target, pages=-1)
+
+def create_backup(db_path: str, backup_dir: Optional[str] = None, keep: int = KEEP,
+                  pages: int = PAGES_PER_STEP, sleep: float = STEP_SLEEP) -> str:
+    """Write a verified snapshot of db_path, rotate old ones and return its path"""
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    final_path = os.path.join(backup_dir, stamp + '.db')
+    suffix = 0
+    while os.path.exists(final_path) or os.path.exists(archives_dir(final_path)):
+        # Never overwrite a snapshot taken the same second (say, the one being restored)
+        suffix += 1
+        final_path = os.path.join(backup_dir, f'{stamp}-{suffix}.db')
+    tmp_path = final_path + '.tmp'
+
+    source = sqlite3.connect(db_path, timeout=5)
+    try:
+        _snapshot_file(source, tmp_path, pages, sleep)
+        files = archive_files(source)
+    finally:
+        source.close()
+
+    tmp_archives = archives_dir(final_path) + '.tmp'
+    try:
+        if files:
+            os.makedirs(tmp_archives, exist_ok=True)
+            db_dir = os.path.dirname(os.path.abspath(db_path))
+            for name in files:
+                path = os.path.join(db_dir, name)
+                if not os.path.exists(path):
+                    print(f"[DB ERROR] Backup: archive {path} is missing; snapshot taken without it")
+                    continue
+                archive_source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+                try:
+                    _snapshot_file(archive_source, os.path.join(tmp_archives, name), pages, sleep)
+                finally:
+                    archive_source.close()
+            os.replace(tmp_archives, archives_dir(final_path))
+    except BaseException:
+        os.remove(tmp_path)
+        shutil.rmtree(tmp_archives, ignore_errors=True)
+        raise
+    # The main file goes last: a snapshot is listed only once it is complete
+    os.replace(tmp_path, final_path)
+    rotate_backups(backup_dir, keep)
+    return final_path
+
+def _snapshot_file(source: sqlite3.Connection, path: str, pages: int, sleep: float):
+    """Copy source to path as a single self-contained file and verify it"""
+    target = sqlite3.connect(path)
+    try:
+        _copy(source, target, pages, sleep)
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    result = integrity_check(path)
+    if result != 'ok':
+        os.remove(path)
+        raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+
+def list_backups(backup_dir: str) -> List[Dict]:
+    """Snapshots in backup_dir, newest first"""
+    backups = []
+    for path in glob.glob(os.path.join(backup_dir, f'{SNAPSHOT_PREFIX}*.db')):
+        stat = os.stat(path)
+        archives = sorted(glob.glob(os.path.join(archives_dir(path), '*.db')))
+        backups.append({'path': path, 'name': os.path.basename(path),
+                        'size': stat.st_size + sum(os.path.getsize(a) for a in archives),
+                        'archives': [os.path.basename(a) for a in archives],
+                        'modified': stat.st_mtime})
+    # Stems sort oldest first: billing-<stamp> < billing-<stamp>-1 < billing-<next stamp>
+    backups.sort(key=lambda b: os.path.splitext(b['name'])[0], reverse=True)
+    return backups
+
+def rotate_backups(backup_dir: str, keep: int) -> List[str]:
+    """Delete all but the newest keep snapshots; returns the removed paths"""
+    removed = []
+    for backup in list_backups(backup_dir)[max(keep, 1):]:
+        os.remove(backup['path'])
+        shutil.rmtree(archives_dir(backup['path']), ignore_errors=True)
+        removed.append(backup['path'])
+    return removed
+
+def restore_backup(snapshot_path: str, db_path: str) -> Optional[str]:
+    """Replace db_path's contents, and its archive files, with a verified snapshot (app must be closed).
+
+    The current database is first saved to the backups directory as a
+    before-restore snapshot (outside the rotation), whose path is returned.
+    """
+    snapshot_archives = sorted(glob.glob(os.path.join(archives_dir(snapshot_path), '*.db')))
+    for path in [snapshot_path] + snapshot_archives:
+        result = integrity_check(path)
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f"Snapshot {path} failed integrity check: {result}")
+    safety_named = None
+    if os.path.exists(db_path):
+        safety_path = create_backup(db_path, keep=10 ** 6, pages=-1)
+        safety_named = os.path.join(os.path.dirname(safety_path),
+                                    'before-restore-' + os.path.basename(safety_path))
+        if os.path.isdir(archives_dir(safety_path)):
+            os.replace(archives_dir(safety_path), archives_dir(safety_named))
+        os.replace(safety_path, safety_named)
+
+    db_dir = os.path.dirname(os.path.abspath(db_path))
+    targets = [(snapshot_path, db_path)] + [(path, os.path.join(db_dir, os.path.basename(path)))
+                                            for path in snapshot_archives]
+    for source_path, target_path in targets:
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        target = sqlite3.connect(target_path, timeout=5)
+        try:
+            source.backup(target)
+            target.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            target.close()
+            source.close()
+    return safety_named
+
+class BackupScheduler:
+    """Background thread taking a snapshot every interval_hours.
+
+    The first run happens INITIAL_DELAY seconds after start() if the newest
+    snapshot is older than the interval. last_backup / last_error record
+    the outcome for the UI.
+    """
+
+    INITIAL_DELAY = 60
+
+    def __init__(self, db_path: str, backup_dir: Optional[str] = None,
+                 interval_hours: float = 24, keep: int = KEEP):
+        self.db_path = db_path
+        self.backup_dir = backup_dir or default_backup_dir(db_path)
+        self.interval = interval_hours * 3600
+        self.keep = keep
+        self.last_backup = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._run_requested = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="BackupScheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_now(self):
+        """Ask the scheduler thread to take a snapshot immediately"""
+        self._run_requested = True
+        self._wake.set()
+
+    def _seconds_until_due(self) -> float:
+        backups = list_backups(self.backup_dir)
+        if not backups:
+            return 0
+        return max(0, backups[0]['modified'] + self.interval - time.time())
+
+    def _run(self):
+        self._wake.wait(max(self.INITIAL_DELAY, self._seconds_until_due()))
+        while not self._stopping:
+            self._wake.clear()
+            if self._run_requested or self._seconds_until_due() == 0:
+                self._run_requested = False
+                try:
+                    self.last_backup = create_backup(self.db_path, self.backup_dir, self.keep)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"[DB ERROR] Backup failed: {e}")
+            self._wake.wait(self._seconds_until_due() or self.interval)
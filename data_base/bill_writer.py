@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+class BillWriter:
+    """Write-behind queue that persists bills on a dedicated thread.
+
+    submit() reserves the bill ID, appends the bill to bill_journal.jsonl
+    next to the database (fsynced) and returns the ID, so checkout waits on
+    one small append rather than a transaction. The writer thread drains
+    whatever has queued up and commits it as one group transaction through
+    Database.save_bills, then drops the committed bills from the journal.
+    Bills still in the journal after a crash or power cut are saved by
+    replay_journal() when the database is next opened. When a batch fails
+    its bills are retried one at a time: a locked database is waited out for
+    up to BUSY_RETRIES attempts, while a bill that cannot be saved (bad
+    values, an ID that is already taken, a schema or disk error) is set aside
+    in failed_bills.jsonl next to the database so the bills queued after it
+    still get saved.
+    """
+
+    MAX_BATCH = 100
+    RETRY_DELAY = 1.0
+    BUSY_RETRIES = 30
+    FAILED_FILE = 'failed_bills.jsonl'
+    JOURNAL_FILE = 'bill_journal.jsonl'
+
+    def __init__(self, db):
+        self.db = db
+        self._queue = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        # Taken before _cond; keeps the journal in step with the queue
+        self._journal_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.last_error = None
+        self.failed_path = os.path.join(os.path.dirname(db.db_path), self.FAILED_FILE)
+        self._failed = self._count_failed()
+        self.journal_path = os.path.join(os.path.dirname(db.db_path), self.JOURNAL_FILE)
+
+    def submit(self, bill: Dict) -> int:
+        """Queue a bill for saving and return its reserved bill ID.
+
+        bill has the save_bill arguments as keys with line items under
+        'items'; its 'id' is filled in here.
+        """
+        if self._stopping:
+            raise RuntimeError("Bill writer has been stopped")
+        bill['id'] = self.db.reserve_bill_id()
+        with self._journal_lock:
+            # On disk before the caller prints or sends the bill
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(bill, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            with self._cond:
+                self._queue.append(bill)
+                self._ensure_thread()
+                self._cond.notify_all()
+        return bill['id']
+
+    def replay_journal(self) -> int:
+        """Save the bills a crash left in the journal. Returns how many were saved.
+
+        Call once when the database is opened, before any bill is submitted.
+        Bills that were committed before the journal was trimmed are skipped.
+        """
+        bills = self._read_journal()
+        saved = 0
+        if bills:
+            placeholders = ', '.join('?' * len(bills))
+            with self.db.read() as cursor:
+                cursor.execute(f'SELECT id FROM bills WHERE id IN ({placeholders})', [bill['id'] for bill in bills])
+                committed = {row[0] for row in cursor.fetchall()}
+            bills = [bill for bill in bills if bill['id'] not in committed]
+            if bills:
+                saved = self._save_batch(bills)
+                print(f"[DB] BillWriter: recovered {saved} bill(s) from {self.journal_path}")
+        self._trim_journal()
+        return saved
+
+    def pending_count(self) -> int:
+        """Number of submitted bills not yet committed"""
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    def failed_count(self) -> int:
+        """Number of bills set aside in failed_path because they could not be saved"""
+        with self._cond:
+            return self._failed
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every submitted bill is committed. Returns False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def stop(self, timeout: float = None) -> bool:
+        """Flush outstanding bills and stop the writer thread"""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return flushed
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="BillWriter", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> List[Dict]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._stopping)
+            batch = []
+            while self._queue and len(batch) < self.MAX_BATCH:
+                batch.append(self._queue.popleft())
+            self._in_flight = len(batch)
+            return batch
+
+    def _count_failed(self) -> int:
+        if not os.path.exists(self.failed_path):
+            return 0
+        with open(self.failed_path, encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+
+    def _set_aside(self, bill: Dict, error: Exception):
+        """Append a bill that cannot be saved to failed_path for manual recovery"""
+        record = {'failed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'error': str(error), 'bill': bill}
+        with open(self.failed_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+        with self._cond:
+            self._failed += 1
+        print(f"[DB ERROR] BillWriter: bill {bill.get('id')} set aside in {self.failed_path}: {error}")
+
+    def _read_journal(self) -> List[Dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+        bills = []
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    bills.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by the crash; its submit() never returned
+                    continue
+        return bills
+
+    def _trim_journal(self):
+        """Rewrite the journal with only the bills still queued"""
+        with self._journal_lock:
+            with self._cond:
+                pending = list(self._queue)
+            if not pending:
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                return
+            tmp_path = self.journal_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for bill in pending:
+                    f.write(json.dumps(bill, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def _save_one(self, bill: Dict) -> bool:
+        """Save a single bill, waiting out a locked database for a while before setting it aside"""
+        for attempt in range(self.BUSY_RETRIES):
+            try:
+                self.db.save_bills([bill])
+                return True
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == self.BUSY_RETRIES - 1:
+                    self._set_aside(bill, e)
+                    return False
+                self.last_error = str(e)
+                print(f"[DB ERROR] BillWriter: {e}; retrying bill {bill.get('id')}")
+                time.sleep(self.RETRY_DELAY)
+            except Exception as e:
+                self._set_aside(bill, e)
+                return False
+
+    def _save_batch(self, batch: List[Dict]) -> int:
+        """Save bills as one transaction, falling back to one at a time. Returns how many were saved"""
+        try:
+            self.db.save_bills(batch)
+            saved = len(batch)
+        except Exception as e:
+            # Find the bill(s) at fault so they do not hold back the rest
+            self.last_error = str(e)
+            print(f"[DB ERROR] BillWriter: {e}; saving {len(batch)} bill(s) one at a time")
+            saved = sum(self._save_one(bill) for bill in batch)
+        self.last_error = None
+        return saved
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._save_batch(batch)
+            self._trim_journal()
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    """Whether an error only means another connection holds the database for now"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
@@ -0,0 +1,59 @@
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Column order of a cached barcode_items row
+BARCODE_COLUMNS = ('id', 'barcode', 'name', 'hsn_code', 'quantity', 'base_price',
+                   'sgst_percent', 'cgst_percent', 'total_price')
+
+class BarcodeCatalog:
+    """In-memory barcode -> item cache for scan lookups.
+
+    Rows are kept as plain tuples (in BARCODE_COLUMNS order) and loaded in
+    one query on first use. Database writes through on add/update/delete
+    and invalidates on bulk imports.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple]]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._by_barcode: Optional[Dict[str, Tuple]] = None
+        self._barcode_by_id: Dict[int, str] = {}
+
+    def _ensure_loaded(self):
+        if self._by_barcode is None:
+            rows = list(self._loader())
+            self._by_barcode = {row[1]: row for row in rows}
+            self._barcode_by_id = {row[0]: row[1] for row in rows}
+
+    def get(self, barcode: str) -> Optional[Dict]:
+        """Cached item for barcode as a dict, or None"""
+        with self._lock:
+            self._ensure_loaded()
+            row = self._by_barcode.get(barcode)
+        return dict(zip(BARCODE_COLUMNS, row)) if row else None
+
+    def put(self, row: Tuple):
+        """Insert or replace one item row (write-through after a DB write)"""
+        with self._lock:
+            if self._by_barcode is None:
+                return
+            old_barcode = self._barcode_by_id.get(row[0])
+            if old_barcode is not None and old_barcode != row[1]:
+                self._by_barcode.pop(old_barcode, None)
+            self._by_barcode[row[1]] = row
+            self._barcode_by_id[row[0]] = row[1]
+
+    def remove(self, item_id: int):
+        """Drop the item with this id"""
+        with self._lock:
+            if self._by_barcode is None:
+                return
+            barcode = self._barcode_by_id.pop(item_id, None)
+            if barcode is not None:
+                self._by_barcode.pop(barcode, None)
+
+    def invalidate(self):
+        """Forget everything; the next lookup reloads from the database"""
+        with self._lock:
+            self._by_barcode = None
+            self._barcode_by_id = {}
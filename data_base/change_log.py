@@ -0,0 +1,88 @@
+"""Append-only log of row changes for downstream consumers.
+
+Triggers on the bill and catalog tables append (table_name, row_id, op)
+to change_log; seq is an AUTOINCREMENT key, so it only ever grows and is
+never reused, even after old entries are pruned. A consumer takes a full
+copy once, remembers head() at that moment, and from then on reads
+changes_since(its last seq) and fetches the rows it names. Entries record
+keys only: the current row is read from its table and a deleted row is
+simply gone. Bills moved out to a fiscal-year archive are logged with op
+'archive' rather than as deletes.
+"""
+
+from typing import Dict, List
+
+LOGGED_TABLES = ('bills', 'bill_items', 'barcode_items', 'loose_items', 'loose_categories')
+OPERATIONS = {'INSERT': ('insert', 'new'), 'UPDATE': ('update', 'new'), 'DELETE': ('delete', 'old')}
+
+class ChangeLogTruncated(Exception):
+    """The entries after the requested seq have been pruned; take a full copy again"""
+
+def create_table(cursor):
+    """Create change_log and the triggers that fill it"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete', 'archive')),
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for table in LOGGED_TABLES:
+        for event, (op, row) in OPERATIONS.items():
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_log_{op} AFTER {event} ON {table} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            ''')
+
+def head(cursor) -> int:
+    """Seq of the newest entry ever written (0 if none)"""
+    cursor.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)")
+    return cursor.fetchone()[0]
+
+def changes_since(cursor, seq: int, limit: int) -> List[Dict]:
+    """Up to limit entries with seq greater than the given one, oldest first.
+
+    Raises ChangeLogTruncated if entries right after seq were pruned.
+    """
+    cursor.execute('SELECT seq, table_name, row_id, op, changed_at FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?',
+                   (seq, limit))
+    entries = [{'seq': row[0], 'table': row[1], 'row_id': row[2], 'op': row[3], 'changed_at': row[4]}
+               for row in cursor.fetchall()]
+    first_kept = entries[0]['seq'] if entries else head(cursor) + 1
+    if first_kept > seq + 1:
+        # A gap is fine only if nothing was ever logged there; pruning is the one way to make one
+        cursor.execute("SELECT value FROM settings WHERE key = 'change_log_pruned_seq'")
+        pruned = cursor.fetchone()
+        if pruned is not None and int(pruned[0]) > seq:
+            raise ChangeLogTruncated(f"change log entries up to {pruned[0]} were pruned; asked for changes after {seq}")
+    return entries
+
+def mark_archived(cursor, after_seq: int):
+    """Turn the deletes logged by an archive move (entries after after_seq) into 'archive' entries.
+
+    Line items travel with their bill, so their delete entries are dropped.
+    """
+    cursor.execute("DELETE FROM change_log WHERE seq > ? AND table_name = 'bill_items' AND op = 'delete'",
+                   (after_seq,))
+    cursor.execute("UPDATE change_log SET op = 'archive' WHERE seq > ? AND table_name = 'bills' AND op = 'delete'",
+                   (after_seq,))
+
+def seq_before(cursor, cutoff: str) -> int:
+    """Seq of the first entry logged at or after cutoff (head() + 1 if none)"""
+    cursor.execute('SELECT seq FROM change_log WHERE changed_at >= ? ORDER BY seq LIMIT 1', (cutoff,))
+    row = cursor.fetchone()
+    return row[0] if row else head(cursor) + 1
+
+def prune(cursor, before_seq: int) -> int:
+    """Delete entries with seq below before_seq. Returns the number removed"""
+    cursor.execute('DELETE FROM change_log WHERE seq < ?', (before_seq,))
+    removed = cursor.rowcount
+    cursor.execute('''
+        INSERT INTO settings (key, value) VALUES ('change_log_pruned_seq', ?)
+        ON CONFLICT(key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER)),
+                                       updated_at = CURRENT_TIMESTAMP
+    ''', (before_seq - 1,))
+    return removed
@@ -0,0 +1,259 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from data_base.query_stats import QueryStats
+
+
+class ConnectionManager:
+    """Long-lived SQLite connections shared by a Database instance.
+
+    One writer connection is serialised behind a lock and used for every
+    transaction; each thread that reads gets its own reader connection.
+    All connections run in WAL mode so readers never block the writer.
+    Readers of threads that have exited are closed when the next reader is
+    opened; short-lived workers can close theirs with release_reader().
+    Reports and exports borrow from a small pool of read-only connections
+    (mode=ro, query_only) through reporting(), so long aggregates on
+    worker threads neither block nor are blocked by save_bill.
+    """
+
+    # Negative cache_size is in KiB (16 MB page cache per connection)
+    CACHE_SIZE_KB = 16 * 1024
+    MMAP_SIZE = 256 * 1024 * 1024
+    BUSY_TIMEOUT_MS = 5000
+    # Prepared statements kept per connection; long-lived connections reuse them
+    CACHED_STATEMENTS = 256
+    # Idle read-only reporting connections kept open for reuse
+    REPORT_POOL_SIZE = 2
+
+    def __init__(self, db_path: str, stats: QueryStats = None):
+        self.db_path = db_path
+        self.stats = stats or QueryStats(enabled=False)
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._tx_depth = 0
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._report_pool = queue.LifoQueue(self.REPORT_POOL_SIZE)
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Open a connection with the tuned pragmas applied"""
+        if read_only:
+            # The database is already in WAL mode; a read-only handle cannot set it
+            conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, isolation_level=None,
+                                   check_same_thread=False,
+                                   timeout=self.BUSY_TIMEOUT_MS / 1000,
+                                   cached_statements=self.CACHED_STATEMENTS)
+            conn.execute('PRAGMA query_only=1')
+        else:
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   check_same_thread=False,
+                                   timeout=self.BUSY_TIMEOUT_MS / 1000,
+                                   cached_statements=self.CACHED_STATEMENTS)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}')
+        return conn
+
+    def _cursor(self, conn: sqlite3.Connection):
+        """New cursor on conn, timed when query stats are enabled"""
+        return self.stats.wrap_cursor(conn.cursor(), conn)
+
+    @property
+    def writer(self) -> sqlite3.Connection:
+        """The shared writer connection (opened on first use)"""
+        if self._writer is None:
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = self._connect()
+        return self._writer
+
+    def reader(self) -> sqlite3.Connection:
+        """Reader connection for the calling thread (its reporting connection inside reporting())"""
+        conn = getattr(self._local, 'report_conn', None)
+        if conn is not None:
+            return conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                # Worker threads come and go; drop the readers they left behind
+                for thread, old in self._readers:
+                    if not thread.is_alive():
+                        self._close_quietly(old)
+                self._readers = [entry for entry in self._readers if entry[0].is_alive()]
+                self._readers.append((threading.current_thread(), conn))
+        return conn
+
+    def release_reader(self):
+        """Close the calling thread's reader connection, if it opened one"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._readers_lock:
+            self._readers = [entry for entry in self._readers if entry[1] is not conn]
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def reporting(self):
+        """Route this thread's read()/read_attached() to a pooled read-only connection.
+
+        Meant for worker threads running reports and exports; nested use
+        keeps the connection already borrowed.
+        """
+        if getattr(self._local, 'report_conn', None) is not None:
+            yield
+            return
+        try:
+            conn = self._report_pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect(read_only=True)
+        self._local.report_conn = conn
+        try:
+            yield
+        finally:
+            self._local.report_conn = None
+            try:
+                self._report_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor inside a write transaction.
+
+        Commits on normal exit and rolls back if the block raises. Nested
+        use on the same thread joins the outer transaction.
+        """
+        with self._write_lock:
+            conn = self.writer
+            cursor = self._cursor(conn)
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield cursor
+                finally:
+                    self._tx_depth -= 1
+                    cursor.close()
+                return
+            cursor.execute('BEGIN IMMEDIATE')
+            self._tx_depth = 1
+            try:
+                yield cursor
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                self._tx_depth = 0
+                cursor.close()
+
+    @contextmanager
+    def read(self):
+        """Yield a cursor on this thread's reader connection"""
+        cursor = self._cursor(self.reader())
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _attach(conn: sqlite3.Connection, databases: Dict[str, str]) -> list:
+        """ATTACH each {alias: path} not already attached; returns the aliases added"""
+        if not databases:
+            return []
+        attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+        added = []
+        for alias, path in databases.items():
+            if alias not in attached:
+                conn.execute(f'ATTACH DATABASE ? AS {alias}', (path,))
+                added.append(alias)
+        return added
+
+    @staticmethod
+    def _detach(conn: sqlite3.Connection, aliases: list):
+        for alias in aliases:
+            conn.execute(f'DETACH DATABASE {alias}')
+
+    @contextmanager
+    def read_attached(self, databases: Dict[str, str]):
+        """Yield a read cursor with extra database files attached as {alias: path}.
+
+        Databases attached here are detached again when the block exits.
+        """
+        conn = self.reader()
+        added = self._attach(conn, databases)
+        cursor = self._cursor(conn)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._detach(conn, added)
+
+    @contextmanager
+    def read_file(self, path: str):
+        """Yield a cursor on a separate read-only connection to another database file"""
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False,
+                               timeout=self.BUSY_TIMEOUT_MS / 1000)
+        cursor = self._cursor(conn)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            conn.close()
+
+    @contextmanager
+    def write_attached(self, databases: Dict[str, str]):
+        """Hold the writer with extra database files attached; use transaction() inside"""
+        with self._write_lock:
+            conn = self.writer
+            added = self._attach(conn, databases)
+            try:
+                yield
+            finally:
+                self._detach(conn, added)
+
+    @contextmanager
+    def autocommit(self):
+        """Yield a writer cursor outside any transaction (VACUUM, checkpoints)"""
+        with self._write_lock:
+            if self._tx_depth:
+                raise sqlite3.OperationalError("autocommit() cannot be used inside a transaction")
+            cursor = self._cursor(self.writer)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Close the writer and every reader connection"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for _, conn in self._readers:
+                self._close_quietly(conn)
+            self._readers = []
+        while True:
+            try:
+                self._report_pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._local = threading.local()
@@ -0,0 +1,128 @@
+"""Streaming CSV import for barcode and loose inventory items.
+
+Rows are parsed lazily and written in chunks of CHUNK_SIZE, each chunk in
+its own transaction through executemany, so memory stays flat on large
+supplier catalogs and the writer lock is released between chunks (bills
+keep saving during an import). A progress callback is called after every
+chunk and a cancel callback is polled before the next one; chunks already
+committed are kept when an import is cancelled.
+"""
+
+import csv
+import os
+from typing import Callable, Dict, Optional
+
+CHUNK_SIZE = 1000
+
+BARCODE_FIELDS = ["barcode", "name", "hsn_code", "quantity", "sgst", "cgst", "total_price"]
+LOOSE_FIELDS = ["category", "name", "hsn_code", "quantity", "sgst", "cgst", "total_price"]
+
+INSERT_BARCODE_SQL = '''INSERT OR IGNORE INTO barcode_items (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+UPDATE_BARCODE_PRICE_SQL = '''UPDATE barcode_items SET base_price = ?, sgst_percent = ?, cgst_percent = ?, total_price = ? WHERE barcode = ?'''
+INSERT_LOOSE_SQL = '''INSERT OR IGNORE INTO loose_items (category_id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+UPDATE_LOOSE_PRICE_SQL = '''UPDATE loose_items SET base_price = ?, sgst_percent = ?, cgst_percent = ?, total_price = ? WHERE category_id = ? AND name = ? AND hsn_code = ?'''
+
+def _price_fields(row) -> tuple:
+    """(base_price, sgst, cgst, total_price) from a CSV row"""
+    sgst = float(row["sgst"])
+    cgst = float(row["cgst"])
+    total_price = float(row["total_price"])
+    base_price = total_price / (1 + (sgst + cgst) / 100)
+    return base_price, sgst, cgst, total_price
+
+def _run_import(db, file_path: str, required_fields, existing_keys: set, parse_row,
+                insert_sql: str, update_sql: str, upsert: bool, duplicate_reason: str,
+                chunk_size: int, progress: Optional[Callable[[int, int], None]],
+                should_cancel: Optional[Callable[[], bool]]) -> Dict:
+    """Stream file_path into the database. parse_row(row) returns (key, insert_params)"""
+    result = {'added': 0, 'updated': 0, 'failed': 0, 'fail_rows': [], 'cancelled': False}
+    file_size = os.path.getsize(file_path) or 1
+    inserts, updates = [], []
+    rows_done = 0
+
+    def flush():
+        if inserts or updates:
+            with db.transaction() as cursor:
+                # Count what SQLite actually changed: INSERT OR IGNORE skips rows
+                # whose key was added since existing_keys was read
+                if inserts:
+                    cursor.executemany(insert_sql, inserts)
+                    result['added'] += cursor.rowcount
+                    result['failed'] += len(inserts) - cursor.rowcount
+                if updates:
+                    cursor.executemany(update_sql, updates)
+                    result['updated'] += cursor.rowcount
+            inserts.clear()
+            updates.clear()
+        if progress:
+            # Bytes consumed from the file (the text layer reads ahead in blocks)
+            progress(min(100, csvfile.buffer.tell() * 100 // file_size), rows_done)
+
+    with open(file_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for idx, row in enumerate(reader, start=2):  # start=2 for header row
+            rows_done += 1
+            if not all(field in row and row[field] and row[field].strip() for field in required_fields):
+                result['failed'] += 1
+                result['fail_rows'].append((idx, "Missing required fields"))
+            else:
+                try:
+                    key, params = parse_row(row)
+                    if key not in existing_keys:
+                        inserts.append(params)
+                        existing_keys.add(key)
+                    elif upsert:
+                        # Only prices and tax rates change; stock is left alone
+                        updates.append(params[4:8] + key)
+                    else:
+                        result['failed'] += 1
+                        result['fail_rows'].append((idx, duplicate_reason))
+                except Exception as e:
+                    result['failed'] += 1
+                    result['fail_rows'].append((idx, str(e)))
+            if rows_done % chunk_size == 0:
+                flush()
+                if should_cancel and should_cancel():
+                    result['cancelled'] = True
+                    return result
+        flush()
+    return result
+
+def import_barcode_items(db, file_path: str, upsert: bool = False, chunk_size: int = CHUNK_SIZE,
+                         progress=None, should_cancel=None) -> Dict:
+    """Import barcode items; with upsert, existing barcodes get the new prices"""
+    with db.read() as cursor:
+        cursor.execute('SELECT barcode FROM barcode_items')
+        existing_keys = {(row[0],) for row in cursor.fetchall()}
+
+    def parse_row(row):
+        barcode = row["barcode"].strip()
+        base_price, sgst, cgst, total_price = _price_fields(row)
+        params = (barcode, row["name"].strip(), row["hsn_code"].strip(), int(row["quantity"]),
+                  base_price, sgst, cgst, total_price)
+        return (barcode,), params
+
+    return _run_import(db, file_path, BARCODE_FIELDS, existing_keys, parse_row,
+                       INSERT_BARCODE_SQL, UPDATE_BARCODE_PRICE_SQL, upsert, "Duplicate barcode",
+                       chunk_size, progress, should_cancel)
+
+def import_loose_items(db, file_path: str, upsert: bool = False, chunk_size: int = CHUNK_SIZE,
+                       progress=None, should_cancel=None) -> Dict:
+    """Import loose items; with upsert, existing (category, name, hsn_code) items get the new prices"""
+    categories = {cat['name']: cat['id'] for cat in db.get_loose_categories()}
+    with db.read() as cursor:
+        cursor.execute('SELECT category_id, name, hsn_code FROM loose_items')
+        existing_keys = set(cursor.fetchall())
+
+    def parse_row(row):
+        category_name = row["category"].strip()
+        if category_name not in categories:
+            raise ValueError(f"Category '{category_name}' not found")
+        key = (categories[category_name], row["name"].strip(), row["hsn_code"].strip())
+        base_price, sgst, cgst, total_price = _price_fields(row)
+        return key, key + (int(row["quantity"]), base_price, sgst, cgst, total_price)
+
+    return _run_import(db, file_path, LOOSE_FIELDS, existing_keys, parse_row,
+                       INSERT_LOOSE_SQL, UPDATE_LOOSE_PRICE_SQL, upsert,
+                       "Duplicate item (category, name, hsn_code)",
+                       chunk_size, progress, should_cancel)
@@ -0,0 +1,54 @@
+"""Customers table kept in step with bills.
+
+One row per (name, phone) pair with first/last visit, visit count and
+lifetime spend in paise. name uses NOCASE collation, so the unique
+(name, phone) index also serves case-insensitive prefix searches for the
+name completer; phone has its own index. save_bill folds each new bill in
+with apply_bill(); rebuild() recomputes the table from raw bills.
+"""
+
+from data_base.archive import union_all
+
+def create_table(cursor):
+    """Create the customers table and its indexes"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL COLLATE NOCASE,
+            phone TEXT NOT NULL DEFAULT '',
+            first_visit TIMESTAMP,
+            last_visit TIMESTAMP,
+            visit_count INTEGER NOT NULL DEFAULT 0,
+            total_spent_paise INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_name_phone ON customers (name, phone)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone)')
+
+def apply_bill(cursor, bill_id: int):
+    """Add one saved bill to its customer (call inside the saving transaction)"""
+    cursor.execute('''
+        INSERT INTO customers (name, phone, first_visit, last_visit, visit_count, total_spent_paise)
+        SELECT customer_name, COALESCE(customer_phone, ''), created_at, created_at, 1, total_amount_paise
+        FROM bills WHERE id = ?
+        ON CONFLICT(name, phone) DO UPDATE SET
+            first_visit = MIN(first_visit, excluded.first_visit),
+            last_visit = MAX(last_visit, excluded.last_visit),
+            visit_count = visit_count + 1,
+            total_spent_paise = total_spent_paise + excluded.total_spent_paise
+    ''', (bill_id,))
+
+def rebuild(cursor, schemas=('main',)) -> int:
+    """Recompute customers from bills in these schemas. Returns the number of customers"""
+    cursor.execute('DELETE FROM main.customers')
+    bills = union_all('''
+        SELECT customer_name, COALESCE(customer_phone, '') AS phone, created_at, total_amount_paise
+        FROM {schema}.bills''', schemas)
+    cursor.execute(f'''
+        INSERT INTO main.customers (name, phone, first_visit, last_visit, visit_count, total_spent_paise)
+        SELECT customer_name, phone, MIN(created_at), MAX(created_at), COUNT(*), SUM(total_amount_paise)
+        FROM ({bills})
+        GROUP BY customer_name COLLATE NOCASE, phone
+    ''')
+    cursor.execute('SELECT COUNT(*) FROM main.customers')
+    return cursor.fetchone()[0]
@@ -1,327 +1,298 @@
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Tuple, Optional, Dict
+from datetime import datetime, timedelta
+from typing import List, Tuple, Optional, Dict, Iterator
 import sys
-import csv
+import re
+import json
+import threading
+import time
+from data_base.connection_manager import ConnectionManager
+from data_base.migrations import apply_migrations, backfill_item_refs
+from data_base import rollups
+from data_base import customers
+from data_base import change_log
+from data_base import stock
+from data_base import csv_import
+from data_base import money
+from data_base import archive
+from data_base import backup
+from data_base import maintenance
+from data_base import sync
+from data_base.sync_client import SyncClient
+from data_base.bill_writer import BillWriter
+from data_base.catalog_cache import BarcodeCatalog
+from data_base.settings_store import SettingsStore
+from data_base.query_stats import QueryStats, timed_methods, untimed
 
+def default_db_path() -> str:
+    """Location of billing.db next to the running script or bundle"""
+    if getattr(sys, 'frozen', False):
+        # Running as a PyInstaller bundle
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        # Running as a script
+        base_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+    return os.path.join(base_dir, 'data_base', 'billing.db')
+
+def date_range_bounds(start_date: str, end_date: str) -> Tuple[str, str]:
+    """Half-open [start, end + 1 day) created_at bounds for inclusive YYYY-MM-DD dates.
+
+    Comparing created_at directly against these bounds lets SQLite use the
+    created_at index, unlike DATE(created_at) BETWEEN ? AND ?.
+    """
+    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    return start_date, end.strftime('%Y-%m-%d')
+
+# Statement text shared by every bill insert so the connection's prepared statement cache is reused
+INSERT_BILL_SQL = '''
+    INSERT INTO bills (id, customer_name, customer_phone, total_amount, total_items, total_weight, total_sgst, total_cgst,
+    total_amount_paise, total_sgst_paise, total_cgst_paise)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_BILL_ITEM_SQL = '''
+    INSERT INTO bill_items (bill_id, item_name, hsn_code, quantity, base_price, 
+    sgst_percent, cgst_percent, sgst_amount, cgst_amount, final_price, item_type,
+    base_price_paise, sgst_amount_paise, cgst_amount_paise, final_price_paise,
+    item_ref_id, category_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+BILL_COLUMNS = '''id, customer_name, customer_phone, total_amount, total_items,
+    total_weight, total_sgst, total_cgst, created_at'''
+BILL_ITEM_COLUMNS = '''item_name, hsn_code, quantity, base_price, sgst_percent, cgst_percent,
+    sgst_amount, cgst_amount, final_price, item_type'''
+
+def bill_from_row(row) -> Dict:
+    """Bill header dict from a row of BILL_COLUMNS"""
+    return {
+        'id': row[0],
+        'customer_name': row[1],
+        'customer_phone': row[2],
+        'total_amount': row[3],
+        'total_items': row[4],
+        'total_weight': row[5],
+        'total_sgst': row[6],
+        'total_cgst': row[7],
+        'created_at': row[8]
+    }
+
+def bill_item_from_row(row) -> Dict:
+    """Bill line item dict from a row of BILL_ITEM_COLUMNS"""
+    return {
+        'name': row[0],
+        'hsn_code': row[1],
+        'quantity': row[2],
+        'base_price': row[3],
+        'sgst_percent': row[4],
+        'cgst_percent': row[5],
+        'sgst_amount': row[6],
+        'cgst_amount': row[7],
+        'final_price': row[8],
+        'item_type': row[9]
+    }
+
+_instances: Dict[str, 'Database'] = {}
+_instances_lock = threading.Lock()
+
+def get_database(db_path: str = None) -> 'Database':
+    """Return the process-wide Database for db_path, initialising it on first use"""
+    key = os.path.abspath(db_path or default_db_path())
+    db = _instances.get(key)
+    if db is None:
+        with _instances_lock:
+            db = _instances.get(key)
+            if db is None:
+                db = Database(key)
+                _instances[key] = db
+    return db
+
+def close_all_databases():
+    """Close and forget every shared Database instance"""
+    with _instances_lock:
+        for db in _instances.values():
+            db.close()
+        _instances.clear()
+
+@timed_methods
 class Database:
     def __init__(self, db_path: str = None):
         if db_path is None:
-            if getattr(sys, 'frozen', False):
-                # Running as a PyInstaller bundle
-                base_dir = os.path.dirname(sys.executable)
-            else:
-                # Running as a script
-                base_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-            db_path = os.path.join(base_dir, 'data_base', 'billing.db')
+            db_path = default_db_path()
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.db_path = db_path
+        self.query_stats = QueryStats()
+        self.connections = ConnectionManager(db_path, self.query_stats)
         self.init_database()
+        self._fts_available = self._has_table('bills_fts')
+        self._next_bill_id = None
+        self._bill_id_lock = threading.Lock()
+        self._bill_id_step = 1
+        self._bill_writer = None
+        self.barcode_catalog = BarcodeCatalog(self._load_barcode_rows)
+        self.settings = SettingsStore(self.connections)
+        if self.settings.get_bool('query_timing'):
+            self.query_stats.enabled = True
+        self._archives = None
+        self._upgraded_archives = set()
+        self._backup_scheduler = None
+        self._maintenance_scheduler = None
+        self._sync_client = None
+        self._last_activity = time.monotonic()
+        # Save any bills a crash left between checkout and commit
+        self.bill_writer.replay_journal()
     
     def init_database(self):
-        """Initialize the database with all required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create barcode_items table with new GST fields
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS barcode_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                barcode TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                hsn_code TEXT DEFAULT '',
-                quantity INTEGER DEFAULT 1,
-                base_price REAL NOT NULL,
-                sgst_percent REAL DEFAULT 0,
-                cgst_percent REAL DEFAULT 0,
-                total_price REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create loose_categories table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS loose_categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create loose_items table with new GST fields
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS loose_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                hsn_code TEXT DEFAULT '',
-                quantity INTEGER DEFAULT 1,
-                base_price REAL NOT NULL,
-                sgst_percent REAL DEFAULT 0,
-                cgst_percent REAL DEFAULT 0,
-                total_price REAL NOT NULL,
-                image_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (category_id) REFERENCES loose_categories (id)
-            )
-        ''')
-        # Add unique index for loose_items
-        cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_loose_items_unique ON loose_items (category_id, name, hsn_code)''')
-        
-        # Create bills table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bills (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_name TEXT NOT NULL,
-                customer_phone TEXT,
-                total_amount REAL NOT NULL,
-                total_items INTEGER NOT NULL,
-                total_weight REAL DEFAULT 0,
-                total_sgst REAL DEFAULT 0,
-                total_cgst REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create bill_items table with GST fields
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bill_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bill_id INTEGER NOT NULL,
-                item_name TEXT NOT NULL,
-                hsn_code TEXT DEFAULT '',
-                quantity REAL NOT NULL,
-                base_price REAL NOT NULL,
-                sgst_percent REAL DEFAULT 0,
-                cgst_percent REAL DEFAULT 0,
-                sgst_amount REAL DEFAULT 0,
-                cgst_amount REAL DEFAULT 0,
-                final_price REAL NOT NULL,
-                item_type TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (bill_id) REFERENCES bills (id)
-            )
-        ''')
-        
-        # Create admin_details table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS admin_details (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                shop_name TEXT NOT NULL DEFAULT 'My Shop',
-                address TEXT NOT NULL DEFAULT 'Shop Address',
-                phone_number TEXT NOT NULL DEFAULT '1234567890',
-                gmail TEXT NOT NULL DEFAULT '',
-                use_credentials BOOLEAN NOT NULL DEFAULT 0,
-                username TEXT NOT NULL DEFAULT 'admin',
-                password TEXT NOT NULL DEFAULT 'admin123',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        # --- MIGRATION: Ensure 'location' and 'gmail' columns exist ---
-        cursor.execute("PRAGMA table_info(admin_details)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'location' not in columns:
-            cursor.execute("ALTER TABLE admin_details ADD COLUMN location TEXT DEFAULT ''")
-        if 'gmail' not in columns:
-            cursor.execute("ALTER TABLE admin_details ADD COLUMN gmail TEXT DEFAULT ''")
-        
-        # Migrate existing data if needed
-        self._migrate_existing_data(cursor)
-        
-        # Insert default categories and items
-        self._insert_default_data(cursor)
-        
-        # Insert default admin details if not exists
-        self._insert_default_admin_data(cursor)
-        
-        conn.commit()
-        conn.close()
-    
-    def _migrate_existing_data(self, cursor):
-        """Migrate existing data to new schema"""
-        # Check if old columns exist and migrate
-        cursor.execute("PRAGMA table_info(barcode_items)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'hsn_code' not in columns:
-            # Add new columns to barcode_items
-            cursor.execute('ALTER TABLE barcode_items ADD COLUMN hsn_code TEXT DEFAULT ""')
-            cursor.execute('ALTER TABLE barcode_items ADD COLUMN quantity INTEGER DEFAULT 0')
-            cursor.execute('ALTER TABLE barcode_items ADD COLUMN sgst_percent REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE barcode_items ADD COLUMN cgst_percent REAL DEFAULT 0')
-            
-            # Rename price to base_price and add total_price
-            try:
-                cursor.execute('ALTER TABLE barcode_items RENAME COLUMN price TO base_price')
-            except:
-                pass
-            
-            try:
-                cursor.execute('ALTER TABLE barcode_items ADD COLUMN total_price REAL')
-                cursor.execute('UPDATE barcode_items SET total_price = base_price WHERE total_price IS NULL')
-            except:
-                pass
-        
-        # Similar migration for loose_items
-        cursor.execute("PRAGMA table_info(loose_items)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'hsn_code' not in columns:
-            cursor.execute('ALTER TABLE loose_items ADD COLUMN hsn_code TEXT DEFAULT ""')
-            cursor.execute('ALTER TABLE loose_items ADD COLUMN quantity INTEGER DEFAULT 0')
-            cursor.execute('ALTER TABLE loose_items ADD COLUMN sgst_percent REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE loose_items ADD COLUMN cgst_percent REAL DEFAULT 0')
-            
-            try:
-                cursor.execute('ALTER TABLE loose_items RENAME COLUMN price_per_kg TO base_price')
-            except:
-                pass
-            
-            try:
-                cursor.execute('ALTER TABLE loose_items ADD COLUMN total_price REAL')
-                cursor.execute('UPDATE loose_items SET total_price = base_price WHERE total_price IS NULL')
-            except:
-                pass
-        
-        # Migrate bills table
-        cursor.execute("PRAGMA table_info(bills)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'total_sgst' not in columns:
-            cursor.execute('ALTER TABLE bills ADD COLUMN total_sgst REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE bills ADD COLUMN total_cgst REAL DEFAULT 0')
-        
-        # Migrate bill_items table
-        cursor.execute("PRAGMA table_info(bill_items)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'hsn_code' not in columns:
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN hsn_code TEXT DEFAULT ""')
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN base_price REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN sgst_percent REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN cgst_percent REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN sgst_amount REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN cgst_amount REAL DEFAULT 0')
-            cursor.execute('ALTER TABLE bill_items ADD COLUMN final_price REAL DEFAULT 0')
-            
-            # Update existing records
-            cursor.execute('UPDATE bill_items SET base_price = unit_price, final_price = subtotal WHERE base_price = 0')
-    
-    def _insert_default_data(self, cursor):
-        """Insert default categories and items if they don't exist"""
-        # Only insert if tables are empty
-        cursor.execute('SELECT COUNT(*) FROM loose_categories')
-        if cursor.fetchone()[0] == 0:
-            # Insert default categories
-            default_categories = ['Rice', 'Dals', 'Spices', 'Oil', 'Vegetables']
-            for category in default_categories:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO loose_categories (name) VALUES (?)
-                ''', (category,))
-            
-            # Insert some default loose items with GST
-            default_items = [
-                ('Rice', 'Basmati Rice', '1006', 80.0, 2.5, 2.5),
-                ('Rice', 'Sona Masoori Rice', '1006', 65.0, 2.5, 2.5),
-                ('Dals', 'Toor Dal', '0713', 120.0, 2.5, 2.5),
-                ('Dals', 'Moong Dal', '0713', 110.0, 2.5, 2.5),
-                ('Spices', 'Turmeric Powder', '0910', 200.0, 2.5, 2.5),
-                ('Spices', 'Red Chilli Powder', '0904', 180.0, 2.5, 2.5),
-                ('Oil', 'Sunflower Oil', '1512', 150.0, 2.5, 2.5),
-                ('Oil', 'Coconut Oil', '1513', 180.0, 2.5, 2.5),
-            ]
-            for category_name, item_name, hsn, total_price, sgst, cgst in default_items:
-                base_price = total_price / (1 + (sgst + cgst) / 100)
-                cursor.execute('''
-                    INSERT OR IGNORE INTO loose_items (category_id, name, hsn_code, base_price, sgst_percent, cgst_percent, total_price)
-                    SELECT id, ?, ?, ?, ?, ?, ? FROM loose_categories WHERE name = ?
-                ''', (item_name, hsn, base_price, sgst, cgst, total_price, category_name))
-        
-        # Insert default barcode items if table is empty
-        cursor.execute('SELECT COUNT(*) FROM barcode_items')
-        if cursor.fetchone()[0] == 0:
-            default_barcodes = [
-                ('12345678', 'Kit Kat', '1704', 10.0, 6.0, 6.0),
-                ('23456789', 'Dairy Milk', '1704', 20.0, 6.0, 6.0),
-                ('34567890', '5 Star', '1704', 10.0, 6.0, 6.0),
-                ('45678901', 'Perk', '1704', 10.0, 6.0, 6.0),
-                ('56789012', 'Munch', '1704', 5.0, 6.0, 6.0),
-            ]
-            for barcode, name, hsn, total_price, sgst, cgst in default_barcodes:
-                base_price = total_price / (1 + (sgst + cgst) / 100)
-                cursor.execute('''
-                    INSERT OR IGNORE INTO barcode_items (barcode, name, hsn_code, base_price, sgst_percent, cgst_percent, total_price) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (barcode, name, hsn, base_price, sgst, cgst, total_price))
-    
-    def _insert_default_admin_data(self, cursor):
-        """Insert default admin details if they don't exist"""
-        cursor.execute('SELECT COUNT(*) FROM admin_details')
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO admin_details (shop_name, address, phone_number, gmail, use_credentials, username, password) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', ('My Shop', 'Shop Address', '1234567890', '', False, 'admin', 'admin123'))
+        """Initialize the database by applying any pending schema migrations"""
+        apply_migrations(self.connections)
     
     def get_connection(self):
-        """Get database connection"""
+        """Open a standalone connection (prefer transaction()/read() for app code)"""
         return sqlite3.connect(self.db_path)
     
+    @untimed
+    def transaction(self):
+        """Context manager yielding a cursor inside a write transaction"""
+        return self.connections.transaction()
+    
+    @untimed
+    def read(self):
+        """Context manager yielding a cursor on this thread's reader connection"""
+        return self.connections.read()
+    
+    @untimed
+    def reporting(self):
+        """Context manager sending this thread's reads to the read-only reporting pool"""
+        return self.connections.reporting()
+    
+    @untimed
+    def release_reader(self):
+        """Close this thread's reader connection; called by worker threads as they finish"""
+        self.connections.release_reader()
+    
+    def _has_table(self, name: str) -> bool:
+        """Check whether a table (or virtual table) exists"""
+        with self.connections.read() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+            return cursor.fetchone() is not None
+    
+    @property
+    def bill_writer(self) -> BillWriter:
+        """Write-behind queue for saving bills off the GUI thread"""
+        if self._bill_writer is None:
+            with self._bill_id_lock:
+                if self._bill_writer is None:
+                    self._bill_writer = BillWriter(self)
+        return self._bill_writer
+    
+    @property
+    def backup_scheduler(self) -> backup.BackupScheduler:
+        """Periodic snapshot thread configured by the backup_* settings"""
+        if self._backup_scheduler is None:
+            self._backup_scheduler = backup.BackupScheduler(
+                self.db_path,
+                interval_hours=self.settings.get_int('backup_interval_hours', 24),
+                keep=self.settings.get_int('backup_keep', backup.KEEP))
+        return self._backup_scheduler
+    
+    def backup_now(self, keep: int = None) -> str:
+        """Take a verified snapshot now and return its path"""
+        return backup.create_backup(self.db_path, keep=keep or self.settings.get_int('backup_keep', backup.KEEP))
+    
+    @property
+    def maintenance_scheduler(self) -> maintenance.MaintenanceScheduler:
+        """Idle-time maintenance thread configured by the maintenance_* settings"""
+        if self._maintenance_scheduler is None:
+            self._maintenance_scheduler = maintenance.MaintenanceScheduler(
+                self,
+                idle_minutes=self.settings.get_int('maintenance_idle_minutes', maintenance.IDLE_MINUTES),
+                interval_hours=self.settings.get_int('maintenance_interval_hours', maintenance.INTERVAL_HOURS))
+        return self._maintenance_scheduler
+    
+    def note_activity(self):
+        """Record billing activity; maintenance waits until the counter has been idle"""
+        self._last_activity = time.monotonic()
+    
+    def idle_seconds(self) -> float:
+        """Seconds since the last bill or cart change"""
+        return time.monotonic() - self._last_activity
+    
+    def run_maintenance(self, integrity: bool = True) -> Dict:
+        """ANALYZE/optimize, incremental vacuum, WAL checkpoint and integrity check.
+
+        The report ({'finished_at', 'results'}) is saved for Admin Settings
+        and returned.
+        """
+        results = maintenance.run_maintenance(self.connections,
+                                              auto_vacuum=self.settings.get_str('auto_vacuum', 'incremental'),
+                                              integrity=integrity)
+        report = {'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'results': results}
+        self.update_admin_setting('maintenance_last_report', json.dumps(report))
+        return report
+    
+    def last_maintenance(self) -> Optional[Dict]:
+        """Report of the last maintenance run, or None if it never ran"""
+        try:
+            return json.loads(self.settings.get_str('maintenance_last_report')) or None
+        except ValueError:
+            return None
+    
+    def set_query_timing(self, enabled: bool) -> bool:
+        """Turn query timing on or off and remember the choice"""
+        self.query_stats.enabled = enabled
+        return self.update_admin_setting('query_timing', '1' if enabled else '0')
+    
+    def close(self):
+        """Flush queued bills, stop background jobs and close all pooled connections"""
+        if self._bill_writer is not None:
+            self._bill_writer.stop()
+        if self._backup_scheduler is not None:
+            self._backup_scheduler.stop(timeout=5)
+        if self._maintenance_scheduler is not None:
+            self._maintenance_scheduler.stop(timeout=5)
+        if self._sync_client is not None:
+            self._sync_client.stop(timeout=5)
+        self.connections.close()
+    
     # Barcode Items Methods
+    def _load_barcode_rows(self) -> List[Tuple]:
+        """All barcode_items rows for the catalog cache"""
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT id, barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price 
+                FROM barcode_items
+            ''')
+            return cursor.fetchall()
+    
     def add_barcode_item(self, barcode: str, name: str, hsn_code: str, quantity: int, 
                         total_price: float, sgst_percent: float, cgst_percent: float) -> bool:
         """Add a new barcode item (user supplies final price)"""
         try:
             base_price = total_price / (1 + (sgst_percent + cgst_percent) / 100)
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO barcode_items (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO barcode_items (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price))
+                item_id = cursor.lastrowid
+            self.barcode_catalog.put((item_id, barcode, name, hsn_code, quantity, base_price,
+                                      sgst_percent, cgst_percent, total_price))
             return True
         except sqlite3.IntegrityError:
             return False
     
     def get_barcode_item(self, barcode: str) -> Optional[Dict]:
-        """Get barcode item by barcode"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price 
-            FROM barcode_items WHERE barcode = ?
-        ''', (barcode,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result:
-            return {
-                'id': result[0],
-                'barcode': result[1],
-                'name': result[2],
-                'hsn_code': result[3],
-                'quantity': result[4],
-                'base_price': result[5],
-                'sgst_percent': result[6],
-                'cgst_percent': result[7],
-                'total_price': result[8]
-            }
-        return None
+        """Get barcode item by barcode (served from the in-memory catalog)"""
+        return self.barcode_catalog.get(barcode)
     
     def get_all_barcode_items(self) -> List[Dict]:
         """Get all barcode items"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price 
-            FROM barcode_items ORDER BY name
-        ''')
-        results = cursor.fetchall()
-        conn.close()
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT id, barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price 
+                FROM barcode_items ORDER BY name
+            ''')
+            results = cursor.fetchall()
         
         return [
             {
@@ -343,14 +314,15 @@ class Database:
         """Update barcode item (user supplies final price)"""
         try:
             base_price = total_price / (1 + (sgst_percent + cgst_percent) / 100)
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE barcode_items SET barcode = ?, name = ?, hsn_code = ?, quantity = ?, 
-                base_price = ?, sgst_percent = ?, cgst_percent = ?, total_price = ? WHERE id = ?
-            ''', (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, item_id))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE barcode_items SET barcode = ?, name = ?, hsn_code = ?, quantity = ?, 
+                    base_price = ?, sgst_percent = ?, cgst_percent = ?, total_price = ? WHERE id = ?
+                ''', (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, item_id))
+                updated = cursor.rowcount
+            if updated:
+                self.barcode_catalog.put((item_id, barcode, name, hsn_code, quantity, base_price,
+                                          sgst_percent, cgst_percent, total_price))
             return True
         except sqlite3.IntegrityError:
             return False
@@ -358,11 +330,9 @@ class Database:
     def delete_barcode_item(self, item_id: int) -> bool:
         """Delete barcode item"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM barcode_items WHERE id = ?', (item_id,))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('DELETE FROM barcode_items WHERE id = ?', (item_id,))
+            self.barcode_catalog.remove(item_id)
             return True
         except:
             return False
@@ -370,28 +340,25 @@ class Database:
     # Loose Items Methods
     def get_loose_categories(self) -> List[Dict]:
         """Get all loose categories"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM loose_categories ORDER BY name')
-        results = cursor.fetchall()
-        conn.close()
+        with self.connections.read() as cursor:
+            cursor.execute('SELECT id, name FROM loose_categories ORDER BY name')
+            results = cursor.fetchall()
         
         return [{'id': row[0], 'name': row[1]} for row in results]
     
     def get_loose_items_by_category(self, category_id: int) -> List[Dict]:
         """Get loose items by category"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path 
-            FROM loose_items WHERE category_id = ? ORDER BY name
-        ''', (category_id,))
-        results = cursor.fetchall()
-        conn.close()
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path 
+                FROM loose_items WHERE category_id = ? ORDER BY name
+            ''', (category_id,))
+            results = cursor.fetchall()
         
         return [
             {
                 'id': row[0],
+                'category_id': category_id,
                 'name': row[1],
                 'hsn_code': row[2],
                 'quantity': row[3],
@@ -407,28 +374,32 @@ class Database:
     def add_loose_category(self, name: str) -> bool:
         """Add a new loose category"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('INSERT INTO loose_categories (name) VALUES (?)', (name,))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('INSERT INTO loose_categories (name) VALUES (?)', (name,))
             return True
         except sqlite3.IntegrityError:
             return False
     
+    def delete_loose_category(self, category_id: int) -> bool:
+        """Delete a loose category together with its items"""
+        try:
+            with self.connections.transaction() as cursor:
+                cursor.execute('DELETE FROM loose_items WHERE category_id = ?', (category_id,))
+                cursor.execute('DELETE FROM loose_categories WHERE id = ?', (category_id,))
+            return True
+        except:
+            return False
+    
     def add_loose_item(self, category_id: int, name: str, hsn_code: str, quantity: int,
                       total_price: float, sgst_percent: float, cgst_percent: float, image_path: str = None) -> bool:
         """Add a new loose item (user supplies final price)"""
         try:
             base_price = total_price / (1 + (sgst_percent + cgst_percent) / 100)
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO loose_items (category_id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (category_id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO loose_items (category_id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (category_id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path))
             return True
         except:
             return False
@@ -438,13 +409,10 @@ class Database:
         """Update loose item (user supplies final price)"""
         try:
             base_price = total_price / (1 + (sgst_percent + cgst_percent) / 100)
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE loose_items SET name = ?, hsn_code = ?, quantity = ?, base_price = ?, sgst_percent = ?, cgst_percent = ?, total_price = ?, image_path = ? WHERE id = ?
-            ''', (name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path, item_id))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE loose_items SET name = ?, hsn_code = ?, quantity = ?, base_price = ?, sgst_percent = ?, cgst_percent = ?, total_price = ?, image_path = ? WHERE id = ?
+                ''', (name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price, image_path, item_id))
             return True
         except:
             return False
@@ -452,11 +420,8 @@ class Database:
     def delete_loose_item(self, item_id: int) -> bool:
         """Delete loose item"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM loose_items WHERE id = ?', (item_id,))
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as cursor:
+                cursor.execute('DELETE FROM loose_items WHERE id = ?', (item_id,))
             return True
         except:
             return False
@@ -466,42 +431,116 @@ class Database:
                   total_amount: float, total_items: int, total_weight: float, 
                   total_sgst: float, total_cgst: float) -> int:
         """Save a new bill and return bill ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Insert bill
-        cursor.execute('''
-            INSERT INTO bills (customer_name, customer_phone, total_amount, total_items, total_weight, total_sgst, total_cgst)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (customer_name, customer_phone, total_amount, total_items, total_weight, total_sgst, total_cgst))
-        
-        bill_id = cursor.lastrowid
+        with self.connections.transaction() as cursor:
+            bill_id = self._insert_bill(cursor, customer_name, customer_phone, bill_items,
+                                        total_amount, total_items, total_weight, total_sgst, total_cgst)
+        self._refresh_sold_items(bill_items)
+        return bill_id
+    
+    def save_bills(self, bills: List[Dict]) -> List[int]:
+        """Save many bills in one transaction (imports and replay). Returns their IDs.
+
+        Each bill dict has the save_bill arguments as keys, with its line
+        items under 'items'.
+        """
+        with self.connections.transaction() as cursor:
+            bill_ids = [
+                self._insert_bill(cursor, bill['customer_name'], bill.get('customer_phone'), bill['items'],
+                                  bill['total_amount'], bill['total_items'], bill.get('total_weight', 0),
+                                  bill.get('total_sgst', 0), bill.get('total_cgst', 0), bill.get('id'))
+                for bill in bills
+            ]
+        self._refresh_sold_items(item for bill in bills for item in bill['items'])
+        return bill_ids
+    
+    def reserve_bill_id(self) -> int:
+        """Allocate the next bill ID up front (used by write-behind saves)"""
+        with self._bill_id_lock:
+            if self._next_bill_id is None:
+                with self.connections.read() as cursor:
+                    cursor.execute('''
+                        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'bills'), 0),
+                                   COALESCE((SELECT MAX(id) FROM bills), 0))
+                    ''')
+                    # In multi-counter mode IDs step by the stride so counters never collide
+                    counter_id = self.counter_id()
+                    self._next_bill_id = sync.next_bill_id(cursor.fetchone()[0], counter_id)
+                    self._bill_id_step = sync.bill_id_step(counter_id)
+            bill_id = self._next_bill_id
+            self._next_bill_id += self._bill_id_step
+            self._last_activity = time.monotonic()
+            return bill_id
+    
+    def _insert_bill(self, cursor, customer_name, customer_phone, bill_items,
+                     total_amount, total_items, total_weight, total_sgst, total_cgst,
+                     bill_id: Optional[int] = None) -> int:
+        """Insert one bill with its items and rollups using an open transaction cursor"""
+        if bill_id is None:
+            bill_id = self.reserve_bill_id()
+        # Money is stored as exact paise; the REAL columns mirror it for older readers
+        amount_paise = money.to_paise(total_amount)
+        sgst_paise = money.to_paise(total_sgst)
+        cgst_paise = money.to_paise(total_cgst)
+        cursor.execute(INSERT_BILL_SQL, (bill_id, customer_name, customer_phone, money.from_paise(amount_paise),
+                                         total_items, total_weight, money.from_paise(sgst_paise),
+                                         money.from_paise(cgst_paise), amount_paise, sgst_paise, cgst_paise))
         
-        # Insert bill items
+        # Insert all bill items with one prepared statement
+        item_rows = []
         for item in bill_items:
-            cursor.execute('''
-                INSERT INTO bill_items (bill_id, item_name, hsn_code, quantity, base_price, 
-                sgst_percent, cgst_percent, sgst_amount, cgst_amount, final_price, item_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (bill_id, item['name'], item['hsn_code'], item['quantity'], item['base_price'],
-                  item['sgst_percent'], item['cgst_percent'], item['sgst_amount'], 
-                  item['cgst_amount'], item['final_price'], item['item_type']))
-        
-        conn.commit()
-        conn.close()
+            base_price, sgst_amount, cgst_amount, final_price = money.item_paise(item)
+            item_rows.append((bill_id, item['name'], item['hsn_code'], item['quantity'], item['base_price'],
+                              item['sgst_percent'], item['cgst_percent'], money.from_paise(sgst_amount),
+                              money.from_paise(cgst_amount), money.from_paise(final_price), item['item_type'],
+                              base_price, sgst_amount, cgst_amount, final_price,
+                              item.get('item_ref_id'), item.get('category_id')))
+        cursor.executemany(INSERT_BILL_ITEM_SQL, item_rows)
+        self._index_bill(cursor, bill_id, [item['name'] for item in bill_items])
         return bill_id
     
+    def _index_bill(self, cursor, bill_id: int, item_names: List[str]):
+        """Update bill search, daily rollups and the customer record for a just-inserted bill"""
+        # Index all item names for bill search in a single update
+        if self._fts_available:
+            cursor.execute('UPDATE bills_fts SET item_names = ? WHERE rowid = ?',
+                           (' '.join(item_names), bill_id))
+        
+        # Keep the daily report rollups, the customer record and stock in step with this bill
+        rollups.apply_bill(cursor, bill_id)
+        customers.apply_bill(cursor, bill_id)
+        stock.apply_bill(cursor, bill_id)
+    
+    def _refresh_sold_items(self, items):
+        """Reload the cached rows of barcode items on committed bill lines (their stock changed).
+
+        Runs after the commit, so it never raises: the bills are saved
+        whatever happens here, and on error the cache is dropped instead.
+        """
+        try:
+            item_ids = {item.get('item_ref_id') for item in items if item.get('item_type') == 'barcode'}
+            item_ids.discard(None)
+            if not item_ids:
+                return
+            with self.connections.read() as cursor:
+                cursor.execute(f'''
+                    SELECT id, barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price
+                    FROM barcode_items WHERE id IN ({', '.join('?' * len(item_ids))})
+                ''', tuple(item_ids))
+                for row in cursor.fetchall():
+                    self.barcode_catalog.put(row)
+        except Exception as e:
+            print(f"[DB ERROR] _refresh_sold_items: {e}")
+            self.barcode_catalog.invalidate()
+    
     def get_all_bills(self) -> List[Dict]:
         """Get all bills"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, customer_name, customer_phone, total_amount, total_items, 
-                   total_weight, total_sgst, total_cgst, created_at 
-            FROM bills ORDER BY created_at DESC
-        ''')
-        results = cursor.fetchall()
-        conn.close()
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT id, customer_name, customer_phone, total_amount, total_items, 
+                       total_weight, total_sgst, total_cgst, created_at 
+                FROM bills ORDER BY created_at DESC
+            ''')
+            results = cursor.fetchall()
         
         return [
             {
@@ -518,71 +557,237 @@ class Database:
             for row in results
         ]
     
-    def get_bill_by_id(self, bill_id: int) -> Optional[Dict]:
-        """Get bill by ID with items"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_bills_page(self, after_created_at: Optional[str] = None, after_id: Optional[int] = None,
+                       limit: int = 100) -> List[Dict]:
+        """Get the next page of bills, newest first, using keyset pagination.
+
+        Pass the created_at and id of the last bill of the previous page (or
+        None for the first page). Cost depends only on limit, not on how many
+        bills exist.
+        """
+        with self.connections.read() as cursor:
+            if after_created_at is None:
+                cursor.execute('''
+                    SELECT id, customer_name, customer_phone, total_amount, total_items, 
+                           total_weight, total_sgst, total_cgst, created_at 
+                    FROM bills ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (limit,))
+            else:
+                cursor.execute('''
+                    SELECT id, customer_name, customer_phone, total_amount, total_items, 
+                           total_weight, total_sgst, total_cgst, created_at 
+                    FROM bills WHERE (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (after_created_at, after_id, limit))
+            results = cursor.fetchall()
         
-        # Get bill details
-        cursor.execute('''
-            SELECT id, customer_name, customer_phone, total_amount, total_items, 
-                   total_weight, total_sgst, total_cgst, created_at 
-            FROM bills WHERE id = ?
-        ''', (bill_id,))
+        return [
+            {
+                'id': row[0],
+                'customer_name': row[1],
+                'customer_phone': row[2],
+                'total_amount': row[3],
+                'total_items': row[4],
+                'total_weight': row[5],
+                'total_sgst': row[6],
+                'total_cgst': row[7],
+                'created_at': row[8]
+            }
+            for row in results
+        ]
+    
+    def get_bill_by_id(self, bill_id: int) -> Optional[Dict]:
+        """Get bill by ID with items (looking in fiscal-year archives if needed)"""
+        with self.connections.read() as cursor:
+            bill = self._fetch_bill(cursor, 'main', bill_id)
+        if bill is None:
+            for entry in self.list_archives():
+                if entry['first_bill_id'] is not None and entry['first_bill_id'] <= bill_id <= entry['last_bill_id']:
+                    databases = self._archive_databases([entry['fiscal_year']])
+                    if databases:
+                        with self.connections.read_attached(databases) as cursor:
+                            bill = self._fetch_bill(cursor, archive.alias(entry['fiscal_year']), bill_id)
+                    break
+        return bill
+    
+    def _fetch_bill(self, cursor, schema: str, bill_id: int) -> Optional[Dict]:
+        """Read one bill with its items from the bills tables of schema"""
+        cursor.execute(f'SELECT {BILL_COLUMNS} FROM {schema}.bills WHERE id = ?', (bill_id,))
         bill_result = cursor.fetchone()
         
         if not bill_result:
-            conn.close()
             return None
         
-        # Get bill items
-        cursor.execute('''
-            SELECT item_name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, 
-            sgst_amount, cgst_amount, final_price, item_type
-            FROM bill_items WHERE bill_id = ?
-        ''', (bill_id,))
-        items_results = cursor.fetchall()
-        
-        conn.close()
+        cursor.execute(f'SELECT {BILL_ITEM_COLUMNS} FROM {schema}.bill_items WHERE bill_id = ?', (bill_id,))
+        bill = bill_from_row(bill_result)
+        bill['items'] = [bill_item_from_row(row) for row in cursor.fetchall()]
+        return bill
+    
+    def get_bills_with_items(self, bill_ids: Optional[List[int]] = None, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict]:
+        """Yield bills with their items for a list of IDs (in that order) or an inclusive date range (newest first).
+
+        Works in batches of batch_size bills: one query for the headers and
+        one IN query for all their items, instead of two queries per bill.
+        """
+        if bill_ids is None:
+            databases = self._archives_touching(start_date, end_date)
+            schemas = ['main', *databases]
+            with self.connections.read_attached(databases) as cursor:
+                cursor.execute(archive.union_all(f'''
+                    SELECT id, created_at FROM {{schema}}.bills WHERE created_at >= ? AND created_at < ?''', schemas)
+                    + ' ORDER BY created_at DESC, id DESC', date_range_bounds(start_date, end_date) * len(schemas))
+                bill_ids = [row[0] for row in cursor.fetchall()]
+        else:
+            bill_ids = list(bill_ids)
+            databases = self._archive_databases([
+                entry['fiscal_year'] for entry in self.list_archives()
+                if entry['first_bill_id'] is not None
+                and any(entry['first_bill_id'] <= bill_id <= entry['last_bill_id'] for bill_id in bill_ids)])
+            schemas = ['main', *databases]
         
-        return {
-            'id': bill_result[0],
-            'customer_name': bill_result[1],
-            'customer_phone': bill_result[2],
-            'total_amount': bill_result[3],
-            'total_items': bill_result[4],
-            'total_weight': bill_result[5],
-            'total_sgst': bill_result[6],
-            'total_cgst': bill_result[7],
-            'created_at': bill_result[8],
-            'items': [
-                {
-                    'name': row[0],
-                    'hsn_code': row[1],
-                    'quantity': row[2],
-                    'base_price': row[3],
-                    'sgst_percent': row[4],
-                    'cgst_percent': row[5],
-                    'sgst_amount': row[6],
-                    'cgst_amount': row[7],
-                    'final_price': row[8],
-                    'item_type': row[9]
-                }
-                for row in items_results
-            ]
-        }
+        for start in range(0, len(bill_ids), batch_size):
+            batch = bill_ids[start:start + batch_size]
+            marks = ', '.join('?' * len(batch))
+            with self.connections.read_attached(databases) as cursor:
+                cursor.execute(archive.union_all(f'''
+                    SELECT {BILL_COLUMNS} FROM {{schema}}.bills WHERE id IN ({marks})''', schemas),
+                    batch * len(schemas))
+                bills = {row[0]: bill_from_row(row) for row in cursor.fetchall()}
+                for bill in bills.values():
+                    bill['items'] = []
+                cursor.execute(archive.union_all(f'''
+                    SELECT bill_id, id, {BILL_ITEM_COLUMNS} FROM {{schema}}.bill_items WHERE bill_id IN ({marks})''',
+                    schemas) + ' ORDER BY 1, 2', batch * len(schemas))
+                for row in cursor.fetchall():
+                    if row[0] in bills:
+                        bills[row[0]]['items'].append(bill_item_from_row(row[2:]))
+            for bill_id in batch:
+                if bill_id in bills:
+                    yield bills[bill_id]
+    
+    def _stream(self, sql: str, params: tuple, databases: Dict[str, str], batch_size: int) -> Iterator[sqlite3.Row]:
+        """Run sql on the hot database and then on each archive file, yielding sqlite3.Row objects.
+
+        Rows are pulled with fetchmany(batch_size), so memory stays flat
+        however many rows match. Archive files are opened directly rather
+        than attached, as a suspended generator may hold its cursor open.
+        """
+        sources = [self.connections.read()] + [self.connections.read_file(path) for path in databases.values()]
+        for source in sources:
+            with source as cursor:
+                cursor.row_factory = sqlite3.Row
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+    
+    def _stream_scope(self, start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, tuple, Dict[str, str]]:
+        """(created_at filter, params, archives newest first) for an optional inclusive date range"""
+        if start_date is None:
+            years = [entry['fiscal_year'] for entry in self.list_archives()]
+            where, params = '1', ()
+        else:
+            archived = {entry['fiscal_year'] for entry in self.list_archives()}
+            years = [year for year in archive.fiscal_years_between(start_date, end_date) if year in archived]
+            where, params = 'b.created_at >= ? AND b.created_at < ?', date_range_bounds(start_date, end_date)
+        # Archived fiscal years are all older than the hot bills, so hot first
+        # then archives newest first keeps the newest-first order without a sort
+        return where, params, self._archive_databases(sorted(years, reverse=True)) if years else {}
+    
+    def iter_bills(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """Stream bill headers newest first (all bills, or an inclusive date range).
+
+        Rows are sqlite3.Row objects keyed like get_all_bills() dicts.
+        """
+        where, params, databases = self._stream_scope(start_date, end_date)
+        sql = f'''
+            SELECT {BILL_COLUMNS} FROM bills b
+            WHERE {where}
+            ORDER BY b.created_at DESC, b.id DESC
+        '''
+        return self._stream(sql, params, databases, batch_size)
+    
+    def iter_bill_items(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """Stream line items in iter_bills() order, each row carrying its bill_id.
+
+        Rows are sqlite3.Row objects keyed like the 'items' dicts of get_bill_by_id().
+        """
+        where, params, databases = self._stream_scope(start_date, end_date)
+        sql = f'''
+            SELECT bi.bill_id, bi.item_name AS name, bi.hsn_code, bi.quantity, bi.base_price,
+                   bi.sgst_percent, bi.cgst_percent, bi.sgst_amount, bi.cgst_amount,
+                   bi.final_price, bi.item_type
+            FROM bills b
+            JOIN bill_items bi ON bi.bill_id = b.id
+            WHERE {where}
+            ORDER BY b.created_at DESC, b.id DESC
+        '''
+        return self._stream(sql, params, databases, batch_size)
+    
+    def iter_bills_with_items(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                              batch_size: int = 1000) -> Iterator[Tuple[sqlite3.Row, List[sqlite3.Row]]]:
+        """Stream (bill, items) pairs by walking iter_bills() and iter_bill_items() side by side"""
+        items = self.iter_bill_items(start_date, end_date, batch_size)
+        pending = next(items, None)
+        for bill in self.iter_bills(start_date, end_date, batch_size):
+            bill_items = []
+            while pending is not None and pending['bill_id'] == bill['id']:
+                bill_items.append(pending)
+                pending = next(items, None)
+            yield bill, bill_items
     
     def search_bills(self, customer_name: str) -> List[Dict]:
         """Search bills by customer name"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, customer_name, customer_phone, total_amount, total_items, 
-                   total_weight, total_sgst, total_cgst, created_at 
-            FROM bills WHERE customer_name LIKE ? ORDER BY created_at DESC
-        ''', (f'%{customer_name}%',))
-        results = cursor.fetchall()
-        conn.close()
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT id, customer_name, customer_phone, total_amount, total_items, 
+                       total_weight, total_sgst, total_cgst, created_at 
+                FROM bills WHERE customer_name LIKE ? ORDER BY created_at DESC
+            ''', (f'%{customer_name}%',))
+            results = cursor.fetchall()
+        
+        return [
+            {
+                'id': row[0],
+                'customer_name': row[1],
+                'customer_phone': row[2],
+                'total_amount': row[3],
+                'total_items': row[4],
+                'total_weight': row[5],
+                'total_sgst': row[6],
+                'total_cgst': row[7],
+                'created_at': row[8]
+            }
+            for row in results
+        ]
+    
+    def search_bills_fts(self, query: str, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Full-text search over bill number, customer name, phone and item names.
+
+        Every word in query must match (as a prefix); results are ranked by
+        relevance. Falls back to search_bills when FTS5 is unavailable.
+        """
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        if not self._fts_available:
+            return self.search_bills(query)[offset:offset + limit]
+        match = ' '.join(f'"{term}"*' for term in terms)
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT b.id, b.customer_name, b.customer_phone, b.total_amount, b.total_items, 
+                       b.total_weight, b.total_sgst, b.total_cgst, b.created_at 
+                FROM bills_fts f JOIN bills b ON b.id = f.rowid
+                WHERE bills_fts MATCH ?
+                ORDER BY f.rank, b.id DESC
+                LIMIT ? OFFSET ?
+            ''', (match, limit, offset))
+            results = cursor.fetchall()
         
         return [
             {
@@ -600,16 +805,16 @@ class Database:
         ]
     
     def get_bills_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get bills by date range"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, customer_name, customer_phone, total_amount, total_items, 
-                   total_weight, total_sgst, total_cgst, created_at 
-            FROM bills WHERE DATE(created_at) BETWEEN ? AND ? ORDER BY created_at DESC
-        ''', (start_date, end_date))
-        results = cursor.fetchall()
-        conn.close()
+        """Get bills by date range (attaching any archives the range touches)"""
+        databases = self._archives_touching(start_date, end_date)
+        schemas = ['main', *databases]
+        with self.connections.read_attached(databases) as cursor:
+            cursor.execute(archive.union_all('''
+                SELECT id, customer_name, customer_phone, total_amount, total_items, 
+                       total_weight, total_sgst, total_cgst, created_at 
+                FROM {schema}.bills WHERE created_at >= ? AND created_at < ?''', schemas)
+                + ' ORDER BY created_at DESC', date_range_bounds(start_date, end_date) * len(schemas))
+            results = cursor.fetchall()
         
         return [
             {
@@ -626,255 +831,462 @@ class Database:
             for row in results
         ]
     
+    def get_category_sales(self, start_date: str, end_date: str) -> List[Dict]:
+        """Revenue per loose category plus one 'Barcode Items' entry for an inclusive date range"""
+        databases = self._archives_touching(start_date, end_date)
+        schemas = ['main', *databases]
+        # Answered from idx_bill_items_sales; category_id was recorded at sale time
+        lines = archive.union_all('''
+            SELECT bi.item_type, bi.category_id, bi.final_price_paise
+            FROM {schema}.bills b
+            JOIN {schema}.bill_items bi ON bi.bill_id = b.id
+            WHERE b.created_at >= ? AND b.created_at < ?''', schemas)
+        bounds = date_range_bounds(start_date, end_date)
+        with self.connections.read_attached(databases) as cursor:
+            cursor.execute(f'''
+                SELECT l.item_type, lc.name, SUM(l.final_price_paise) as total_revenue
+                FROM ({lines}) l
+                LEFT JOIN main.loose_categories lc ON lc.id = l.category_id
+                GROUP BY l.item_type, l.category_id
+                ORDER BY total_revenue DESC
+            ''', bounds * len(schemas))
+            results = cursor.fetchall()
+        
+        data, barcode_paise, uncategorised_paise = [], 0, 0
+        for item_type, name, revenue_paise in results:
+            if item_type == 'barcode':
+                # Barcode items are reported as one category
+                barcode_paise += revenue_paise
+            elif name is None:
+                # Lines of deleted categories or unmatched pre-v9 items
+                uncategorised_paise += revenue_paise
+            else:
+                data.append({'name': name, 'revenue_paise': revenue_paise})
+        if uncategorised_paise:
+            data.append({'name': 'Uncategorised', 'revenue_paise': uncategorised_paise})
+        if barcode_paise:
+            data.append({'name': 'Barcode Items', 'revenue_paise': barcode_paise})
+        return data
+    
     def get_customer_names(self) -> List[str]:
-        """Get all unique customer names for autocomplete"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT customer_name FROM bills ORDER BY customer_name')
-        results = cursor.fetchall()
-        conn.close()
+        """Get all unique customer names (prefer search_customer_names for autocomplete)"""
+        with self.connections.read() as cursor:
+            cursor.execute('SELECT name FROM customers GROUP BY name ORDER BY name')
+            results = cursor.fetchall()
         
         return [row[0] for row in results]
     
-    # Admin Details Methods
-    def get_admin_details(self) -> Optional[Dict]:
-        """Get admin details"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        # Check if 'location' and 'gmail' columns exist
-        cursor.execute("PRAGMA table_info(admin_details)")
-        columns = [col[1] for col in cursor.fetchall()]
-        has_location = 'location' in columns
-        has_gmail = 'gmail' in columns
-        if has_location and has_gmail:
+    def search_customer_names(self, prefix: str, limit: int = 50) -> List[str]:
+        """Unique customer names starting with prefix (case-insensitive), for autocomplete"""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        with self.connections.read() as cursor:
+            # Range scan on the NOCASE (name, phone) index
             cursor.execute('''
-                SELECT shop_name, address, phone_number, gmail, use_credentials, username, password, location 
-                FROM admin_details ORDER BY id LIMIT 1
-            ''')
-        elif has_location:
+                SELECT name FROM customers
+                WHERE name >= ? AND name < ?
+                GROUP BY name ORDER BY name LIMIT ?
+            ''', (prefix, prefix + '\U0010ffff', limit))
+            results = cursor.fetchall()
+        
+        return [row[0] for row in results]
+    
+    def get_last_phone_for_customer(self, customer_name: str) -> str:
+        """Get the most recent phone number used by a customer"""
+        with self.connections.read() as cursor:
             cursor.execute('''
-                SELECT shop_name, address, phone_number, use_credentials, username, password, location 
-                FROM admin_details ORDER BY id LIMIT 1
-            ''')
-        elif has_gmail:
+                SELECT phone FROM customers
+                WHERE name = ? AND phone != ''
+                ORDER BY last_visit DESC LIMIT 1
+            ''', (customer_name,))
+            result = cursor.fetchone()
+        return result[0] if result and result[0] else ""
+    
+    def get_customer_by_phone(self, phone: str) -> Optional[Dict]:
+        """Most recent customer record for a phone number"""
+        with self.connections.read() as cursor:
             cursor.execute('''
-                SELECT shop_name, address, phone_number, gmail, use_credentials, username, password 
-                FROM admin_details ORDER BY id LIMIT 1
-            ''')
-        else:
+                SELECT id, name, phone, first_visit, last_visit, visit_count, total_spent_paise
+                FROM customers WHERE phone = ?
+                ORDER BY last_visit DESC LIMIT 1
+            ''', (phone,))
+            row = cursor.fetchone()
+        
+        if row:
+            return {
+                'id': row[0],
+                'name': row[1],
+                'phone': row[2],
+                'first_visit': row[3],
+                'last_visit': row[4],
+                'visit_count': row[5],
+                'total_spent_paise': row[6]
+            }
+        return None
+    
+    def rebuild_customers(self) -> int:
+        """Recompute the customers table from all bills, archives included"""
+        databases = self._archive_databases([entry['fiscal_year'] for entry in self.list_archives()])
+        with self.connections.write_attached(databases):
+            with self.connections.transaction() as cursor:
+                return customers.rebuild(cursor, ['main', *databases])
+    
+    # Sales Rollup Methods
+    def get_daily_sales(self, start_date: str, end_date: str) -> List[Dict]:
+        """Get pre-aggregated sales per day for an inclusive YYYY-MM-DD range.
+
+        Money is returned both as exact paise (*_paise) and as rupees.
+        """
+        with self.connections.read() as cursor:
             cursor.execute('''
-                SELECT shop_name, address, phone_number, use_credentials, username, password 
-                FROM admin_details ORDER BY id LIMIT 1
-            ''')
-        result = cursor.fetchone()
-        conn.close()
-        if result:
-            if has_location and has_gmail:
-                return {
-                    'shop_name': result[0],
-                    'address': result[1],
-                    'phone_number': result[2],
-                    'gmail': result[3],
-                    'use_credentials': bool(result[4]),
-                    'username': result[5],
-                    'password': result[6],
-                    'location': result[7] if result[7] is not None else ''
-                }
-            elif has_location:
-                return {
-                    'shop_name': result[0],
-                    'address': result[1],
-                    'phone_number': result[2],
-                    'use_credentials': bool(result[3]),
-                    'username': result[4],
-                    'password': result[5],
-                    'location': result[6] if result[6] is not None else '',
-                    'gmail': ''
-                }
-            elif has_gmail:
-                return {
-                    'shop_name': result[0],
-                    'address': result[1],
-                    'phone_number': result[2],
-                    'gmail': result[3],
-                    'use_credentials': bool(result[4]),
-                    'username': result[5],
-                    'password': result[6],
-                    'location': ''
-                }
+                SELECT day, bill_count, total_items, revenue_paise, sgst_paise, cgst_paise
+                FROM daily_sales WHERE day BETWEEN ? AND ? ORDER BY day
+            ''', (start_date, end_date))
+            results = cursor.fetchall()
+        
+        return [
+            {
+                'day': row[0],
+                'bill_count': row[1],
+                'total_items': row[2],
+                'revenue_paise': row[3],
+                'sgst_paise': row[4],
+                'cgst_paise': row[5],
+                'revenue': money.from_paise(row[3]),
+                'total_sgst': money.from_paise(row[4]),
+                'total_cgst': money.from_paise(row[5])
+            }
+            for row in results
+        ]
+    
+    def get_top_items(self, start_date: str, end_date: str, item_type: str, limit: int = 10) -> List[Dict]:
+        """Get best-selling items of one type by quantity for an inclusive YYYY-MM-DD range"""
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT item_name, SUM(quantity) as total_quantity, SUM(revenue_paise) as total_revenue
+                FROM daily_item_sales
+                WHERE day BETWEEN ? AND ? AND item_type = ?
+                GROUP BY item_name
+                ORDER BY total_quantity DESC
+                LIMIT ?
+            ''', (start_date, end_date, item_type, limit))
+            results = cursor.fetchall()
+        
+        return [{'name': row[0], 'quantity': row[1], 'revenue_paise': row[2],
+                 'revenue': money.from_paise(row[2])} for row in results]
+    
+    def rebuild_daily_rollups(self) -> int:
+        """Recompute the daily sales rollups from raw bills and archives. Returns the number of days"""
+        databases = self._archive_databases([entry['fiscal_year'] for entry in self.list_archives()])
+        with self.connections.write_attached(databases):
+            with self.connections.transaction() as cursor:
+                return rollups.rebuild(cursor, ['main', *databases])
+    
+    # Archive Methods
+    def list_archives(self) -> List[Dict]:
+        """Fiscal years moved out to billing_YYYY.db files, oldest first"""
+        if self._archives is None:
+            with self.connections.read() as cursor:
+                cursor.execute('''
+                    SELECT fiscal_year, file_name, start_date, end_date, bill_count,
+                           first_bill_id, last_bill_id, archived_at
+                    FROM archives ORDER BY fiscal_year
+                ''')
+                self._archives = [
+                    {
+                        'fiscal_year': row[0],
+                        'file_name': row[1],
+                        'start_date': row[2],
+                        'end_date': row[3],
+                        'bill_count': row[4],
+                        'first_bill_id': row[5],
+                        'last_bill_id': row[6],
+                        'archived_at': row[7]
+                    }
+                    for row in cursor.fetchall()
+                ]
+        return self._archives
+    
+    def _archive_databases(self, years) -> Dict[str, str]:
+        """{alias: path} of the archive files for these fiscal years that exist on disk"""
+        databases = {}
+        for year in years:
+            path = archive.archive_path(self.db_path, year)
+            if os.path.exists(path):
+                databases[archive.alias(year)] = path
             else:
-                return {
-                    'shop_name': result[0],
-                    'address': result[1],
-                    'phone_number': result[2],
-                    'use_credentials': bool(result[3]),
-                    'username': result[4],
-                    'password': result[5],
-                    'location': '',
-                    'gmail': ''
-                }
-        return None
+                print(f"[DB WARNING] Archive for fiscal year {year} not found: {path}")
+        pending = {name: path for name, path in databases.items() if path not in self._upgraded_archives}
+        if pending:
+            # Bring archives written before a later migration up to the hot layout
+            with self.connections.write_attached(pending):
+                with self.connections.transaction() as cursor:
+                    for name in pending:
+                        self._upgrade_archive_tables(cursor, name)
+            self._upgraded_archives.update(pending.values())
+        return databases
+    
+    def _upgrade_archive_tables(self, cursor, alias: str):
+        """Create or extend an attached archive's tables and backfill new item references"""
+        added = archive.create_archive_tables(cursor, alias)
+        if ('bill_items', 'item_ref_id') in added:
+            backfill_item_refs(cursor, alias)
+    
+    def _archives_touching(self, start_date: str, end_date: str) -> Dict[str, str]:
+        """Archives whose fiscal year overlaps an inclusive YYYY-MM-DD range"""
+        archived = {entry['fiscal_year'] for entry in self.list_archives()}
+        if not archived:
+            return {}
+        return self._archive_databases(
+            [year for year in archive.fiscal_years_between(start_date, end_date) if year in archived])
+    
+    def archive_fiscal_year(self, year: int) -> int:
+        """Move a closed fiscal year of bills into billing_YYYY.db. Returns the number of bills moved.
+
+        Rows are copied into the archive and committed there first, then
+        removed from the hot database together with the registry update, so
+        an interrupted run can simply be repeated.
+        """
+        if year >= archive.fiscal_year_of(datetime.now().date()):
+            raise ValueError(f"Fiscal year {year}-{(year + 1) % 100:02d} is not closed yet")
+        start, end = archive.fiscal_year_bounds(year)
+        alias = archive.alias(year)
+        databases = {alias: archive.archive_path(self.db_path, year)}
+        in_year = 'SELECT id FROM main.bills WHERE created_at >= ? AND created_at < ?'
+        with self.connections.read() as cursor:
+            cursor.execute(f'SELECT EXISTS ({in_year})', (start, end))
+            if not cursor.fetchone()[0]:
+                return 0
+        with self.connections.write_attached(databases):
+            with self.connections.transaction() as cursor:
+                self._upgrade_archive_tables(cursor, alias)
+                for table in archive.ARCHIVED_TABLES:
+                    columns = ', '.join(name for name, _ in archive.table_columns(cursor, 'main', table))
+                    key = 'id' if table == 'bills' else 'bill_id'
+                    cursor.execute(f'''
+                        INSERT OR IGNORE INTO {alias}.{table} ({columns})
+                        SELECT {columns} FROM main.{table} WHERE {key} IN ({in_year})
+                    ''', (start, end))
+                cursor.execute(f'SELECT COUNT(*), MIN(id), MAX(id) FROM {alias}.bills')
+                bill_count, first_id, last_id = cursor.fetchone()
+            
+            with self.connections.transaction() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM main.bills WHERE id IN ({in_year})', (start, end))
+                moved = cursor.fetchone()[0]
+                log_head = change_log.head(cursor)
+                # Bills first: their FTS rows go with them, so the bill_items
+                # delete trigger has nothing left to re-index
+                cursor.execute(f'DELETE FROM main.bills WHERE id IN ({in_year})', (start, end))
+                cursor.execute(f'DELETE FROM main.bill_items WHERE bill_id IN (SELECT id FROM {alias}.bills)')
+                change_log.mark_archived(cursor, log_head)
+                cursor.execute('''
+                    INSERT OR REPLACE INTO archives (fiscal_year, file_name, start_date, end_date,
+                                                     bill_count, first_bill_id, last_bill_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (year, archive.file_name(year), start, end, bill_count, first_id, last_id))
+        self._archives = None
+        return moved
+    
+    # Stock Methods
+    def get_low_stock(self, limit: int = 20) -> List[Dict]:
+        """Barcode and loose items at or below stock.LOW_STOCK_LEVEL, lowest first"""
+        with self.connections.read() as cursor:
+            return stock.low_stock(cursor, limit)
+    
+    def get_stock_movements(self, item_type: str, item_id: int, limit: int = 100) -> List[Dict]:
+        """Newest stock movements of one item"""
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT id, delta, reason, bill_id, created_at FROM stock_movements
+                WHERE item_type = ? AND item_id = ? ORDER BY id DESC LIMIT ?
+            ''', (item_type, item_id, limit))
+            return [{'id': row[0], 'delta': row[1], 'reason': row[2], 'bill_id': row[3], 'created_at': row[4]}
+                    for row in cursor.fetchall()]
+    
+    def rebuild_stock(self) -> int:
+        """Reset item quantities from the stock ledger. Returns the number of items corrected"""
+        with self.connections.transaction() as cursor:
+            corrected = stock.rebuild(cursor)
+        self.barcode_catalog.invalidate()
+        return corrected
+    
+    # Change Log Methods
+    def changes_since(self, seq: int, limit: int = 1000) -> List[Dict]:
+        """Logged row changes after seq, oldest first: {'seq', 'table', 'row_id', 'op', 'changed_at'}.
+
+        Pass the last seq processed to read the next batch. Raises
+        change_log.ChangeLogTruncated when that part of the log was pruned.
+        """
+        with self.connections.read() as cursor:
+            return change_log.changes_since(cursor, seq, limit)
+    
+    def change_log_head(self) -> int:
+        """Newest change seq; a consumer taking a full copy starts following from here"""
+        with self.connections.read() as cursor:
+            return change_log.head(cursor)
+    
+    def prune_change_log(self, keep_days: int) -> int:
+        """Drop change log entries older than keep_days. Returns the number removed"""
+        cutoff = (datetime.utcnow() - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S')
+        with self.connections.transaction() as cursor:
+            removed = change_log.prune(cursor, change_log.seq_before(cursor, cutoff))
+        self.settings.invalidate()
+        return removed
+    
+    # Multi-counter Sync Methods
+    def counter_id(self) -> Optional[int]:
+        """This machine's counter number in multi-counter mode, or None when standalone"""
+        value = self.settings.get_str('counter_id')
+        return int(value) if value else None
+    
+    def set_counter_id(self, counter_id: Optional[int]) -> bool:
+        """Join (0 to BILL_ID_STRIDE - 1) or leave (None) multi-counter mode.
+
+        Bills already on file are treated as pushed, so only bills rung up
+        from now on are sent to the sync server.
+        """
+        if counter_id is not None and not 0 <= counter_id < sync.BILL_ID_STRIDE:
+            raise ValueError(f"counter_id must be between 0 and {sync.BILL_ID_STRIDE - 1}")
+        # Same lock order as save_bill: the write lock, then _bill_id_lock
+        with self.connections.transaction() as cursor, self._bill_id_lock:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM bills')
+            max_id = cursor.fetchone()[0]
+            if not self.update_admin_setting('counter_id', '' if counter_id is None else counter_id):
+                return False
+            if not self.settings.get_str('sync_last_pushed_id'):
+                self.update_admin_setting('sync_last_pushed_id', max_id)
+            # Re-derive the next ID with the new stride
+            self._next_bill_id = None
+        return True
+    
+    @property
+    def sync_client(self) -> Optional[SyncClient]:
+        """Sync thread for this counter, or None unless sync_server_url and counter_id are set"""
+        if self._sync_client is None:
+            url = self.settings.get_str('sync_server_url')
+            if url and self.counter_id() is not None:
+                self._sync_client = SyncClient(self, url, token=self.settings.get_str('sync_token'))
+        return self._sync_client
+    
+    def export_bills(self, limit: int) -> List[Dict]:
+        """Up to limit of this counter's bills not yet pushed, oldest first, as raw rows"""
+        with self.connections.read() as cursor:
+            return sync.export_bills(cursor, self.settings.get_int('sync_last_pushed_id', 0),
+                                     self.counter_id(), limit, self.settings.get_int('sync_local_refs_until', 0))
+    
+    def mark_local_item_refs(self):
+        """Note that bills rung up so far name items by this counter's own catalog IDs.
+
+        Called before the first catalog pull, after which item IDs are the
+        server's; export_bills() strips the older references.
+        """
+        with self.connections.transaction() as cursor, self._bill_id_lock:
+            if self._next_bill_id is not None:
+                last_id = self._next_bill_id - self._bill_id_step
+            else:
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM bills')
+                last_id = cursor.fetchone()[0]
+            if not self.settings.get_str('sync_local_refs_until'):
+                self.update_admin_setting('sync_local_refs_until', last_id)
+    
+    def mark_bills_pushed(self, last_id: int):
+        """Record that the server has every bill of this counter up to last_id"""
+        self.settings.set('sync_last_pushed_id', last_id)
+    
+    def count_unpushed_bills(self) -> int:
+        """Number of this counter's saved bills the server has not confirmed"""
+        counter_id = self.counter_id()
+        if counter_id is None:
+            return 0
+        with self.connections.read() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM bills WHERE id > ? AND id % ? = ?',
+                           (self.settings.get_int('sync_last_pushed_id', 0), sync.BILL_ID_STRIDE, counter_id))
+            return cursor.fetchone()[0]
+    
+    def import_bills(self, bills: List[Dict]) -> List[int]:
+        """Store bills pushed by a counter as-is. Returns the IDs added (duplicates are skipped)"""
+        with self.connections.transaction() as cursor:
+            added = sync.import_bills(cursor, bills)
+            names = {bill['id']: [item['item_name'] for item in bill['items']] for bill in bills}
+            for bill_id in added:
+                self._index_bill(cursor, bill_id, names[bill_id])
+        added_set = set(added)
+        self._refresh_sold_items(item for bill in bills if bill['id'] in added_set for item in bill['items'])
+        return added
+    
+    def inventory_snapshot(self) -> Tuple[str, Dict[str, List[Dict]]]:
+        """(etag, rows by table) of the catalog served to counters"""
+        with self.connections.read() as cursor:
+            return sync.inventory_snapshot(cursor)
+    
+    def apply_inventory(self, snapshot: Dict[str, List[Dict]]) -> int:
+        """Bring the local catalog in line with the server's. Returns the rows changed"""
+        with self.connections.transaction() as cursor:
+            with stock.reason(cursor, 'sync'):
+                changed = sync.apply_inventory(cursor, snapshot)
+        if changed:
+            self.barcode_catalog.invalidate()
+        return changed
+    
+    # Admin Details Methods
+    def get_admin_details(self) -> Optional[Dict]:
+        """Get admin details (plus key/value settings) from the settings cache"""
+        return self.settings.admin_details()
     
     def update_admin_details(self, shop_name: str, address: str, phone_number: str, 
                            use_credentials: bool, username: str, password: str, location: str = "", gmail: str = "") -> bool:
         """Update admin details"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            # Check if 'location' and 'gmail' columns exist
-            cursor.execute("PRAGMA table_info(admin_details)")
-            columns = [col[1] for col in cursor.fetchall()]
-            has_location = 'location' in columns
-            has_gmail = 'gmail' in columns
-            if has_location and has_gmail:
+            with self.connections.transaction() as cursor:
                 cursor.execute('''
                     UPDATE admin_details SET shop_name = ?, address = ?, phone_number = ?, gmail = ?, 
                     use_credentials = ?, username = ?, password = ?, location = ?, updated_at = CURRENT_TIMESTAMP
                     WHERE id = (SELECT id FROM admin_details ORDER BY id LIMIT 1)
                 ''', (shop_name, address, phone_number, gmail, use_credentials, username, password, location))
-            elif has_location:
-                cursor.execute('''
-                    UPDATE admin_details SET shop_name = ?, address = ?, phone_number = ?, 
-                    use_credentials = ?, username = ?, password = ?, location = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = (SELECT id FROM admin_details ORDER BY id LIMIT 1)
-                ''', (shop_name, address, phone_number, use_credentials, username, password, location))
-            elif has_gmail:
-                cursor.execute('''
-                    UPDATE admin_details SET shop_name = ?, address = ?, phone_number = ?, gmail = ?, 
-                    use_credentials = ?, username = ?, password = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = (SELECT id FROM admin_details ORDER BY id LIMIT 1)
-                ''', (shop_name, address, phone_number, gmail, use_credentials, username, password))
-            else:
-                cursor.execute('''
-                    UPDATE admin_details SET shop_name = ?, address = ?, phone_number = ?, 
-                    use_credentials = ?, username = ?, password = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = (SELECT id FROM admin_details ORDER BY id LIMIT 1)
-                ''', (shop_name, address, phone_number, use_credentials, username, password))
-            conn.commit()
-            conn.close()
+            self.settings.invalidate()
             return True
         except Exception as e:
             print(f"[DB ERROR] update_admin_details: {e}")
             return False
     
+    def update_admin_setting(self, key: str, value) -> bool:
+        """Store a key/value app setting (e.g. paper_width)"""
+        try:
+            self.settings.set(key, value)
+            return True
+        except Exception as e:
+            print(f"[DB ERROR] update_admin_setting: {e}")
+            return False
+    
     def verify_admin_credentials(self, username: str, password: str) -> bool:
         """Verify admin credentials"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(*) FROM admin_details 
-            WHERE username = ? AND password = ?
-        ''', (username, password))
-        result = cursor.fetchone()[0]
-        conn.close()
+        with self.connections.read() as cursor:
+            cursor.execute('''
+                SELECT COUNT(*) FROM admin_details 
+                WHERE username = ? AND password = ?
+            ''', (username, password))
+            result = cursor.fetchone()[0]
         
         return result > 0
 
-    def import_barcode_items_from_csv(self, file_path: str):
-        """Import barcode items from a CSV file. Returns (success_count, fail_count, fail_rows)"""
-        required_fields = ["barcode", "name", "hsn_code", "quantity", "sgst", "cgst", "total_price"]
-        success_count = 0
-        fail_count = 0
-        fail_rows = []
-        # Pre-fetch all existing barcodes
-        existing_barcodes = set()
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT barcode FROM barcode_items')
-        for row in cursor.fetchall():
-            existing_barcodes.add(row[0])
-        conn.close()
-        to_insert = []
-        with open(file_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for idx, row in enumerate(reader, start=2):  # start=2 for header row
-                # Validate required fields
-                if not all(field in row and row[field].strip() for field in required_fields):
-                    fail_count += 1
-                    fail_rows.append((idx, "Missing required fields"))
-                    continue
-                try:
-                    barcode = row["barcode"].strip()
-                    if barcode in existing_barcodes:
-                        fail_count += 1
-                        fail_rows.append((idx, "Duplicate barcode"))
-                        continue
-                    name = row["name"].strip()
-                    hsn_code = row["hsn_code"].strip()
-                    quantity = int(row["quantity"])
-                    sgst = float(row["sgst"])
-                    cgst = float(row["cgst"])
-                    total_price = float(row["total_price"])
-                    to_insert.append((barcode, name, hsn_code, quantity, total_price, sgst, cgst))
-                    existing_barcodes.add(barcode)
-                except Exception as e:
-                    fail_count += 1
-                    fail_rows.append((idx, str(e)))
-        # Bulk insert
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        for barcode, name, hsn_code, quantity, total_price, sgst, cgst in to_insert:
-            base_price = total_price / (1 + (sgst + cgst) / 100)
-            cursor.execute('''INSERT OR IGNORE INTO barcode_items (barcode, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', (barcode, name, hsn_code, quantity, base_price, sgst, cgst, total_price))
-            success_count += 1
-        conn.commit()
-        conn.close()
-        return success_count, fail_count, fail_rows
+    def import_barcode_items_from_csv(self, file_path: str, upsert: bool = False,
+                                      progress=None, should_cancel=None) -> Dict:
+        """Stream barcode items from a CSV file in chunks.
 
-    def import_loose_items_from_csv(self, file_path: str):
-        """Import loose items from a CSV file. Returns (success_count, fail_count, fail_rows)"""
-        required_fields = ["category", "name", "hsn_code", "quantity", "sgst", "cgst", "total_price"]
-        success_count = 0
-        fail_count = 0
-        fail_rows = []
-        # Build category name to id map
-        categories = {cat['name']: cat['id'] for cat in self.get_loose_categories()}
-        # Pre-fetch all existing (category_id, name, hsn_code)
-        existing_keys = set()
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT category_id, name, hsn_code FROM loose_items')
-        for row in cursor.fetchall():
-            existing_keys.add((row[0], row[1], row[2]))
-        conn.close()
-        to_insert = []
-        with open(file_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for idx, row in enumerate(reader, start=2):
-                if not all(field in row and row[field].strip() for field in required_fields):
-                    fail_count += 1
-                    fail_rows.append((idx, "Missing required fields"))
-                    continue
-                try:
-                    category_name = row["category"].strip()
-                    if category_name not in categories:
-                        fail_count += 1
-                        fail_rows.append((idx, f"Category '{category_name}' not found"))
-                        continue
-                    category_id = categories[category_name]
-                    name = row["name"].strip()
-                    hsn_code = row["hsn_code"].strip()
-                    key = (category_id, name, hsn_code)
-                    if key in existing_keys:
-                        fail_count += 1
-                        fail_rows.append((idx, "Duplicate item (category, name, hsn_code)"))
-                        continue
-                    quantity = int(row["quantity"])
-                    sgst = float(row["sgst"])
-                    cgst = float(row["cgst"])
-                    total_price = float(row["total_price"])
-                    to_insert.append((category_id, name, hsn_code, quantity, total_price, sgst, cgst))
-                    existing_keys.add(key)
-                except Exception as e:
-                    fail_count += 1
-                    fail_rows.append((idx, str(e)))
-        # Bulk insert
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        for category_id, name, hsn_code, quantity, total_price, sgst, cgst in to_insert:
-            base_price = total_price / (1 + (sgst + cgst) / 100)
-            cursor.execute('''INSERT OR IGNORE INTO loose_items (category_id, name, hsn_code, quantity, base_price, sgst_percent, cgst_percent, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', (category_id, name, hsn_code, quantity, base_price, sgst, cgst, total_price))
-            success_count += 1
-        conn.commit()
-        conn.close()
-        return success_count, fail_count, fail_rows
\ No newline at end of file
+        Returns a dict with added, updated, failed, fail_rows and cancelled.
+        """
+        try:
+            return csv_import.import_barcode_items(self, file_path, upsert=upsert,
+                                                   progress=progress, should_cancel=should_cancel)
+        finally:
+            self.barcode_catalog.invalidate()
+
+    def import_loose_items_from_csv(self, file_path: str, upsert: bool = False,
+                                    progress=None, should_cancel=None) -> Dict:
+        """Stream loose items from a CSV file in chunks (same result dict as barcode import)"""
+        try:
+            return csv_import.import_loose_items(self, file_path, upsert=upsert,
+                                                 progress=progress, should_cancel=should_cancel)
+        finally:
+            self.barcode_catalog.invalidate()
\ No newline at end of file
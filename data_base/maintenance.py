@@ -0,0 +1,167 @@
+"""Routine upkeep of billing.db: statistics, free pages, WAL and integrity.
+
+run_maintenance() refreshes the query planner statistics (ANALYZE on
+first use, PRAGMA optimize afterwards), returns free pages to the file
+system with incremental_vacuum, truncates the WAL and runs
+integrity_check. Write steps take the shared writer in short slices so a
+bill saved meanwhile waits milliseconds, not the whole run.
+MaintenanceScheduler runs it in idle time: once per interval, after no
+bill activity for idle_minutes.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from data_base import backup
+
+# PRAGMA auto_vacuum values
+AUTO_VACUUM_MODES = {'none': 0, 'full': 1, 'incremental': 2}
+# Free pages released per write transaction by incremental_vacuum
+VACUUM_PAGES_PER_STEP = 500
+# Rows sampled per index by ANALYZE / PRAGMA optimize
+ANALYSIS_LIMIT = 1000
+IDLE_MINUTES = 10
+INTERVAL_HOURS = 24
+
+def optimize(connections) -> str:
+    """Refresh planner statistics; full ANALYZE when none have been gathered yet"""
+    with connections.transaction() as cursor:
+        cursor.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            cursor.execute('ANALYZE')
+            return 'analyzed all tables'
+        cursor.execute('PRAGMA optimize')
+        return 'statistics refreshed'
+
+def vacuum(connections, mode: str = 'incremental') -> str:
+    """Release free pages, converting the file to the wanted auto_vacuum mode first.
+
+    Only a full VACUUM can change auto_vacuum on a database that already
+    has tables, so that conversion happens once, on the first run after
+    migration 11; later runs free pages a slice at a time.
+    """
+    wanted = AUTO_VACUUM_MODES[mode]
+    with connections.read() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        current = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_count')
+        pages_before = cursor.fetchone()[0]
+    if current != wanted:
+        with connections.autocommit() as cursor:
+            cursor.execute(f'PRAGMA auto_vacuum={wanted}')
+            cursor.execute('VACUUM')
+            cursor.execute('PRAGMA page_count')
+            pages_after = cursor.fetchone()[0]
+        return f'converted to auto_vacuum={mode} ({pages_before} -> {pages_after} pages)'
+    if wanted != AUTO_VACUUM_MODES['incremental']:
+        return f'auto_vacuum={mode}, nothing to do'
+
+    freed = 0
+    while True:
+        with connections.autocommit() as cursor:
+            cursor.execute('PRAGMA freelist_count')
+            free = cursor.fetchone()[0]
+            if not free:
+                break
+            step = min(free, VACUUM_PAGES_PER_STEP)
+            # incremental_vacuum frees one page per step of the statement;
+            # execute() steps it only once, executescript() runs it to the end
+            cursor.executescript(f'PRAGMA incremental_vacuum({step})')
+            freed += step
+    return f'freed {freed} page(s) of {pages_before}'
+
+def checkpoint(connections) -> str:
+    """Copy the WAL into the database and truncate it"""
+    wal_path = connections.db_path + '-wal'
+    wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    with connections.autocommit() as cursor:
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        busy, log_frames, checkpointed = cursor.fetchone()
+    if busy:
+        return f'busy: {checkpointed} of {log_frames} WAL frame(s) copied, WAL not truncated'
+    return f'WAL checkpointed and truncated (was {wal_bytes / 1024:.0f} KB)'
+
+def run_maintenance(connections, auto_vacuum: str = 'incremental', integrity: bool = True) -> List[Dict]:
+    """Run every step, continuing past failures. Returns one result dict per step"""
+    steps = [
+        ('optimize', lambda: optimize(connections)),
+        ('vacuum', lambda: vacuum(connections, auto_vacuum)),
+        ('checkpoint', lambda: checkpoint(connections)),
+    ]
+    if integrity:
+        steps.append(('integrity_check', lambda: backup.integrity_check(connections.db_path)))
+
+    results = []
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            detail = step()
+            ok = name != 'integrity_check' or detail == 'ok'
+        except Exception as e:
+            detail, ok = str(e), False
+            print(f"[DB ERROR] Maintenance step {name} failed: {e}")
+        results.append({'step': name, 'ok': ok, 'detail': detail,
+                        'ms': (time.perf_counter() - start) * 1000})
+    return results
+
+class MaintenanceScheduler:
+    """Background thread running Database.run_maintenance in idle time.
+
+    A run is due interval_hours after the last one (as recorded in the
+    settings) and starts once no bill has been rung up for idle_minutes.
+    run_now() skips both checks.
+    """
+
+    CHECK_SECONDS = 60
+
+    def __init__(self, db, idle_minutes: float = IDLE_MINUTES, interval_hours: float = INTERVAL_HOURS):
+        self.db = db
+        self.idle_seconds = idle_minutes * 60
+        self.interval = timedelta(hours=interval_hours)
+        self.running = False
+        self._wake = threading.Event()
+        self._stopping = False
+        self._run_requested = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="MaintenanceScheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_now(self):
+        """Ask the scheduler thread to run maintenance immediately"""
+        self._run_requested = True
+        self.start()
+        self._wake.set()
+
+    def is_due(self) -> bool:
+        last = self.db.last_maintenance()
+        if last is None:
+            return True
+        finished = datetime.strptime(last['finished_at'], '%Y-%m-%d %H:%M:%S')
+        return datetime.now() - finished >= self.interval
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            if self._run_requested or (self.db.idle_seconds() >= self.idle_seconds and self.is_due()):
+                self._run_requested = False
+                self.running = True
+                try:
+                    self.db.run_maintenance()
+                except Exception as e:
+                    print(f"[DB ERROR] Maintenance failed: {e}")
+                finally:
+                    self.running = False
+            self._wake.wait(self.CHECK_SECONDS)
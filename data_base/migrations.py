@@ -0,0 +1,762 @@
+"""Ordered schema migrations keyed on PRAGMA user_version.
+
+Each entry in MIGRATIONS upgrades the schema by exactly one version. New
+schema changes are appended as a new function and registry entry; existing
+entries must never be edited once released. Migrations carry their own SQL
+rather than calling the modules that maintain those tables today, so a
+later change to a module never changes what an old migration does.
+"""
+
+import sqlite3
+
+def _create_base_schema(cursor):
+    """Version 1: base tables, pre-versioning column upgrades and default data"""
+    # Create barcode_items table with new GST fields
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS barcode_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            hsn_code TEXT DEFAULT '',
+            quantity INTEGER DEFAULT 1,
+            base_price REAL NOT NULL,
+            sgst_percent REAL DEFAULT 0,
+            cgst_percent REAL DEFAULT 0,
+            total_price REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create loose_categories table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS loose_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create loose_items table with new GST fields
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS loose_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            hsn_code TEXT DEFAULT '',
+            quantity INTEGER DEFAULT 1,
+            base_price REAL NOT NULL,
+            sgst_percent REAL DEFAULT 0,
+            cgst_percent REAL DEFAULT 0,
+            total_price REAL NOT NULL,
+            image_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES loose_categories (id)
+        )
+    ''')
+    # Add unique index for loose_items
+    cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_loose_items_unique ON loose_items (category_id, name, hsn_code)''')
+
+    # Create bills table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            customer_phone TEXT,
+            total_amount REAL NOT NULL,
+            total_items INTEGER NOT NULL,
+            total_weight REAL DEFAULT 0,
+            total_sgst REAL DEFAULT 0,
+            total_cgst REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create bill_items table with GST fields
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bill_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bill_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            hsn_code TEXT DEFAULT '',
+            quantity REAL NOT NULL,
+            base_price REAL NOT NULL,
+            sgst_percent REAL DEFAULT 0,
+            cgst_percent REAL DEFAULT 0,
+            sgst_amount REAL DEFAULT 0,
+            cgst_amount REAL DEFAULT 0,
+            final_price REAL NOT NULL,
+            item_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (bill_id) REFERENCES bills (id)
+        )
+    ''')
+
+    # Create admin_details table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admin_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_name TEXT NOT NULL DEFAULT 'My Shop',
+            address TEXT NOT NULL DEFAULT 'Shop Address',
+            phone_number TEXT NOT NULL DEFAULT '1234567890',
+            gmail TEXT NOT NULL DEFAULT '',
+            use_credentials BOOLEAN NOT NULL DEFAULT 0,
+            username TEXT NOT NULL DEFAULT 'admin',
+            password TEXT NOT NULL DEFAULT 'admin123',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # --- MIGRATION: Ensure 'location' and 'gmail' columns exist ---
+    cursor.execute("PRAGMA table_info(admin_details)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'location' not in columns:
+        cursor.execute("ALTER TABLE admin_details ADD COLUMN location TEXT DEFAULT ''")
+    if 'gmail' not in columns:
+        cursor.execute("ALTER TABLE admin_details ADD COLUMN gmail TEXT DEFAULT ''")
+
+    # Migrate existing data if needed
+    _migrate_legacy_columns(cursor)
+
+    # Insert default categories and items
+    _insert_default_data(cursor)
+
+    # Insert default admin details if not exists
+    _insert_default_admin_data(cursor)
+
+def _migrate_legacy_columns(cursor):
+    """Upgrade databases created before the GST columns existed"""
+    # Check if old columns exist and migrate
+    cursor.execute("PRAGMA table_info(barcode_items)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if 'hsn_code' not in columns:
+        # Add new columns to barcode_items
+        cursor.execute('ALTER TABLE barcode_items ADD COLUMN hsn_code TEXT DEFAULT ""')
+        cursor.execute('ALTER TABLE barcode_items ADD COLUMN quantity INTEGER DEFAULT 0')
+        cursor.execute('ALTER TABLE barcode_items ADD COLUMN sgst_percent REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE barcode_items ADD COLUMN cgst_percent REAL DEFAULT 0')
+
+        # Rename price to base_price and add total_price
+        try:
+            cursor.execute('ALTER TABLE barcode_items RENAME COLUMN price TO base_price')
+        except:
+            pass
+
+        try:
+            cursor.execute('ALTER TABLE barcode_items ADD COLUMN total_price REAL')
+            cursor.execute('UPDATE barcode_items SET total_price = base_price WHERE total_price IS NULL')
+        except:
+            pass
+
+    # Similar migration for loose_items
+    cursor.execute("PRAGMA table_info(loose_items)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if 'hsn_code' not in columns:
+        cursor.execute('ALTER TABLE loose_items ADD COLUMN hsn_code TEXT DEFAULT ""')
+        cursor.execute('ALTER TABLE loose_items ADD COLUMN quantity INTEGER DEFAULT 0')
+        cursor.execute('ALTER TABLE loose_items ADD COLUMN sgst_percent REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE loose_items ADD COLUMN cgst_percent REAL DEFAULT 0')
+
+        try:
+            cursor.execute('ALTER TABLE loose_items RENAME COLUMN price_per_kg TO base_price')
+        except:
+            pass
+
+        try:
+            cursor.execute('ALTER TABLE loose_items ADD COLUMN total_price REAL')
+            cursor.execute('UPDATE loose_items SET total_price = base_price WHERE total_price IS NULL')
+        except:
+            pass
+
+    # Migrate bills table
+    cursor.execute("PRAGMA table_info(bills)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if 'total_sgst' not in columns:
+        cursor.execute('ALTER TABLE bills ADD COLUMN total_sgst REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE bills ADD COLUMN total_cgst REAL DEFAULT 0')
+
+    # Migrate bill_items table
+    cursor.execute("PRAGMA table_info(bill_items)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if 'hsn_code' not in columns:
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN hsn_code TEXT DEFAULT ""')
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN base_price REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN sgst_percent REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN cgst_percent REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN sgst_amount REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN cgst_amount REAL DEFAULT 0')
+        cursor.execute('ALTER TABLE bill_items ADD COLUMN final_price REAL DEFAULT 0')
+
+        # Update existing records
+        cursor.execute('UPDATE bill_items SET base_price = unit_price, final_price = subtotal WHERE base_price = 0')
+
+def _insert_default_data(cursor):
+    """Insert default categories and items if they don't exist"""
+    # Only insert if tables are empty
+    cursor.execute('SELECT COUNT(*) FROM loose_categories')
+    if cursor.fetchone()[0] == 0:
+        # Insert default categories
+        default_categories = ['Rice', 'Dals', 'Spices', 'Oil', 'Vegetables']
+        for category in default_categories:
+            cursor.execute('''
+                INSERT OR IGNORE INTO loose_categories (name) VALUES (?)
+            ''', (category,))
+
+        # Insert some default loose items with GST
+        default_items = [
+            ('Rice', 'Basmati Rice', '1006', 80.0, 2.5, 2.5),
+            ('Rice', 'Sona Masoori Rice', '1006', 65.0, 2.5, 2.5),
+            ('Dals', 'Toor Dal', '0713', 120.0, 2.5, 2.5),
+            ('Dals', 'Moong Dal', '0713', 110.0, 2.5, 2.5),
+            ('Spices', 'Turmeric Powder', '0910', 200.0, 2.5, 2.5),
+            ('Spices', 'Red Chilli Powder', '0904', 180.0, 2.5, 2.5),
+            ('Oil', 'Sunflower Oil', '1512', 150.0, 2.5, 2.5),
+            ('Oil', 'Coconut Oil', '1513', 180.0, 2.5, 2.5),
+        ]
+        for category_name, item_name, hsn, total_price, sgst, cgst in default_items:
+            base_price = total_price / (1 + (sgst + cgst) / 100)
+            cursor.execute('''
+                INSERT OR IGNORE INTO loose_items (category_id, name, hsn_code, base_price, sgst_percent, cgst_percent, total_price)
+                SELECT id, ?, ?, ?, ?, ?, ? FROM loose_categories WHERE name = ?
+            ''', (item_name, hsn, base_price, sgst, cgst, total_price, category_name))
+
+    # Insert default barcode items if table is empty
+    cursor.execute('SELECT COUNT(*) FROM barcode_items')
+    if cursor.fetchone()[0] == 0:
+        default_barcodes = [
+            ('12345678', 'Kit Kat', '1704', 10.0, 6.0, 6.0),
+            ('23456789', 'Dairy Milk', '1704', 20.0, 6.0, 6.0),
+            ('34567890', '5 Star', '1704', 10.0, 6.0, 6.0),
+            ('45678901', 'Perk', '1704', 10.0, 6.0, 6.0),
+            ('56789012', 'Munch', '1704', 5.0, 6.0, 6.0),
+        ]
+        for barcode, name, hsn, total_price, sgst, cgst in default_barcodes:
+            base_price = total_price / (1 + (sgst + cgst) / 100)
+            cursor.execute('''
+                INSERT OR IGNORE INTO barcode_items (barcode, name, hsn_code, base_price, sgst_percent, cgst_percent, total_price) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (barcode, name, hsn, base_price, sgst, cgst, total_price))
+
+def _insert_default_admin_data(cursor):
+    """Insert default admin details if they don't exist"""
+    cursor.execute('SELECT COUNT(*) FROM admin_details')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO admin_details (shop_name, address, phone_number, gmail, use_credentials, username, password) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ('My Shop', 'Shop Address', '1234567890', '', False, 'admin', 'admin123'))
+
+def _add_bill_indexes(cursor):
+    """Version 2: indexes for date-range, customer and line-item lookups"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_created_at ON bills (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_customer_name ON bills (customer_name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bill_items_bill_id ON bill_items (bill_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bill_items_type_name ON bill_items (item_type, item_name)')
+
+def _add_daily_rollups(cursor):
+    """Version 3: daily sales rollup tables, backfilled from existing bills.
+
+    Uses the original REAL-valued layout; version 7 replaces it.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            bill_count INTEGER NOT NULL DEFAULT 0,
+            total_items INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            total_sgst REAL NOT NULL DEFAULT 0,
+            total_cgst REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_item_sales (
+            day TEXT NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, item_type, item_name)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO daily_sales (day, bill_count, total_items, revenue, total_sgst, total_cgst)
+        SELECT DATE(created_at), COUNT(*), SUM(total_items), SUM(total_amount),
+               SUM(total_sgst), SUM(total_cgst)
+        FROM bills
+        GROUP BY DATE(created_at)
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO daily_item_sales (day, item_type, item_name, quantity, revenue)
+        SELECT DATE(b.created_at), bi.item_type, bi.item_name, SUM(bi.quantity), SUM(bi.final_price)
+        FROM bill_items bi
+        JOIN bills b ON b.id = bi.bill_id
+        GROUP BY DATE(b.created_at), bi.item_type, bi.item_name
+    ''')
+
+def _add_bill_search_index(cursor):
+    """Version 4: FTS5 index over bill number, customer, phone and item names"""
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS bills_fts USING fts5(
+                bill_no, customer_name, customer_phone, item_names,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: bill search falls back to LIKE
+        print(f"[DB WARNING] Full-text search unavailable: {e}")
+        return
+    # Phones are indexed both as stored (+91...) and as the bare 10-digit number
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bills_fts_after_insert AFTER INSERT ON bills BEGIN
+            INSERT INTO bills_fts (rowid, bill_no, customer_name, customer_phone, item_names)
+            VALUES (new.id, new.id, new.customer_name,
+                    COALESCE(new.customer_phone, '') || ' ' || substr(COALESCE(new.customer_phone, ''), -10), '');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bills_fts_after_update AFTER UPDATE OF customer_name, customer_phone ON bills BEGIN
+            UPDATE bills_fts SET customer_name = new.customer_name,
+                customer_phone = COALESCE(new.customer_phone, '') || ' ' || substr(COALESCE(new.customer_phone, ''), -10)
+            WHERE rowid = new.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bills_fts_after_delete AFTER DELETE ON bills BEGIN
+            DELETE FROM bills_fts WHERE rowid = old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bill_items_fts_after_insert AFTER INSERT ON bill_items BEGIN
+            UPDATE bills_fts SET item_names = item_names || ' ' || new.item_name WHERE rowid = new.bill_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bill_items_fts_after_delete AFTER DELETE ON bill_items BEGIN
+            UPDATE bills_fts SET item_names = COALESCE(
+                (SELECT group_concat(item_name, ' ') FROM bill_items WHERE bill_id = old.bill_id), '')
+            WHERE rowid = old.bill_id;
+        END
+    ''')
+    cursor.execute('''
+        INSERT INTO bills_fts (rowid, bill_no, customer_name, customer_phone, item_names)
+        SELECT b.id, b.id, b.customer_name,
+               COALESCE(b.customer_phone, '') || ' ' || substr(COALESCE(b.customer_phone, ''), -10),
+               COALESCE((SELECT group_concat(bi.item_name, ' ') FROM bill_items bi WHERE bi.bill_id = b.id), '')
+        FROM bills b
+    ''')
+
+def _index_item_names_per_bill(cursor):
+    """Version 5: stop re-indexing bills_fts once per inserted line item.
+
+    The bill_items insert trigger rewrote the growing item_names column on
+    every row; bill inserts now set item_names once per bill instead.
+    """
+    cursor.execute('DROP TRIGGER IF EXISTS bill_items_fts_after_insert')
+
+def _add_settings_table(cursor):
+    """Version 6: key/value store for app settings (paper width etc.)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+def _add_paise_columns(cursor):
+    """Version 7: integer paise money columns.
+
+    bills and bill_items gain *_paise columns backfilled from the REAL
+    ones, which stay in place (written alongside) for older readers. The
+    rollup tables are derived data, so they are rebuilt in paise, with
+    views exposing their old rupee columns.
+    """
+    bill_columns = ('total_amount', 'total_sgst', 'total_cgst')
+    item_columns = ('base_price', 'sgst_amount', 'cgst_amount', 'final_price')
+    for column in bill_columns:
+        cursor.execute(f'ALTER TABLE bills ADD COLUMN {column}_paise INTEGER NOT NULL DEFAULT 0')
+    for column in item_columns:
+        cursor.execute(f'ALTER TABLE bill_items ADD COLUMN {column}_paise INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('UPDATE bills SET ' + ', '.join(
+        f'{column}_paise = CAST(ROUND({column} * 100) AS INTEGER)' for column in bill_columns))
+    cursor.execute('UPDATE bill_items SET ' + ', '.join(
+        f'{column}_paise = CAST(ROUND({column} * 100) AS INTEGER)' for column in item_columns))
+
+    cursor.execute('DROP TABLE IF EXISTS daily_sales')
+    cursor.execute('DROP TABLE IF EXISTS daily_item_sales')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            bill_count INTEGER NOT NULL DEFAULT 0,
+            total_items INTEGER NOT NULL DEFAULT 0,
+            revenue_paise INTEGER NOT NULL DEFAULT 0,
+            sgst_paise INTEGER NOT NULL DEFAULT 0,
+            cgst_paise INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_item_sales (
+            day TEXT NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 0,
+            revenue_paise INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, item_type, item_name)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS daily_sales_rupees AS
+        SELECT day, bill_count, total_items, revenue_paise / 100.0 AS revenue,
+               sgst_paise / 100.0 AS total_sgst, cgst_paise / 100.0 AS total_cgst
+        FROM daily_sales
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS daily_item_sales_rupees AS
+        SELECT day, item_type, item_name, quantity, revenue_paise / 100.0 AS revenue
+        FROM daily_item_sales
+    ''')
+    cursor.execute('''
+        INSERT INTO daily_sales (day, bill_count, total_items, revenue_paise, sgst_paise, cgst_paise)
+        SELECT DATE(created_at), COUNT(*), SUM(total_items), SUM(total_amount_paise),
+               SUM(total_sgst_paise), SUM(total_cgst_paise)
+        FROM bills
+        GROUP BY DATE(created_at)
+    ''')
+    cursor.execute('''
+        INSERT INTO daily_item_sales (day, item_type, item_name, quantity, revenue_paise)
+        SELECT DATE(b.created_at), bi.item_type, bi.item_name, SUM(bi.quantity), SUM(bi.final_price_paise)
+        FROM bill_items bi
+        JOIN bills b ON b.id = bi.bill_id
+        GROUP BY DATE(b.created_at), bi.item_type, bi.item_name
+    ''')
+
+def _add_archive_registry(cursor):
+    """Version 8: registry of fiscal years moved out to billing_YYYY.db archives"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archives (
+            fiscal_year INTEGER PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            bill_count INTEGER NOT NULL DEFAULT 0,
+            first_bill_id INTEGER,
+            last_bill_id INTEGER,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def backfill_item_refs(cursor, schema: str = 'main'):
+    """Fill bill_items.item_ref_id/category_id of older lines from the current catalog.
+
+    Lines are matched by name and HSN code, then by name alone; when a name
+    is shared the lowest item id wins, and lines of items since renamed or
+    deleted stay NULL. Used by migration 9 and when upgrading archives.
+    The catalog is first reduced to indexed temp lookup tables, so each
+    line costs one index probe however large the catalog is.
+    """
+    for item_type, table in (('barcode', 'barcode_items'), ('loose', 'loose_items')):
+        cursor.execute('''
+            CREATE TEMP TABLE item_ref_by_name_hsn (
+                name TEXT NOT NULL, hsn_code TEXT NOT NULL, id INTEGER NOT NULL,
+                PRIMARY KEY (name, hsn_code)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            INSERT INTO temp.item_ref_by_name_hsn (name, hsn_code, id)
+            SELECT name, hsn_code, MIN(id) FROM main.{table}
+            WHERE name IS NOT NULL AND hsn_code IS NOT NULL
+            GROUP BY name, hsn_code
+        ''')
+        cursor.execute('''
+            CREATE TEMP TABLE item_ref_by_name (name TEXT PRIMARY KEY, id INTEGER NOT NULL) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            INSERT INTO temp.item_ref_by_name (name, id)
+            SELECT name, MIN(id) FROM main.{table} WHERE name IS NOT NULL GROUP BY name
+        ''')
+        cursor.execute(f'''
+            UPDATE {schema}.bill_items
+            SET item_ref_id = (SELECT r.id FROM temp.item_ref_by_name_hsn r
+                               WHERE r.name = bill_items.item_name AND r.hsn_code = bill_items.hsn_code)
+            WHERE item_type = ? AND item_ref_id IS NULL
+        ''', (item_type,))
+        cursor.execute(f'''
+            UPDATE {schema}.bill_items
+            SET item_ref_id = (SELECT r.id FROM temp.item_ref_by_name r WHERE r.name = bill_items.item_name)
+            WHERE item_type = ? AND item_ref_id IS NULL
+        ''', (item_type,))
+        cursor.execute('DROP TABLE temp.item_ref_by_name_hsn')
+        cursor.execute('DROP TABLE temp.item_ref_by_name')
+    cursor.execute(f'''
+        UPDATE {schema}.bill_items
+        SET category_id = (SELECT c.category_id FROM main.loose_items c WHERE c.id = bill_items.item_ref_id)
+        WHERE item_type = 'loose' AND item_ref_id IS NOT NULL AND category_id IS NULL
+    ''')
+
+def _add_item_refs(cursor):
+    """Version 9: bill_items record the sold item's id and (loose) category id.
+
+    Category reports group on category_id through a covering index instead
+    of joining loose_items on item_name.
+    """
+    cursor.execute('ALTER TABLE bill_items ADD COLUMN item_ref_id INTEGER')
+    cursor.execute('ALTER TABLE bill_items ADD COLUMN category_id INTEGER')
+    backfill_item_refs(cursor)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bill_items_sales
+        ON bill_items (bill_id, item_type, category_id, final_price_paise)
+    ''')
+
+def _add_customers(cursor):
+    """Version 10: customers table for the name completer and phone lookup.
+
+    Backfilled from the bills in this database; bills already moved to
+    archives are added by db_tools.py rebuild-customers.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL COLLATE NOCASE,
+            phone TEXT NOT NULL DEFAULT '',
+            first_visit TIMESTAMP,
+            last_visit TIMESTAMP,
+            visit_count INTEGER NOT NULL DEFAULT 0,
+            total_spent_paise INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_name_phone ON customers (name, phone)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone)')
+    cursor.execute('''
+        INSERT INTO customers (name, phone, first_visit, last_visit, visit_count, total_spent_paise)
+        SELECT customer_name, COALESCE(customer_phone, ''), MIN(created_at), MAX(created_at), COUNT(*),
+               SUM(total_amount_paise)
+        FROM bills
+        GROUP BY customer_name COLLATE NOCASE, COALESCE(customer_phone, '')
+    ''')
+
+def _enable_incremental_vacuum(cursor):
+    """Version 11: ask for auto_vacuum=INCREMENTAL so maintenance can release free pages.
+
+    Changing auto_vacuum needs a full VACUUM, which cannot run inside this
+    transaction; the first maintenance run converts the file.
+    """
+    cursor.execute('''
+        INSERT INTO settings (key, value) VALUES ('auto_vacuum', 'incremental')
+        ON CONFLICT(key) DO NOTHING
+    ''')
+
+def _add_change_log(cursor):
+    """Version 12: change_log filled by triggers on the bill and catalog tables.
+
+    Starts empty: consumers copy the tables once and follow the log from
+    its head.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete', 'archive')),
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for table in ('bills', 'bill_items', 'barcode_items', 'loose_items', 'loose_categories'):
+        for event, op, row in (('INSERT', 'insert', 'new'), ('UPDATE', 'update', 'new'), ('DELETE', 'delete', 'old')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_log_{op} AFTER {event} ON {table} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            ''')
+
+def _add_stock_ledger(cursor):
+    """Version 13: stock_movements ledger kept by triggers, opened at current quantities"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_type TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            delta REAL NOT NULL,
+            reason TEXT NOT NULL,
+            bill_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements (item_type, item_id, delta)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_ledger_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            reason TEXT NOT NULL,
+            bill_id INTEGER
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO stock_ledger_state (id, reason) VALUES (1, 'adjust')")
+    for item_type, table in (('barcode', 'barcode_items'), ('loose', 'loose_items')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stock_insert AFTER INSERT ON {table}
+            WHEN COALESCE(new.quantity, 0) != 0 BEGIN
+                INSERT INTO stock_movements (item_type, item_id, delta, reason)
+                VALUES ('{item_type}', new.id, new.quantity, 'opening');
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stock_update AFTER UPDATE OF quantity ON {table}
+            WHEN COALESCE(new.quantity, 0) != COALESCE(old.quantity, 0)
+                 AND (SELECT reason FROM stock_ledger_state WHERE id = 1) != 'rebuild' BEGIN
+                INSERT INTO stock_movements (item_type, item_id, delta, reason, bill_id)
+                SELECT '{item_type}', new.id, COALESCE(new.quantity, 0) - COALESCE(old.quantity, 0), reason, bill_id
+                FROM stock_ledger_state WHERE id = 1;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stock_delete AFTER DELETE ON {table}
+            WHEN COALESCE(old.quantity, 0) != 0 BEGIN
+                INSERT INTO stock_movements (item_type, item_id, delta, reason)
+                VALUES ('{item_type}', old.id, -old.quantity, 'delete');
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_low_stock ON {table} (quantity)
+            WHERE quantity <= 5
+        ''')
+        cursor.execute(f'''
+            INSERT INTO stock_movements (item_type, item_id, delta, reason)
+            SELECT '{item_type}', id, quantity, 'opening' FROM {table}
+            WHERE COALESCE(quantity, 0) != 0
+        ''')
+
+def _repair_zero_line_amounts(cursor):
+    """Version 14: recompute bill lines saved with zero GST and final amounts.
+
+    Lines passed to save_bill without their rupee amounts were stored as
+    0. Their amounts are recomputed from quantity, base price and the GST
+    percents (half up, as money.line_amounts does); bill totals stored as 0
+    are summed from them, and the customers and rollups of those bills are
+    brought in line.
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE repaired_lines (id INTEGER PRIMARY KEY, bill_id INTEGER, final INTEGER,
+                                          sgst INTEGER, cgst INTEGER)
+    ''')
+    cursor.execute('''
+        INSERT INTO repaired_lines (id, bill_id, final, sgst, cgst)
+        SELECT id, bill_id,
+               CAST(ROUND(quantity * base_price * (100 + COALESCE(sgst_percent, 0) + COALESCE(cgst_percent, 0))) AS INTEGER),
+               CAST(ROUND(quantity * base_price * COALESCE(sgst_percent, 0)) AS INTEGER),
+               CAST(ROUND(quantity * base_price * COALESCE(cgst_percent, 0)) AS INTEGER)
+        FROM bill_items
+        WHERE final_price_paise = 0 AND COALESCE(final_price, 0) = 0 AND quantity * base_price > 0
+    ''')
+    cursor.execute('SELECT COUNT(*) FROM repaired_lines')
+    if cursor.fetchone()[0]:
+        for column, value in (('final_price', 'final'), ('sgst_amount', 'sgst'), ('cgst_amount', 'cgst')):
+            cursor.execute(f'''
+                UPDATE bill_items SET
+                    {column}_paise = (SELECT r.{value} FROM repaired_lines r WHERE r.id = bill_items.id),
+                    {column} = (SELECT r.{value} FROM repaired_lines r WHERE r.id = bill_items.id) / 100.0
+                WHERE id IN (SELECT id FROM repaired_lines)
+            ''')
+        cursor.execute('''
+            UPDATE bill_items SET base_price_paise = CAST(ROUND(base_price * 100) AS INTEGER)
+            WHERE id IN (SELECT id FROM repaired_lines) AND base_price_paise = 0
+        ''')
+        cursor.execute('''
+            CREATE TEMP TABLE repaired_bills AS
+            SELECT b.id, b.customer_name, COALESCE(b.customer_phone, '') AS phone, DATE(b.created_at) AS day,
+                   SUM(bi.final_price_paise) AS amount, SUM(bi.sgst_amount_paise) AS sgst,
+                   SUM(bi.cgst_amount_paise) AS cgst
+            FROM bills b
+            JOIN bill_items bi ON bi.bill_id = b.id
+            WHERE b.id IN (SELECT bill_id FROM repaired_lines) AND b.total_amount_paise = 0
+            GROUP BY b.id
+        ''')
+        cursor.execute('''
+            UPDATE bills SET
+                total_amount_paise = (SELECT amount FROM repaired_bills r WHERE r.id = bills.id),
+                total_sgst_paise = (SELECT sgst FROM repaired_bills r WHERE r.id = bills.id),
+                total_cgst_paise = (SELECT cgst FROM repaired_bills r WHERE r.id = bills.id)
+            WHERE id IN (SELECT id FROM repaired_bills)
+        ''')
+        cursor.execute('''
+            UPDATE bills SET total_amount = total_amount_paise / 100.0, total_sgst = total_sgst_paise / 100.0,
+                             total_cgst = total_cgst_paise / 100.0
+            WHERE id IN (SELECT id FROM repaired_bills)
+        ''')
+        # The bills were counted at 0, so their customers are owed the new totals
+        cursor.execute('''
+            UPDATE customers SET total_spent_paise = total_spent_paise + (
+                SELECT SUM(r.amount) FROM repaired_bills r WHERE r.customer_name = customers.name AND r.phone = customers.phone)
+            WHERE EXISTS (SELECT 1 FROM repaired_bills r WHERE r.customer_name = customers.name AND r.phone = customers.phone)
+        ''')
+        # Whole days live in one file, so the days involved are recomputed from main alone
+        cursor.execute('''
+            CREATE TEMP TABLE repaired_days AS
+            SELECT DISTINCT DATE(created_at) AS day FROM bills WHERE id IN (SELECT bill_id FROM repaired_lines)
+        ''')
+        cursor.execute('DELETE FROM daily_sales WHERE day IN (SELECT day FROM repaired_days)')
+        cursor.execute('DELETE FROM daily_item_sales WHERE day IN (SELECT day FROM repaired_days)')
+        cursor.execute('''
+            INSERT INTO daily_sales (day, bill_count, total_items, revenue_paise, sgst_paise, cgst_paise)
+            SELECT DATE(created_at), COUNT(*), SUM(total_items), SUM(total_amount_paise),
+                   SUM(total_sgst_paise), SUM(total_cgst_paise)
+            FROM bills WHERE DATE(created_at) IN (SELECT day FROM repaired_days)
+            GROUP BY DATE(created_at)
+        ''')
+        cursor.execute('''
+            INSERT INTO daily_item_sales (day, item_type, item_name, quantity, revenue_paise)
+            SELECT DATE(b.created_at), bi.item_type, bi.item_name, SUM(bi.quantity), SUM(bi.final_price_paise)
+            FROM bill_items bi
+            JOIN bills b ON b.id = bi.bill_id
+            WHERE DATE(b.created_at) IN (SELECT day FROM repaired_days)
+            GROUP BY DATE(b.created_at), bi.item_type, bi.item_name
+        ''')
+        cursor.execute('DROP TABLE temp.repaired_bills')
+        cursor.execute('DROP TABLE temp.repaired_days')
+    cursor.execute('DROP TABLE temp.repaired_lines')
+
+# (version, migration) pairs, applied in order
+MIGRATIONS = [
+    (1, _create_base_schema),
+    (2, _add_bill_indexes),
+    (3, _add_daily_rollups),
+    (4, _add_bill_search_index),
+    (5, _index_item_names_per_bill),
+    (6, _add_settings_table),
+    (7, _add_paise_columns),
+    (8, _add_archive_registry),
+    (9, _add_item_refs),
+    (10, _add_customers),
+    (11, _enable_incremental_vacuum),
+    (12, _add_change_log),
+    (13, _add_stock_ledger),
+    (14, _repair_zero_line_amounts),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(cursor) -> int:
+    """Current PRAGMA user_version of the database"""
+    cursor.execute('PRAGMA user_version')
+    return cursor.fetchone()[0]
+
+def apply_migrations(connections) -> int:
+    """Bring the database up to LATEST_VERSION and return the version applied.
+
+    Startup costs a single integer check when the schema is current; pending
+    migrations run once inside one write transaction.
+    """
+    with connections.read() as cursor:
+        if get_schema_version(cursor) >= LATEST_VERSION:
+            return LATEST_VERSION
+    with connections.transaction() as cursor:
+        # Re-check under the write lock in case another process migrated first
+        version = get_schema_version(cursor)
+        for target, migration in MIGRATIONS:
+            if target > version:
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {int(target)}')
+                version = target
+    return version
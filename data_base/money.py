@@ -0,0 +1,96 @@
+"""Fixed-point money helpers.
+
+Amounts are held as integer paise (1 rupee = 100 paise) so totals and
+report SUMs are exact. Rupee floats only appear at the edges: user input
+goes through to_paise() once and display goes through format_rupees().
+Rounding is half up to the paisa, once per line item (see line_amounts).
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Tuple
+
+PAISE_PER_RUPEE = 100
+
+def _round_half_up(value: Decimal) -> int:
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def to_paise(rupees) -> int:
+    """Convert a rupee amount (float, str, int or Decimal) to integer paise"""
+    if rupees is None:
+        return 0
+    if isinstance(rupees, int):
+        return rupees * PAISE_PER_RUPEE
+    if isinstance(rupees, float):
+        # Fast path: float error cannot change the result unless the value
+        # sits on a half-paisa boundary, which is left to Decimal
+        scaled = rupees * PAISE_PER_RUPEE
+        nearest = round(scaled)
+        if abs(scaled - nearest) < 0.499:
+            return int(nearest)
+    return _round_half_up(Decimal(str(rupees)) * PAISE_PER_RUPEE)
+
+def from_paise(paise: int) -> float:
+    """Rupee float for legacy REAL columns and arithmetic in the UI"""
+    return (paise or 0) / PAISE_PER_RUPEE
+
+def format_rupees(paise: int, symbol: str = '₹') -> str:
+    """Format paise as e.g. '₹1234.50' without going through float"""
+    paise = paise or 0
+    sign = '-' if paise < 0 else ''
+    rupees, rem = divmod(abs(paise), PAISE_PER_RUPEE)
+    return f"{sign}{symbol}{rupees}.{rem:02d}"
+
+def line_amounts(quantity, base_price, sgst_percent, cgst_percent) -> Tuple[int, int, int, int]:
+    """(base, sgst, cgst, final) in paise for one bill line.
+
+    final is the exact line total rounded once; SGST and CGST are rounded
+    separately and the taxable base takes the remainder, so the parts
+    always add up to final (a tax-inclusive ₹100 item stays ₹100.00).
+    """
+    base = Decimal(str(quantity)) * Decimal(str(base_price)) * PAISE_PER_RUPEE
+    sgst_rate = Decimal(str(sgst_percent or 0)) / 100
+    cgst_rate = Decimal(str(cgst_percent or 0)) / 100
+    final = _round_half_up(base * (1 + sgst_rate + cgst_rate))
+    sgst = _round_half_up(base * sgst_rate)
+    cgst = _round_half_up(base * cgst_rate)
+    return final - sgst - cgst, sgst, cgst, final
+
+def item_paise(item: Dict) -> Tuple[int, int, int, int]:
+    """(base_price, sgst_amount, cgst_amount, final_price) paise of a line item dict.
+
+    Uses the *_paise keys set by apply_line_amounts(), then the rupee
+    amount fields of items built elsewhere; items carrying only quantity,
+    base_price and the GST percents get their amounts from line_amounts().
+    """
+    if 'final_price_paise' in item:
+        return (item['base_price_paise'], item['sgst_amount_paise'],
+                item['cgst_amount_paise'], item['final_price_paise'])
+    if any(item.get(key) is None for key in ('sgst_amount', 'cgst_amount', 'final_price')):
+        _, sgst, cgst, final = line_amounts(item['quantity'], item['base_price'],
+                                            item.get('sgst_percent'), item.get('cgst_percent'))
+        return to_paise(item['base_price']), sgst, cgst, final
+    return (to_paise(item.get('base_price')), to_paise(item.get('sgst_amount')),
+            to_paise(item.get('cgst_amount')), to_paise(item.get('final_price')))
+
+def apply_line_amounts(item: Dict):
+    """Fill in the paise and matching rupee amounts of a bill line item in place"""
+    item['base_price_paise'] = to_paise(item['base_price'])
+    _, sgst, cgst, final = line_amounts(item['quantity'], item['base_price'],
+                                        item.get('sgst_percent', 0), item.get('cgst_percent', 0))
+    item['sgst_amount_paise'] = sgst
+    item['cgst_amount_paise'] = cgst
+    item['final_price_paise'] = final
+    item['sgst_amount'] = from_paise(sgst)
+    item['cgst_amount'] = from_paise(cgst)
+    item['final_price'] = from_paise(final)
+
+def sum_items(items: Iterable[Dict]) -> Dict[str, int]:
+    """Exact bill totals in paise: base, sgst, cgst and amount"""
+    totals = {'base': 0, 'sgst': 0, 'cgst': 0, 'amount': 0}
+    for item in items:
+        _, sgst, cgst, final = item_paise(item)
+        totals['sgst'] += sgst
+        totals['cgst'] += cgst
+        totals['amount'] += final
+    totals['base'] = totals['amount'] - totals['sgst'] - totals['cgst']
+    return totals
@@ -0,0 +1,228 @@
+"""Opt-in timing of Database methods and SQL statements.
+
+When enabled, every public Database method call and every statement run
+through a ConnectionManager cursor (execute/executemany/executescript
+plus the fetches that follow) is recorded with its call count, total and max latency and a
+latency histogram. Methods returning a generator are timed across the
+next() calls that consume it; context-manager factories marked @untimed
+are skipped (the statements run inside them are timed). Statements slower
+than slow_ms are kept in a short slow log, shown in Admin Settings, together
+with their EXPLAIN QUERY PLAN. When disabled the only cost is one attribute
+check per call.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+# Upper bounds (ms) of the latency histogram buckets; the last is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+SLOW_MS = 50
+SLOW_LOG_SIZE = 100
+ENV_VAR = 'QUICKBILL_QUERY_TIMING'
+
+class QueryStats:
+    """Thread-safe counters keyed by ('method', name) or ('sql', statement text)"""
+
+    def __init__(self, enabled: bool = None, slow_ms: float = SLOW_MS):
+        if enabled is None:
+            enabled = os.environ.get(ENV_VAR, '') not in ('', '0')
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+
+    def record(self, kind: str, name: str, seconds: float):
+        ms = seconds * 1000
+        bucket = next(i for i, bound in enumerate(BUCKETS_MS) if ms <= bound)
+        with self._lock:
+            entry = self._entries.get((kind, name))
+            if entry is None:
+                entry = self._entries[(kind, name)] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                       'histogram': [0] * len(BUCKETS_MS)}
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['histogram'][bucket] += 1
+
+    def record_slow(self, sql: str, ms: float, plan: List[str]):
+        self._slow.append({'at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                           'sql': sql, 'ms': ms, 'plan': plan})
+
+    def top(self, kind: str = None, limit: int = 10, key: str = 'total_ms') -> List[Dict]:
+        """Entries sorted by key (total_ms, max_ms or calls), worst first"""
+        with self._lock:
+            rows = [dict(entry, kind=k, name=name, histogram=list(entry['histogram']))
+                    for (k, name), entry in self._entries.items() if kind is None or k == kind]
+        for row in rows:
+            row['avg_ms'] = row['total_ms'] / row['calls']
+            row['p95_ms'] = percentile(row['histogram'], 0.95)
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit]
+
+    def slow_log(self) -> List[Dict]:
+        """Recent slow statements, newest first"""
+        return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._slow.clear()
+
+    def wrap_cursor(self, cursor, conn):
+        return TimedCursor(cursor, conn, self) if self.enabled else cursor
+
+def percentile(histogram: List[int], fraction: float) -> float:
+    """Upper bound (ms) of the bucket holding the given fraction of calls"""
+    target = sum(histogram) * fraction
+    seen = 0
+    for count, bound in zip(histogram, BUCKETS_MS):
+        seen += count
+        if seen >= target:
+            return bound
+    return BUCKETS_MS[-1]
+
+def untimed(func):
+    """Leave a method out of timed_methods (context-manager factories, whose own call costs nothing)"""
+    func._untimed = True
+    return func
+
+def _timed_iter(iterator, stats: QueryStats, label: str, elapsed: float):
+    """Yield from iterator, recording the time spent producing items once it is exhausted or closed"""
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        if inspect.isgenerator(iterator):
+            iterator.close()
+        stats.record('method', label, elapsed)
+
+def timed_methods(cls):
+    """Class decorator timing every public method through the instance's query_stats"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith('_') or not callable(attr) or getattr(attr, '_untimed', False):
+            continue
+
+        def wrap(func, label):
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                stats = self.__dict__.get('query_stats')
+                if stats is None or not stats.enabled:
+                    return func(self, *args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    result = func(self, *args, **kwargs)
+                except BaseException:
+                    stats.record('method', label, time.perf_counter() - start)
+                    raise
+                elapsed = time.perf_counter() - start
+                if inspect.isgenerator(result):
+                    # The work happens as the caller consumes it
+                    return _timed_iter(result, stats, label, elapsed)
+                stats.record('method', label, elapsed)
+                return result
+            return wrapper
+
+        setattr(cls, name, wrap(attr, f'{cls.__name__}.{name}'))
+    return cls
+
+class TimedCursor:
+    """Cursor proxy timing each statement from execute() through its last fetch"""
+
+    def __init__(self, cursor, conn, stats: QueryStats):
+        self._cursor = cursor
+        self._conn = conn
+        self._stats = stats
+        self._sql = None
+        self._params = None
+        self._elapsed = 0.0
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, params, elapsed = self._sql, self._params, self._elapsed
+        self._sql = None
+        self._stats.record('sql', ' '.join(sql.split()), elapsed)
+        ms = elapsed * 1000
+        if ms >= self._stats.slow_ms:
+            self._stats.record_slow(sql, ms, self._plan(sql, params))
+
+    def _plan(self, sql: str, params) -> List[str]:
+        if params is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')):
+            return []
+        # A cursor of its own, so the statement being timed is never disturbed
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+        except Exception as e:
+            return [f'(no plan: {e})']
+        finally:
+            cursor.close()
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def execute(self, sql, params=()):
+        self._finish()
+        self._sql, self._params, self._elapsed = sql, params, 0.0
+        self._timed(self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        # No plan for batches: there is no single parameter set to explain
+        self._sql, self._params, self._elapsed = sql, None, 0.0
+        self._timed(self._cursor.executemany, sql, seq_of_params)
+        return self
+
+    def executescript(self, sql_script):
+        self._finish()
+        self._sql, self._params, self._elapsed = sql_script, None, 0.0
+        self._timed(self._cursor.executescript, sql_script)
+        return self
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed(self._cursor.fetchmany)
+        return self._timed(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        # Explain only once the statement itself is done
+        self._cursor.close()
+        self._finish()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
@@ -0,0 +1,99 @@
+"""Pre-aggregated daily sales tables kept in step with bills.
+
+daily_sales holds one row per day and daily_item_sales one row per
+(day, item_type, item_name), with money in integer paise. save_bill folds
+each new bill in with apply_bill(); rebuild() recomputes both tables from
+raw bills. The *_rupees views expose the amounts in rupees.
+"""
+
+from data_base.archive import union_all
+
+def create_tables(cursor):
+    """Create the rollup tables and their rupee views"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            bill_count INTEGER NOT NULL DEFAULT 0,
+            total_items INTEGER NOT NULL DEFAULT 0,
+            revenue_paise INTEGER NOT NULL DEFAULT 0,
+            sgst_paise INTEGER NOT NULL DEFAULT 0,
+            cgst_paise INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_item_sales (
+            day TEXT NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 0,
+            revenue_paise INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, item_type, item_name)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS daily_sales_rupees AS
+        SELECT day, bill_count, total_items, revenue_paise / 100.0 AS revenue,
+               sgst_paise / 100.0 AS total_sgst, cgst_paise / 100.0 AS total_cgst
+        FROM daily_sales
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS daily_item_sales_rupees AS
+        SELECT day, item_type, item_name, quantity, revenue_paise / 100.0 AS revenue
+        FROM daily_item_sales
+    ''')
+
+def apply_bill(cursor, bill_id: int):
+    """Add one saved bill to the rollups (call inside the saving transaction)"""
+    cursor.execute('''
+        INSERT INTO daily_sales (day, bill_count, total_items, revenue_paise, sgst_paise, cgst_paise)
+        SELECT DATE(created_at), 1, total_items, total_amount_paise, total_sgst_paise, total_cgst_paise
+        FROM bills WHERE id = ?
+        ON CONFLICT(day) DO UPDATE SET
+            bill_count = bill_count + excluded.bill_count,
+            total_items = total_items + excluded.total_items,
+            revenue_paise = revenue_paise + excluded.revenue_paise,
+            sgst_paise = sgst_paise + excluded.sgst_paise,
+            cgst_paise = cgst_paise + excluded.cgst_paise
+    ''', (bill_id,))
+    cursor.execute('''
+        INSERT INTO daily_item_sales (day, item_type, item_name, quantity, revenue_paise)
+        SELECT DATE(b.created_at), bi.item_type, bi.item_name, SUM(bi.quantity), SUM(bi.final_price_paise)
+        FROM bill_items bi
+        JOIN bills b ON b.id = bi.bill_id
+        WHERE bi.bill_id = ?
+        GROUP BY bi.item_type, bi.item_name
+        ON CONFLICT(day, item_type, item_name) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue_paise = revenue_paise + excluded.revenue_paise
+    ''', (bill_id,))
+
+def rebuild(cursor, schemas=('main',)) -> int:
+    """Recompute both rollup tables from bills/bill_items. Returns the number of days.
+
+    schemas lists the attached databases holding bills (main plus any
+    fiscal-year archives) so archived days are not lost.
+    """
+    cursor.execute('DELETE FROM main.daily_sales')
+    cursor.execute('DELETE FROM main.daily_item_sales')
+    bills = union_all('''
+        SELECT created_at, total_items, total_amount_paise, total_sgst_paise, total_cgst_paise
+        FROM {schema}.bills''', schemas)
+    cursor.execute(f'''
+        INSERT INTO main.daily_sales (day, bill_count, total_items, revenue_paise, sgst_paise, cgst_paise)
+        SELECT DATE(created_at), COUNT(*), SUM(total_items), SUM(total_amount_paise),
+               SUM(total_sgst_paise), SUM(total_cgst_paise)
+        FROM ({bills})
+        GROUP BY DATE(created_at)
+    ''')
+    items = union_all('''
+        SELECT b.created_at, bi.item_type, bi.item_name, bi.quantity, bi.final_price_paise
+        FROM {schema}.bill_items bi
+        JOIN {schema}.bills b ON b.id = bi.bill_id''', schemas)
+    cursor.execute(f'''
+        INSERT INTO main.daily_item_sales (day, item_type, item_name, quantity, revenue_paise)
+        SELECT DATE(created_at), item_type, item_name, SUM(quantity), SUM(final_price_paise)
+        FROM ({items})
+        GROUP BY DATE(created_at), item_type, item_name
+    ''')
+    cursor.execute('SELECT COUNT(*) FROM daily_sales')
+    return cursor.fetchone()[0]
@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Dict, Optional
+
+# admin_details columns cached alongside the key/value settings
+ADMIN_COLUMNS = ('shop_name', 'address', 'phone_number', 'gmail', 'use_credentials',
+                 'username', 'password', 'location')
+
+class SettingsStore:
+    """In-process cache of the admin details row and the settings table.
+
+    Everything is read in one pass on first use and served from memory
+    afterwards. set() writes through; invalidate() forces a reload after
+    admin_details changes.
+    """
+
+    def __init__(self, connections):
+        self.connections = connections
+        self._lock = threading.Lock()
+        self._values: Optional[Dict[str, Any]] = None
+        self._has_admin = False
+
+    def _load(self) -> Dict[str, Any]:
+        with self.connections.read() as cursor:
+            cursor.execute(f'''
+                SELECT {', '.join(ADMIN_COLUMNS)}
+                FROM admin_details ORDER BY id LIMIT 1
+            ''')
+            admin = cursor.fetchone()
+            cursor.execute('SELECT key, value FROM settings')
+            values = dict(cursor.fetchall())
+        self._has_admin = admin is not None
+        if admin:
+            values.update(zip(ADMIN_COLUMNS, admin))
+            values['gmail'] = values['gmail'] if values['gmail'] is not None else ''
+            values['use_credentials'] = bool(values['use_credentials'])
+            values['location'] = values['location'] if values['location'] is not None else ''
+        return values
+
+    def _cached(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._values is None:
+                self._values = self._load()
+            return self._values
+
+    def admin_details(self) -> Optional[Dict]:
+        """Copy of the admin details merged with settings, or None if no admin row"""
+        values = self._cached()
+        return dict(values) if self._has_admin else None
+
+    def get(self, key: str, default=None):
+        """Raw cached value for key"""
+        value = self._cached().get(key)
+        return default if value is None else value
+
+    def get_str(self, key: str, default: str = '') -> str:
+        value = self.get(key)
+        return default if value in (None, '') else str(value)
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        try:
+            return int(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self.get(key)
+        if value is None:
+            return default
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        return bool(value)
+
+    def set(self, key: str, value):
+        """Store a setting and update the cache"""
+        if key in ADMIN_COLUMNS:
+            raise KeyError(f"{key} is stored in admin_details; use update_admin_details")
+        with self.connections.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO settings (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+            ''', (key, str(value)))
+        with self._lock:
+            if self._values is not None:
+                self._values[key] = str(value)
+
+    def invalidate(self):
+        """Drop the cache; the next read reloads from the database"""
+        with self._lock:
+            self._values = None
@@ -0,0 +1,130 @@
+"""Stock ledger for barcode and loose items.
+
+Every change to barcode_items.quantity or loose_items.quantity is
+recorded in stock_movements by triggers, so the quantity column always
+equals the sum of the item's movements: 'opening' when an item is added,
+'sale' from save_bill, 'sync' when a counter takes the server's
+catalog, 'adjust' for inventory edits and imports, 'delete' when an item
+is removed. Code that changes stock on purpose says why through the
+one-row stock_ledger_state table (see reason()); triggers read it.
+apply_bill() decrements stock for a bill inside the saving transaction;
+rebuild() resets quantities from the ledger.
+
+Loose item quantities are in the unit they are sold by (usually kg).
+"""
+
+from contextlib import contextmanager
+from typing import List, Optional
+
+# Items at or below this quantity are low stock. It is part of the partial
+# index definitions below, so changing it needs a migration.
+LOW_STOCK_LEVEL = 5
+STOCK_TABLES = (('barcode', 'barcode_items'), ('loose', 'loose_items'))
+
+def create_tables(cursor):
+    """Create the ledger, its state row, triggers and the low-stock partial indexes"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_type TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            delta REAL NOT NULL,
+            reason TEXT NOT NULL,
+            bill_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements (item_type, item_id, delta)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_ledger_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            reason TEXT NOT NULL,
+            bill_id INTEGER
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO stock_ledger_state (id, reason) VALUES (1, 'adjust')")
+    for item_type, table in STOCK_TABLES:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stock_insert AFTER INSERT ON {table}
+            WHEN COALESCE(new.quantity, 0) != 0 BEGIN
+                INSERT INTO stock_movements (item_type, item_id, delta, reason)
+                VALUES ('{item_type}', new.id, new.quantity, 'opening');
+            END
+        ''')
+        # rebuild() sets quantity from the ledger itself, so it is not a movement
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stock_update AFTER UPDATE OF quantity ON {table}
+            WHEN COALESCE(new.quantity, 0) != COALESCE(old.quantity, 0)
+                 AND (SELECT reason FROM stock_ledger_state WHERE id = 1) != 'rebuild' BEGIN
+                INSERT INTO stock_movements (item_type, item_id, delta, reason, bill_id)
+                SELECT '{item_type}', new.id, COALESCE(new.quantity, 0) - COALESCE(old.quantity, 0), reason, bill_id
+                FROM stock_ledger_state WHERE id = 1;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stock_delete AFTER DELETE ON {table}
+            WHEN COALESCE(old.quantity, 0) != 0 BEGIN
+                INSERT INTO stock_movements (item_type, item_id, delta, reason)
+                VALUES ('{item_type}', old.id, -old.quantity, 'delete');
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_low_stock ON {table} (quantity)
+            WHERE quantity <= {LOW_STOCK_LEVEL}
+        ''')
+
+def record_opening_balances(cursor):
+    """Give every existing item an opening movement equal to its current quantity"""
+    for item_type, table in STOCK_TABLES:
+        cursor.execute(f'''
+            INSERT INTO stock_movements (item_type, item_id, delta, reason)
+            SELECT '{item_type}', id, quantity, 'opening' FROM {table}
+            WHERE COALESCE(quantity, 0) != 0
+        ''')
+
+@contextmanager
+def reason(cursor, why: str, bill_id: Optional[int] = None):
+    """Label the stock movements written inside the block (use within a transaction)"""
+    cursor.execute('UPDATE stock_ledger_state SET reason = ?, bill_id = ? WHERE id = 1', (why, bill_id))
+    try:
+        yield
+    finally:
+        cursor.execute("UPDATE stock_ledger_state SET reason = 'adjust', bill_id = NULL WHERE id = 1")
+
+def apply_bill(cursor, bill_id: int):
+    """Take a saved bill's items out of stock (call inside the saving transaction).
+
+    Lines are matched on bill_items.item_ref_id; lines without one (items
+    deleted or renamed since) do not move stock.
+    """
+    with reason(cursor, 'sale', bill_id):
+        for item_type, table in STOCK_TABLES:
+            cursor.execute(f'''
+                UPDATE {table} SET quantity = COALESCE(quantity, 0) - (
+                    SELECT SUM(bi.quantity) FROM bill_items bi
+                    WHERE bi.bill_id = ? AND bi.item_type = ? AND bi.item_ref_id = {table}.id)
+                WHERE id IN (SELECT item_ref_id FROM bill_items WHERE bill_id = ? AND item_type = ?)
+            ''', (bill_id, item_type, bill_id, item_type))
+
+def low_stock(cursor, limit: int) -> List[dict]:
+    """Items at or below LOW_STOCK_LEVEL, lowest first, read through the partial indexes"""
+    cursor.execute(f'''
+        SELECT 'barcode', id, name, quantity FROM barcode_items WHERE quantity <= {LOW_STOCK_LEVEL}
+        UNION ALL
+        SELECT 'loose', id, name, quantity FROM loose_items WHERE quantity <= {LOW_STOCK_LEVEL}
+        ORDER BY 4, 3
+        LIMIT ?
+    ''', (limit,))
+    return [{'item_type': row[0], 'id': row[1], 'name': row[2], 'quantity': row[3]}
+            for row in cursor.fetchall()]
+
+def rebuild(cursor) -> int:
+    """Reset every item's quantity to the sum of its movements. Returns the items corrected"""
+    corrected = 0
+    with reason(cursor, 'rebuild'):
+        for item_type, table in STOCK_TABLES:
+            ledger = f'''(SELECT COALESCE(SUM(m.delta), 0) FROM stock_movements m
+                         WHERE m.item_type = '{item_type}' AND m.item_id = {table}.id)'''
+            cursor.execute(f'UPDATE {table} SET quantity = {ledger} WHERE COALESCE(quantity, 0) != {ledger}')
+            corrected += cursor.rowcount
+    return corrected
@@ -0,0 +1,141 @@
+"""Data exchanged between counters and the billing sync server.
+
+Every machine in multi-counter mode has a counter_id (0-99, the server
+machine is usually 0) and numbers its bills so that
+id % BILL_ID_STRIDE == counter_id; bills rung up offline at different
+counters therefore never collide on the server. Counters send their bills
+as raw rows with export_bills() and the server stores them unchanged with
+import_bills(). The catalog flows the other way: the server publishes
+inventory_snapshot() and each counter writes only the rows that differ
+with apply_inventory(), keeping the server's item IDs.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+from data_base.archive import table_columns
+
+BILL_ID_STRIDE = 100
+# Catalog tables in dependency order with the columns of their unique key
+INVENTORY_TABLES = (
+    ('loose_categories', ('name',)),
+    ('loose_items', ('category_id', 'name', 'hsn_code')),
+    ('barcode_items', ('barcode',)),
+)
+
+def next_bill_id(max_id: int, counter_id: Optional[int]) -> int:
+    """Smallest free bill ID above max_id for this counter (plain max + 1 without one)"""
+    if counter_id is None:
+        return max_id + 1
+    bill_id = max_id - max_id % BILL_ID_STRIDE + counter_id
+    return bill_id if bill_id > max_id else bill_id + BILL_ID_STRIDE
+
+def bill_id_step(counter_id: Optional[int]) -> int:
+    return 1 if counter_id is None else BILL_ID_STRIDE
+
+def _rows(cursor) -> List[Dict]:
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+def export_bills(cursor, after_id: int, counter_id: int, limit: int, local_refs_until: int = 0) -> List[Dict]:
+    """This counter's bills with id > after_id as raw column dicts, line items under 'items'.
+
+    Bills up to local_refs_until were rung up before the counter first took
+    the server's catalog, so their item_ref_id and category_id name the
+    counter's own rows; those references are sent as None and the server
+    leaves its stock and category figures alone for them.
+    """
+    cursor.execute('SELECT * FROM bills WHERE id > ? AND id % ? = ? ORDER BY id LIMIT ?',
+                   (after_id, BILL_ID_STRIDE, counter_id, limit))
+    bills = _rows(cursor)
+    if not bills:
+        return []
+    by_id = {bill['id']: bill for bill in bills}
+    for bill in bills:
+        bill['items'] = []
+    placeholders = ', '.join('?' * len(by_id))
+    cursor.execute(f'SELECT * FROM bill_items WHERE bill_id IN ({placeholders}) ORDER BY bill_id, id',
+                   tuple(by_id))
+    for item in _rows(cursor):
+        # Line item IDs are local; the server numbers its own
+        del item['id']
+        if item['bill_id'] <= local_refs_until:
+            item['item_ref_id'] = item['category_id'] = None
+        by_id[item['bill_id']]['items'].append(item)
+    return bills
+
+def _insert_row(cursor, table: str, row: Dict, columns: set):
+    names = [name for name in row if name in columns]
+    cursor.execute(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                   [row[name] for name in names])
+
+def import_bills(cursor, bills: List[Dict]) -> List[int]:
+    """Insert pushed bills with their own IDs and timestamps; returns the IDs added.
+
+    Bills already on file are skipped, so a counter may resend a batch
+    whose reply it never saw. Columns this database does not have are
+    ignored.
+    """
+    if not bills:
+        return []
+    placeholders = ', '.join('?' * len(bills))
+    cursor.execute(f'SELECT id FROM bills WHERE id IN ({placeholders})', [bill['id'] for bill in bills])
+    existing = {row[0] for row in cursor.fetchall()}
+    bill_columns = {name for name, _ in table_columns(cursor, 'main', 'bills')}
+    item_columns = {name for name, _ in table_columns(cursor, 'main', 'bill_items')} - {'id'}
+    added = []
+    for bill in bills:
+        if bill['id'] in existing:
+            continue
+        _insert_row(cursor, 'bills', {k: v for k, v in bill.items() if k != 'items'}, bill_columns)
+        for item in bill['items']:
+            _insert_row(cursor, 'bill_items', dict(item, bill_id=bill['id']), item_columns)
+        existing.add(bill['id'])
+        added.append(bill['id'])
+    return added
+
+def inventory_snapshot(cursor) -> Tuple[str, Dict[str, List[Dict]]]:
+    """(etag, {table: rows}) of the whole catalog; the etag changes whenever any row does"""
+    snapshot = {}
+    for table, _ in INVENTORY_TABLES:
+        cursor.execute(f'SELECT * FROM {table} ORDER BY id')
+        snapshot[table] = _rows(cursor)
+    etag = hashlib.sha1(json.dumps(snapshot, sort_keys=True, default=str).encode()).hexdigest()
+    return etag, snapshot
+
+def apply_inventory(cursor, snapshot: Dict[str, List[Dict]]) -> int:
+    """Make the local catalog match a server snapshot. Returns the number of rows changed.
+
+    Rows keep the server's IDs so bill_items.item_ref_id means the same
+    item everywhere; a local row holding another row's unique key (say a
+    barcode moved between items) is removed first.
+    """
+    local = {}
+    for table, _ in INVENTORY_TABLES:
+        cursor.execute(f'SELECT * FROM {table}')
+        local[table] = {row['id']: row for row in _rows(cursor)}
+
+    changed = 0
+    for table, _ in reversed(INVENTORY_TABLES):
+        server_ids = {row['id'] for row in snapshot.get(table, [])}
+        for item_id in local[table].keys() - server_ids:
+            cursor.execute(f'DELETE FROM {table} WHERE id = ?', (item_id,))
+            changed += 1
+
+    for table, unique in INVENTORY_TABLES:
+        columns = {name for name, _ in table_columns(cursor, 'main', table)}
+        for row in snapshot.get(table, []):
+            row = {k: v for k, v in row.items() if k in columns}
+            current = local[table].get(row['id'])
+            if current is not None and all(current.get(k) == v for k, v in row.items()):
+                continue
+            cursor.execute(f"DELETE FROM {table} WHERE {' AND '.join(f'{c} = ?' for c in unique)} AND id != ?",
+                           [row.get(c) for c in unique] + [row['id']])
+            names = list(row)
+            updates = ', '.join(f'{name} = excluded.{name}' for name in names if name != 'id')
+            cursor.execute(f'''
+                INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})
+                ON CONFLICT(id) DO UPDATE SET {updates}
+            ''', [row[name] for name in names])
+            changed += 1
+    return changed
@@ -0,0 +1,146 @@
+"""Counter side of multi-counter mode.
+
+The counter keeps billing against its own billing.db (the local cache):
+checkout never waits on the network. SyncClient pushes the counter's new
+bills to the sync server in batches and pulls catalog changes back, every
+interval seconds and whenever sync_now() is called. Bills are pushed in ID
+order and the highest ID the server has confirmed is kept in the
+sync_last_pushed_id setting, so a counter that was offline catches up on
+its next successful sync. Bills the server refuses are logged to
+sync_rejected.jsonl next to the database and passed over, so the bills
+after them keep flowing.
+"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BATCH_SIZE = 200
+INTERVAL_SECONDS = 30
+TIMEOUT_SECONDS = 15
+REJECTED_FILE = 'sync_rejected.jsonl'
+
+class SyncClient:
+    """Background thread syncing one counter's Database with the sync server"""
+
+    def __init__(self, db, server_url: str, token: str = '', interval: float = INTERVAL_SECONDS):
+        self.db = db
+        self.server_url = server_url.rstrip('/')
+        self.token = token
+        self.interval = interval
+        self.last_sync = None
+        self.last_error = None
+        self.rejected_path = os.path.join(os.path.dirname(db.db_path), REJECTED_FILE)
+        self.rejected = self._count_rejected()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="SyncClient", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def sync_now(self):
+        """Ask the sync thread to sync immediately"""
+        self._wake.set()
+
+    def pending_count(self) -> int:
+        """Saved bills not yet confirmed by the server"""
+        return self.db.count_unpushed_bills()
+
+    def _count_rejected(self) -> int:
+        if not os.path.exists(self.rejected_path):
+            return 0
+        with open(self.rejected_path, encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+
+    def _log_rejected(self, rejected: List[Dict]):
+        """Record bills the server refused; they stay in the local database"""
+        at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(self.rejected_path, 'a', encoding='utf-8') as f:
+            for entry in rejected:
+                f.write(json.dumps({'rejected_at': at, 'id': entry.get('id'), 'error': entry.get('error')}) + '\n')
+        self.rejected += len(rejected)
+        for entry in rejected:
+            print(f"[SYNC ERROR] server refused bill {entry.get('id')}: {entry.get('error')}")
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.server_url + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('X-Sync-Token', self.token)
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT_SECONDS) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise ConnectionError(f'sync server refused {method} {path}: {message}') from None
+
+    def push_bills(self) -> int:
+        """Send unpushed bills batch by batch. Returns how many the server took"""
+        pushed = 0
+        while True:
+            bills = self.db.export_bills(BATCH_SIZE)
+            if not bills:
+                return pushed
+            reply = self._request('POST', '/bills', {'counter_id': self.db.counter_id(), 'bills': bills})
+            if reply.get('rejected'):
+                self._log_rejected(reply['rejected'])
+            self.db.mark_bills_pushed(bills[-1]['id'])
+            pushed += len(reply.get('added', []))
+            if len(bills) < BATCH_SIZE:
+                return pushed
+
+    def pull_inventory(self) -> int:
+        """Apply catalog changes from the server. Returns the number of rows changed"""
+        etag = self.db.settings.get_str('sync_inventory_etag')
+        if not etag:
+            self.db.mark_local_item_refs()
+        reply = self._request('GET', f'/inventory?etag={etag}')
+        if reply.get('unchanged'):
+            return 0
+        changed = self.db.apply_inventory(reply['inventory'])
+        self.db.settings.set('sync_inventory_etag', reply['etag'])
+        return changed
+
+    def sync_once(self) -> Dict:
+        """Push bills, then pull the catalog; returns {'pushed', 'inventory_changes'}.
+
+        A counter that has never taken the server's catalog pulls it first,
+        so the bills it pushes name items by the server's IDs.
+        """
+        with self._sync_lock:
+            changes = 0 if self.db.settings.get_str('sync_inventory_etag') else self.pull_inventory()
+            result = {'pushed': self.push_bills(), 'inventory_changes': changes + self.pull_inventory()}
+            self.last_sync = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return result
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                self.sync_once()
+                self.last_error = None
+            except Exception as e:
+                # Server unreachable, a bad reply or a busy local database: bills
+                # stay queued locally and the next round tries again
+                self.last_error = str(e) or type(e).__name__
+                print(f"[SYNC ERROR] {e}")
+            self._wake.wait(self.interval)
@@ -0,0 +1,204 @@
+"""Local-network sync service for multi-counter shops.
+
+A small asyncio HTTP/JSON server wrapping the Database of the back-office
+machine. Counters push their bills to it and pull the catalog from it:
+
+    GET  /status                  server counter_id and bill count
+    POST /bills                   {"counter_id": n, "bills": [...]} -> {"added": [...], "skipped": [...],
+                                                                         "rejected": [{"id": ..., "error": ...}]}
+    GET  /inventory?etag=<etag>   {"etag": ..., "inventory": {...}} or {"etag": ..., "unchanged": true}
+
+Database calls are blocking, so they run on the default executor. When a
+sync_token is configured every request must carry it in X-Sync-Token; the
+server listens on localhost only unless it has one. A bill that cannot be
+stored is reported under "rejected" and the rest of the batch is kept, so
+one bad bill never stops a counter from syncing. Run it with
+`python db_tools.py sync-server`.
+"""
+
+import asyncio
+import ipaddress
+import json
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+from data_base import sync
+
+DEFAULT_PORT = 8765
+DEFAULT_HOST = '127.0.0.1'
+MAX_BODY = 32 * 1024 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class SyncError(Exception):
+    """Request rejected with an HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class SyncServer:
+    """Serve one Database to the counters on the LAN"""
+
+    def __init__(self, db, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, token: str = ''):
+        if not token and not is_loopback(host):
+            raise ValueError(f"refusing to serve on {host} without a sync_token; set one or use {DEFAULT_HOST}")
+        self.db = db
+        self.host = host
+        self.port = port
+        self.token = token
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port 0 asks the OS for a free port; report the one chosen
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def run(self):
+        """Serve until interrupted (blocking)"""
+        asyncio.run(self.serve_forever())
+
+    def start_in_thread(self):
+        """Serve from a daemon thread; returns once the socket is listening"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            try:
+                self._loop.run_until_complete(self.serve_forever())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="SyncServer", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self, timeout: float = None):
+        """Stop a server started with start_in_thread()"""
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target, headers, body = await self._read_request(reader)
+                if self.token and headers.get('x-sync-token') != self.token:
+                    raise SyncError(401, 'missing or wrong sync token')
+                status, payload = 200, await self._dispatch(method, target, body)
+            except SyncError as e:
+                status, payload = e.status, {'error': str(e)}
+            except Exception as e:
+                print(f"[SYNC ERROR] {e}")
+                status, payload = 500, {'error': str(e)}
+            data = json.dumps(payload).encode()
+            writer.write(f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                         f'Content-Type: application/json\r\n'
+                         f'Content-Length: {len(data)}\r\n'
+                         f'Connection: close\r\n\r\n'.encode() + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise SyncError(400, 'malformed request line')
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY:
+            raise SyncError(413, 'request body too large')
+        body = await reader.readexactly(length) if length else b''
+        return request_line[0].upper(), request_line[1], headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        loop = asyncio.get_running_loop()
+        if method == 'GET' and url.path == '/status':
+            return await loop.run_in_executor(None, self._status)
+        if method == 'GET' and url.path == '/inventory':
+            return await loop.run_in_executor(None, self._inventory, query.get('etag'))
+        if method == 'POST' and url.path == '/bills':
+            try:
+                request = json.loads(body)
+            except ValueError:
+                raise SyncError(400, 'body is not JSON')
+            return await loop.run_in_executor(None, self._push_bills, request)
+        raise SyncError(404, f'no route for {method} {url.path}')
+
+    def _status(self) -> Dict:
+        with self.db.read() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM bills')
+            bill_count = cursor.fetchone()[0]
+        return {'counter_id': self.db.counter_id(), 'bills': bill_count}
+
+    def _inventory(self, etag: Optional[str]) -> Dict:
+        current, snapshot = self.db.inventory_snapshot()
+        if etag == current:
+            return {'etag': current, 'unchanged': True}
+        return {'etag': current, 'inventory': snapshot}
+
+    def _push_bills(self, request: Dict) -> Dict:
+        if not isinstance(request, dict):
+            raise SyncError(400, 'expected a JSON object')
+        counter_id = request.get('counter_id')
+        bills = request.get('bills')
+        if not isinstance(counter_id, int) or not isinstance(bills, list):
+            raise SyncError(400, 'expected counter_id and bills')
+        if counter_id == self.db.counter_id():
+            raise SyncError(400, f'counter_id {counter_id} is the server\'s own')
+        valid, rejected = [], []
+        for bill in bills:
+            if not isinstance(bill, dict) or not isinstance(bill.get('id'), int):
+                rejected.append({'id': bill.get('id') if isinstance(bill, dict) else None,
+                                 'error': 'bill needs an integer id'})
+            elif bill['id'] % sync.BILL_ID_STRIDE != counter_id:
+                rejected.append({'id': bill['id'], 'error': f'does not belong to counter {counter_id}'})
+            else:
+                valid.append(bill)
+        try:
+            added = self.db.import_bills(valid)
+        except Exception:
+            # Store the rest of the batch and report the bill(s) at fault
+            added = []
+            for bill in valid:
+                try:
+                    added += self.db.import_bills([bill])
+                except Exception as e:
+                    rejected.append({'id': bill['id'], 'error': f'{type(e).__name__}: {e}'})
+        added_set = set(added)
+        rejected_ids = {entry['id'] for entry in rejected}
+        return {'added': added, 'rejected': rejected,
+                'skipped': [bill['id'] for bill in valid if bill['id'] not in added_set | rejected_ids]}
+
+def is_loopback(host: str) -> bool:
+    """Whether host only accepts connections from this machine"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
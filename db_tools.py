@@ -0,0 +1,235 @@
+import argparse
+import os
+from datetime import date
+from data_base.database import Database, default_db_path
+from data_base import archive
+from data_base import backup
+from data_base import sync_server
+
+def rebuild_rollups(db, args):
+    days = db.rebuild_daily_rollups()
+    print(f'Rebuilt daily sales rollups for {days} day(s).')
+
+def rebuild_customers(db, args):
+    count = db.rebuild_customers()
+    print(f'Rebuilt {count} customer record(s).')
+
+def archive_years(db, args):
+    current = archive.fiscal_year_of(date.today())
+    if args.year is not None:
+        years = [args.year]
+    else:
+        # Every closed fiscal year that still has bills in the hot database
+        with db.read() as cursor:
+            cursor.execute('SELECT MIN(created_at) FROM bills')
+            oldest = cursor.fetchone()[0]
+        years = list(range(archive.fiscal_year_of(oldest), current)) if oldest else []
+    for year in years:
+        moved = db.archive_fiscal_year(year)
+        print(f'Fiscal year {year}-{(year + 1) % 100:02d}: moved {moved} bill(s) to {archive.file_name(year)}')
+    if not years:
+        print('No closed fiscal years to archive.')
+
+def list_archives(db, args):
+    entries = db.list_archives()
+    if not entries:
+        print('No archives.')
+    for entry in entries:
+        print(f"{entry['file_name']}: {entry['start_date']} to {entry['end_date']} (exclusive), "
+              f"{entry['bill_count']} bill(s), IDs {entry['first_bill_id']}-{entry['last_bill_id']}, "
+              f"archived {entry['archived_at']}")
+
+def backup_now(db, args):
+    path = db.backup_now(args.keep)
+    print(f'Backup written to {path}')
+
+def list_backups(db, args):
+    entries = backup.list_backups(backup.default_backup_dir(db.db_path))
+    if not entries:
+        print('No backups.')
+    for entry in entries:
+        archives = f" + {len(entry['archives'])} archive(s)" if entry['archives'] else ''
+        print(f"{entry['name']}{archives}: {entry['size'] / 1024:.0f} KB")
+
+def restore(args):
+    snapshot = args.snapshot
+    if not os.path.exists(snapshot):
+        snapshot = os.path.join(backup.default_backup_dir(args.db_path), snapshot)
+    if not args.yes:
+        answer = input(f'Replace {args.db_path} with {snapshot}? Close the app first. [y/N] ')
+        if answer.strip().lower() != 'y':
+            print('Restore cancelled.')
+            return
+    saved = backup.restore_backup(snapshot, args.db_path)
+    print(f'Restored {snapshot}. The previous database was saved as {saved}')
+
+def run_maintenance(db, args):
+    report = db.run_maintenance(integrity=not args.skip_integrity)
+    print_maintenance_report(report)
+
+def maintenance_status(db, args):
+    report = db.last_maintenance()
+    if report is None:
+        print('Maintenance has not run yet.')
+    else:
+        print_maintenance_report(report)
+
+def print_maintenance_report(report):
+    print(f"Maintenance finished {report['finished_at']}:")
+    for result in report['results']:
+        status = 'ok' if result['ok'] else 'FAILED'
+        print(f"  {result['step']}: {status}, {result['detail']} ({result['ms']:.0f} ms)")
+
+def set_counter(db, args):
+    counter_id = None if args.counter_id.lower() == 'none' else int(args.counter_id)
+    db.set_counter_id(counter_id)
+    if args.server is not None:
+        db.update_admin_setting('sync_server_url', args.server)
+    if args.token is not None:
+        db.update_admin_setting('sync_token', args.token)
+    if counter_id is None:
+        print('Multi-counter mode off; bill IDs are numbered 1, 2, 3, ...')
+    else:
+        print(f'This machine is counter {counter_id}; new bill IDs end in {counter_id:02d}.')
+        url = db.settings.get_str('sync_server_url')
+        print(f'Sync server: {url}' if url else 'No sync server set (use --server http://HOST:PORT).')
+
+def run_sync(db, args):
+    client = db.sync_client
+    if client is None:
+        print('Not a counter: run set-counter N --server http://HOST:PORT first.')
+        return
+    result = client.sync_once()
+    print(f"Pushed {result['pushed']} bill(s); {result['inventory_changes']} catalog row(s) updated.")
+    if client.rejected:
+        print(f'{client.rejected} bill(s) refused by the server so far; see {client.rejected_path}')
+
+def serve(db, args):
+    if db.counter_id() is None:
+        # The server machine bills too; give it its own ID series
+        db.set_counter_id(0)
+    try:
+        server = sync_server.SyncServer(db, args.host, args.port, token=db.settings.get_str('sync_token'))
+    except ValueError as e:
+        print(f'Error: {e} (python db_tools.py set-counter 0 --token SECRET)')
+        return
+    print(f'Sync server for counter {db.counter_id()} listening on {args.host}:{args.port} (Ctrl+C to stop)')
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+
+def show_changes(db, args):
+    entries = db.changes_since(args.since, args.limit)
+    for entry in entries:
+        print(f"{entry['seq']}: {entry['op']} {entry['table']} #{entry['row_id']} at {entry['changed_at']}")
+    print(f'{len(entries)} change(s); log head is {db.change_log_head()}.')
+
+def prune_changes(db, args):
+    removed = db.prune_change_log(args.keep_days)
+    print(f'Removed {removed} change log entr{"y" if removed == 1 else "ies"} older than {args.keep_days} day(s).')
+
+def low_stock(db, args):
+    items = db.get_low_stock(args.limit)
+    if not items:
+        print('No items are low on stock.')
+    for item in items:
+        print(f"{item['item_type']} #{item['id']} {item['name']}: {item['quantity']:g}")
+
+def rebuild_stock(db, args):
+    corrected = db.rebuild_stock()
+    print(f'Reset {corrected} item quantit{"y" if corrected == 1 else "ies"} from the stock ledger.')
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='QuickBill database maintenance tools')
+    parser.add_argument('--db', dest='db_path', default=None,
+                        help='Path to billing.db (defaults to data_base/billing.db next to this script)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rollups_parser = subparsers.add_parser('rebuild-rollups', help='Recompute the daily sales rollup tables from all bills')
+    rollups_parser.set_defaults(func=rebuild_rollups)
+
+    customers_parser = subparsers.add_parser('rebuild-customers', help='Recompute the customers table from all bills')
+    customers_parser.set_defaults(func=rebuild_customers)
+
+    archive_parser = subparsers.add_parser('archive', help='Move closed fiscal years of bills into billing_YYYY.db files')
+    archive_parser.add_argument('--year', type=int, default=None,
+                                help='Fiscal year to archive, by starting year (2023 = Apr 2023 - Mar 2024). '
+                                     'Defaults to every closed year')
+    archive_parser.set_defaults(func=archive_years)
+
+    list_parser = subparsers.add_parser('list-archives', help='Show archived fiscal years')
+    list_parser.set_defaults(func=list_archives)
+
+    backup_parser = subparsers.add_parser('backup', help='Write a verified snapshot to data_base/backups')
+    backup_parser.add_argument('--keep', type=int, default=None,
+                               help='Number of snapshots to keep (defaults to the backup_keep setting)')
+    backup_parser.set_defaults(func=backup_now)
+
+    list_backups_parser = subparsers.add_parser('list-backups', help='Show snapshots, newest first')
+    list_backups_parser.set_defaults(func=list_backups)
+
+    restore_parser = subparsers.add_parser('restore', help='Replace billing.db with a snapshot (close the app first)')
+    restore_parser.add_argument('snapshot', help='Snapshot file, or its name inside data_base/backups')
+    restore_parser.add_argument('--yes', action='store_true', help='Do not ask for confirmation')
+    restore_parser.set_defaults(func=restore)
+
+    maintenance_parser = subparsers.add_parser('maintenance',
+                                               help='Run ANALYZE/optimize, incremental vacuum, WAL checkpoint and integrity check')
+    maintenance_parser.add_argument('--skip-integrity', action='store_true',
+                                    help='Skip PRAGMA integrity_check (slow on large databases)')
+    maintenance_parser.set_defaults(func=run_maintenance)
+
+    status_parser = subparsers.add_parser('maintenance-status', help='Show the result of the last maintenance run')
+    status_parser.set_defaults(func=maintenance_status)
+
+    low_stock_parser = subparsers.add_parser('low-stock', help='List items at or below the low-stock level')
+    low_stock_parser.add_argument('--limit', type=int, default=50, help='Maximum items to list (default 50)')
+    low_stock_parser.set_defaults(func=low_stock)
+
+    stock_parser = subparsers.add_parser('rebuild-stock', help='Reset item quantities from the stock_movements ledger')
+    stock_parser.set_defaults(func=rebuild_stock)
+
+    changes_parser = subparsers.add_parser('changes', help='List change log entries after a sequence number')
+    changes_parser.add_argument('--since', type=int, default=0, help='Show entries after this seq (default 0)')
+    changes_parser.add_argument('--limit', type=int, default=100, help='Maximum entries to show (default 100)')
+    changes_parser.set_defaults(func=show_changes)
+
+    prune_parser = subparsers.add_parser('prune-changes', help='Delete old change log entries')
+    prune_parser.add_argument('--keep-days', type=int, default=90, help='Keep this many days of changes (default 90)')
+    prune_parser.set_defaults(func=prune_changes)
+
+    counter_parser = subparsers.add_parser('set-counter', help='Make this machine a numbered counter (or "none" to leave multi-counter mode)')
+    counter_parser.add_argument('counter_id', help='Counter number 0-99; 0 is usually the server machine')
+    counter_parser.add_argument('--server', default=None, help='Sync server URL, e.g. http://192.168.1.10:8765')
+    counter_parser.add_argument('--token', default=None, help='Shared secret, if the server sets one')
+    counter_parser.set_defaults(func=set_counter)
+
+    sync_parser = subparsers.add_parser('sync', help='Push unsent bills to the sync server and pull catalog changes now')
+    sync_parser.set_defaults(func=run_sync)
+
+    server_parser = subparsers.add_parser('sync-server', help='Serve this database to the other counters on the LAN')
+    server_parser.add_argument('--host', default=sync_server.DEFAULT_HOST,
+                               help=f'Address to listen on (default {sync_server.DEFAULT_HOST}; '
+                                    '0.0.0.0 for the LAN, which needs a sync_token)')
+    server_parser.add_argument('--port', type=int, default=sync_server.DEFAULT_PORT,
+                               help=f'Port to listen on (default {sync_server.DEFAULT_PORT})')
+    server_parser.set_defaults(func=serve)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.func is restore:
+        # Restore works on the files directly, without opening the app's connections
+        args.db_path = args.db_path or default_db_path()
+        restore(args)
+        return
+    db = Database(args.db_path)
+    try:
+        args.func(db, args)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
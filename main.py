@@ -10,7 +10,7 @@ from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPixmap, QFont
 from billing_tabs.home_dashboard import HomeDashboard
 from billing_tabs.login_dialog import LoginDialog
-from data_base.database import Database
+from data_base.database import get_database, close_all_databases
 
 def create_splash_screen():
     """Create a splash screen for the application"""
@@ -54,7 +54,11 @@ def main():
         # Initialize database
         splash.showMessage("Initializing database with GST support...", Qt.AlignCenter, Qt.black)
         app.processEvents()
-        db = Database()
+        db = get_database()
+        db.backup_scheduler.start()
+        db.maintenance_scheduler.start()
+        if db.sync_client is not None:
+            db.sync_client.start()
         # Check if credentials are required
         admin_details = db.get_admin_details()
         if admin_details and admin_details.get('use_credentials', False):
@@ -79,7 +83,9 @@ def main():
         QMessageBox.critical(None, "Startup Error", f"Failed to start application:\n{str(e)}")
         sys.exit(1)
     # Run the application
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    close_all_databases()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 from data_base.database import Database
+from data_base.bill_writer import BillWriter
 
 def reset_database(db_path='data_base/billing.db'):
     if os.path.exists(db_path):
@@ -7,6 +8,11 @@ def reset_database(db_path='data_base/billing.db'):
         print('Deleted existing billing.db.')
     else:
         print('No existing billing.db found.')
+    # Remove leftover WAL and bill journal files so they are not replayed into the new database
+    for path in (db_path + '-wal', db_path + '-shm',
+                 os.path.join(os.path.dirname(db_path), BillWriter.JOURNAL_FILE)):
+        if os.path.exists(path):
+            os.remove(path)
     # Recreate the database using the Database class, which handles all initialization
     db = Database(db_path)
     print('Database has been reset and initialized.')
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base.database import Database
+from tests.test_backup import save_bill
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+        self.old = save_bill(self.db, 'Old', '2020-06-01 10:00:00')
+        self.hot = save_bill(self.db, 'New')
+        self.moved = self.db.archive_fiscal_year(2020)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_fiscal_year_moves_to_its_own_file(self):
+        self.assertEqual(self.moved, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, 'billing_2020.db')))
+        self.assertEqual([entry['fiscal_year'] for entry in self.db.list_archives()], [2020])
+        self.assertEqual([bill['id'] for bill in self.db.get_bills_page(limit=10)], [self.hot])
+        # Running it again finds nothing left to move
+        self.assertEqual(self.db.archive_fiscal_year(2020), 0)
+
+    def test_archived_bills_are_read_through_attach(self):
+        bill = self.db.get_bill_by_id(self.old)
+        self.assertEqual(bill['customer_name'], 'Old')
+        self.assertEqual([item['name'] for item in bill['items']], ['Soap'])
+        in_range = self.db.get_bills_by_date_range('2020-04-01', '2020-12-31')
+        self.assertEqual([bill['id'] for bill in in_range], [self.old])
+        streamed = [(bill['id'], len(items)) for bill, items in self.db.iter_bills_with_items()]
+        self.assertEqual(streamed, [(self.hot, 1), (self.old, 1)])
+
+    def test_open_fiscal_year_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.db.archive_fiscal_year(2100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from data_base import backup
+from data_base.database import Database
+
+
+def save_bill(db, name, created_at=None):
+    items = [{'name': 'Soap', 'hsn_code': '3401', 'quantity': 1, 'base_price': 100.0,
+              'sgst_percent': 2.5, 'cgst_percent': 2.5, 'item_type': 'barcode'}]
+    bill_id = db.save_bill(name, '+919999999999', items, 105.0, 1, 0, 2.5, 2.5)
+    if created_at:
+        with db.transaction() as cursor:
+            cursor.execute('UPDATE bills SET created_at = ? WHERE id = ?', (created_at, bill_id))
+    return bill_id
+
+
+class BackupTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'billing.db')
+        self.db = Database(self.db_path)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_snapshot_is_verified_and_rotated(self):
+        save_bill(self.db, 'Ann')
+        backup_dir = os.path.join(self.tmp, 'backups')
+        for old_name in ('billing-00000000-000000.db', 'billing-00000000-000001.db'):
+            path = backup.create_backup(self.db_path, backup_dir, keep=2)
+            self.assertEqual(backup.integrity_check(path), 'ok')
+            os.rename(path, os.path.join(backup_dir, old_name))
+        newest = backup.create_backup(self.db_path, backup_dir, keep=2)
+        names = [entry['name'] for entry in backup.list_backups(backup_dir)]
+        self.assertEqual(names, [os.path.basename(newest), 'billing-00000000-000001.db'])
+
+    def test_archives_are_backed_up_and_restored(self):
+        archived = save_bill(self.db, 'Old', '2020-06-01 10:00:00')
+        hot = save_bill(self.db, 'New')
+        self.assertEqual(self.db.archive_fiscal_year(2020), 1)
+        archive_path = os.path.join(self.tmp, 'billing_2020.db')
+
+        snapshot = backup.create_backup(self.db_path, os.path.join(self.tmp, 'backups'))
+        entry = backup.list_backups(os.path.join(self.tmp, 'backups'))[0]
+        self.assertEqual(entry['archives'], ['billing_2020.db'])
+
+        # Lose both the archived and the hot bill, then restore
+        self.db.close()
+        with sqlite3.connect(archive_path) as conn:
+            conn.execute('DELETE FROM bill_items')
+            conn.execute('DELETE FROM bills')
+        conn.close()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM bill_items')
+            conn.execute('DELETE FROM bills')
+        conn.close()
+        saved = backup.restore_backup(snapshot, self.db_path)
+        self.assertTrue(os.path.isdir(backup.archives_dir(saved)))
+
+        self.db = Database(self.db_path)
+        self.assertEqual(self.db.get_bill_by_id(hot)['customer_name'], 'New')
+        self.assertEqual(self.db.get_bill_by_id(archived)['customer_name'], 'Old')
+
+
+if __name__ == '__main__':
+    unittest.main()
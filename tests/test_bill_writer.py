@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from data_base.database import Database
+
+
+def make_bill(name):
+    return {
+        'customer_name': name,
+        'customer_phone': '+919999999999',
+        'total_amount': 105.0,
+        'total_items': 1,
+        'total_weight': 0,
+        'total_sgst': 2.5,
+        'total_cgst': 2.5,
+        'items': [{'name': 'Soap', 'hsn_code': '3401', 'quantity': 1, 'base_price': 100.0,
+                   'sgst_percent': 2.5, 'cgst_percent': 2.5, 'item_type': 'barcode'}],
+    }
+
+
+class BillWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_bad_bill_does_not_block_the_rest_of_its_batch(self):
+        writer = self.db.bill_writer
+        bad = make_bill('Bad')
+        del bad['total_amount']
+        # Hold the queue so all three bills are taken as one batch
+        with writer._cond:
+            first = writer.submit(make_bill('First'))
+            bad_id = writer.submit(bad)
+            last = writer.submit(make_bill('Last'))
+        self.assertTrue(writer.flush(timeout=10))
+
+        self.assertIsNotNone(self.db.get_bill_by_id(first))
+        self.assertIsNotNone(self.db.get_bill_by_id(last))
+        self.assertIsNone(self.db.get_bill_by_id(bad_id))
+        self.assertEqual(writer.failed_count(), 1)
+        with open(writer.failed_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['bill']['id'] for record in records], [bad_id])
+
+        # The queue keeps draining after the failure
+        later = writer.submit(make_bill('Later'))
+        self.assertTrue(writer.flush(timeout=10))
+        self.assertIsNotNone(self.db.get_bill_by_id(later))
+
+    def fail_bills_named(self, name, error, times=None):
+        """Make db.save_bills raise error while the batch holds a bill called name"""
+        save_bills = self.db.save_bills
+        calls = []
+
+        def patched(bills):
+            if any(bill['customer_name'] == name for bill in bills) and (times is None or len(calls) < times):
+                calls.append(1)
+                raise error
+            return save_bills(bills)
+
+        self.db.save_bills = patched
+        return calls
+
+    def test_permanent_operational_error_is_set_aside(self):
+        writer = self.db.bill_writer
+        self.fail_bills_named('Bad', sqlite3.OperationalError('no such column: total_amount'))
+        bad_id = writer.submit(make_bill('Bad'))
+        good = writer.submit(make_bill('Good'))
+        self.assertTrue(writer.flush(timeout=10))
+        self.assertIsNone(self.db.get_bill_by_id(bad_id))
+        self.assertIsNotNone(self.db.get_bill_by_id(good))
+        self.assertEqual(writer.failed_count(), 1)
+
+    def test_locked_database_is_retried(self):
+        writer = self.db.bill_writer
+        writer.RETRY_DELAY = 0
+        calls = self.fail_bills_named('Busy', sqlite3.OperationalError('database is locked'), times=3)
+        bill_id = writer.submit(make_bill('Busy'))
+        self.assertTrue(writer.flush(timeout=10))
+        self.assertEqual(len(calls), 3)
+        self.assertIsNotNone(self.db.get_bill_by_id(bill_id))
+        self.assertEqual(writer.failed_count(), 0)
+
+    def test_submitted_bill_is_journaled_until_committed(self):
+        writer = self.db.bill_writer
+        with writer._cond:
+            bill_id = writer.submit(make_bill('Journaled'))
+            with open(writer.journal_path, encoding='utf-8') as f:
+                self.assertEqual([json.loads(line)['id'] for line in f], [bill_id])
+        self.assertTrue(writer.flush(timeout=10))
+        self.assertFalse(os.path.exists(writer.journal_path))
+
+    def test_journal_is_replayed_on_open(self):
+        saved = self.db.save_bill('Saved', '+919999999999', make_bill('Saved')['items'], 105.0, 1, 0, 2.5, 2.5)
+        lost = dict(make_bill('Lost'), id=saved + 1)
+        journal = self.db.bill_writer.journal_path
+        with open(journal, 'w', encoding='utf-8') as f:
+            # A bill committed before the crash, one that was not, and a torn last line
+            f.write(json.dumps(dict(make_bill('Saved'), id=saved)) + '\n')
+            f.write(json.dumps(lost) + '\n')
+            f.write('{"customer_name": "Torn')
+        self.db.close()
+
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+        self.assertEqual(self.db.get_bill_by_id(lost['id'])['customer_name'], 'Lost')
+        self.assertEqual(len(self.db.get_all_bills()), 2)
+        self.assertFalse(os.path.exists(journal))
+        self.assertGreater(self.db.reserve_bill_id(), lost['id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
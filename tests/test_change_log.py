@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base.change_log import ChangeLogTruncated
+from data_base.database import Database
+from tests.test_backup import save_bill
+
+
+class ChangeLogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_bill_rows_are_logged(self):
+        start = self.db.change_log_head()
+        bill_id = save_bill(self.db, 'Ann')
+        changes = self.db.changes_since(start)
+        self.assertIn(('bills', bill_id, 'insert'), [(c['table'], c['row_id'], c['op']) for c in changes])
+        self.assertEqual(changes[-1]['seq'], self.db.change_log_head())
+
+    def test_pruning_drops_old_entries_and_flags_readers_behind_it(self):
+        save_bill(self.db, 'Old')
+        old_head = self.db.change_log_head()
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE change_log SET changed_at = '2000-01-01 00:00:00'")
+        new_bill = save_bill(self.db, 'New')
+
+        self.assertEqual(self.db.prune_change_log(keep_days=30), old_head)
+        with self.assertRaises(ChangeLogTruncated):
+            self.db.changes_since(0)
+        # A reader that had caught up before the prune carries on
+        changes = self.db.changes_since(old_head)
+        self.assertIn(('bills', new_bill), [(c['table'], c['row_id']) for c in changes])
+
+
+if __name__ == '__main__':
+    unittest.main()
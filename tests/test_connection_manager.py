@@ -0,0 +1,51 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from data_base.database import Database
+
+
+class ReaderLifetimeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def read_on_thread(self, release=False):
+        opened = []
+
+        def work():
+            opened.append(self.db.connections.reader())
+            self.db.count_unpushed_bills()
+            if release:
+                self.db.release_reader()
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        return opened[0]
+
+    def assertClosed(self, conn):
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+    def test_release_reader_closes_worker_connection(self):
+        conn = self.read_on_thread(release=True)
+        self.assertClosed(conn)
+        self.assertNotIn(conn, [entry[1] for entry in self.db.connections._readers])
+
+    def test_readers_of_finished_threads_are_closed(self):
+        first = self.read_on_thread()
+        self.read_on_thread()
+        self.assertClosed(first)
+        self.assertNotIn(first, [entry[1] for entry in self.db.connections._readers])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base import csv_import
+from data_base.database import Database
+
+
+class CsvImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+        self.csv_path = os.path.join(self.tmp, 'items.csv')
+        with open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
+            f.write('barcode,name,hsn_code,quantity,sgst,cgst,total_price\n')
+            f.write('111,Soap,3401,5,9,9,118\n')
+            f.write('222,Dal ₹ pack,0713,5,2.5,2.5,105\n')
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_counts_rows_actually_inserted(self):
+        with self.db.transaction() as cursor:
+            cursor.execute(csv_import.INSERT_BARCODE_SQL, ('111', 'Soap', '3401', 1, 100, 9, 9, 118))
+        # existing_keys read before the row above was added: the insert is ignored
+        result = csv_import._run_import(
+            self.db, self.csv_path, csv_import.BARCODE_FIELDS, set(),
+            lambda row: ((row['barcode'],), (row['barcode'], row['name'], row['hsn_code'],
+                                             int(row['quantity']), 1.0, 9.0, 9.0, 1.18)),
+            csv_import.INSERT_BARCODE_SQL, csv_import.UPDATE_BARCODE_PRICE_SQL, False, 'Duplicate barcode',
+            csv_import.CHUNK_SIZE, None, None)
+        self.assertEqual((result['added'], result['failed']), (1, 1))
+
+    def test_upsert_and_progress(self):
+        seen = []
+        self.db.import_barcode_items_from_csv(self.csv_path)
+        result = self.db.import_barcode_items_from_csv(self.csv_path, upsert=True,
+                                                       progress=lambda pct, rows: seen.append((pct, rows)))
+        self.assertEqual((result['added'], result['updated'], result['failed']), (0, 2, 0))
+        self.assertEqual(seen[-1], (100, 2))
+        self.assertEqual(self.db.get_barcode_item('222')['name'], 'Dal ₹ pack')
+
+
+if __name__ == '__main__':
+    unittest.main()
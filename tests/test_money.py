@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base import money
+from data_base.database import Database
+
+
+class MoneyTest(unittest.TestCase):
+    def test_to_paise_rounds_half_up(self):
+        self.assertEqual(money.to_paise(0.125), 13)
+        self.assertEqual(money.to_paise('19.995'), 2000)
+        self.assertEqual(money.to_paise(3), 300)
+        self.assertEqual(money.to_paise(None), 0)
+
+    def test_format_rupees(self):
+        self.assertEqual(money.format_rupees(123450), '₹1234.50')
+        self.assertEqual(money.format_rupees(-5), '-₹0.05')
+
+    def test_line_amounts_add_up_to_final(self):
+        base, sgst, cgst, final = money.line_amounts(3, 33.33, 9, 9)
+        self.assertEqual(base + sgst + cgst, final)
+        self.assertEqual(final, 11799)
+
+    def test_item_paise_computes_missing_amounts(self):
+        item = {'quantity': 2, 'base_price': 8.93, 'sgst_percent': 2.5, 'cgst_percent': 2.5}
+        self.assertEqual(money.item_paise(item), (893, 45, 45, 1875))
+
+    def test_item_paise_prefers_stored_amounts(self):
+        item = {'quantity': 1, 'base_price': 10, 'sgst_percent': 5, 'cgst_percent': 5}
+        money.apply_line_amounts(item)
+        self.assertEqual(money.item_paise(item), (1000, 50, 50, 1100))
+        self.assertEqual(money.sum_items([item, item]), {'base': 2000, 'sgst': 100, 'cgst': 100, 'amount': 2200})
+
+
+class SaveBillAmountsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_lines_without_amounts_are_not_stored_as_zero(self):
+        items = [{'name': 'Oil', 'hsn_code': '1511', 'quantity': 2, 'base_price': 8.93,
+                  'sgst_percent': 2.5, 'cgst_percent': 2.5, 'item_type': 'barcode'}]
+        bill_id = self.db.save_bill('Ann', '+919999999999', items, 18.75, 2, 0, 0.45, 0.45)
+        with self.db.read() as cursor:
+            cursor.execute('SELECT final_price_paise, sgst_amount_paise, cgst_amount_paise, final_price '
+                           'FROM bill_items WHERE bill_id = ?', (bill_id,))
+            self.assertEqual(cursor.fetchone(), (1875, 45, 45, 18.75))
+            cursor.execute('SELECT revenue_paise FROM daily_item_sales')
+            self.assertEqual(cursor.fetchone()[0], 1875)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base.database import Database
+from tests.test_backup import save_bill
+
+
+class KeysetPaginationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_pages_cover_every_bill_once_newest_first(self):
+        # Several bills share a timestamp, so the id breaks the tie
+        stamps = ['2024-05-01 10:00:00'] * 3 + ['2024-05-02 09:00:00'] * 2 + ['2024-04-30 18:00:00']
+        ids = [save_bill(self.db, f'Customer {n}', stamp) for n, stamp in enumerate(stamps)]
+        seen = []
+        page = self.db.get_bills_page(limit=2)
+        while page:
+            seen.extend(bill['id'] for bill in page)
+            last = page[-1]
+            page = self.db.get_bills_page(last['created_at'], last['id'], limit=2)
+        expected = [bill_id for _, bill_id in sorted(zip(stamps, ids), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_empty_history(self):
+        self.assertEqual(self.db.get_bills_page(limit=10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import sqlite3
+import unittest
+
+from data_base.query_stats import QueryStats
+
+
+class TimedCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:', isolation_level=None)
+        self.conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+        self.conn.executemany('INSERT INTO t (name) VALUES (?)', [('a',), ('b',), ('c',)])
+        self.stats = QueryStats(enabled=True, slow_ms=0)
+        self.cursor = self.stats.wrap_cursor(self.conn.cursor(), self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_executescript_is_timed(self):
+        self.cursor.executescript('PRAGMA optimize;')
+        self.cursor.close()
+        self.assertEqual([entry['name'] for entry in self.stats.top('sql')], ['PRAGMA optimize;'])
+
+    def test_slow_statement_is_explained_after_it_is_read(self):
+        self.cursor.execute('SELECT name FROM t WHERE id > ? ORDER BY id', (0,))
+        self.assertEqual(self.cursor.fetchone(), ('a',))
+        self.assertEqual(self.cursor.fetchall(), [('b',), ('c',)])
+        self.cursor.close()
+        slow = self.stats.slow_log()
+        self.assertEqual(len(slow), 1)
+        self.assertTrue(slow[0]['plan'])
+        self.assertFalse(slow[0]['plan'][0].startswith('(no plan'))
+
+
+if __name__ == '__main__':
+    unittest.main()
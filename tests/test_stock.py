@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base.database import Database
+
+
+class StockLedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp, 'billing.db'))
+        self.db.add_barcode_item('8901', 'Kit Kat', '1806', 1, 20.0, 9, 9)
+        self.item = self.db.get_barcode_item('8901')
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def sell(self, quantity):
+        items = [{'name': 'Kit Kat', 'hsn_code': '1806', 'quantity': quantity, 'base_price': 16.95,
+                  'sgst_percent': 9, 'cgst_percent': 9, 'item_type': 'barcode', 'item_ref_id': self.item['id']}]
+        return self.db.save_bill('Ann', '', items, 20.0 * quantity, quantity, 0, 1.53, 1.53)
+
+    def test_sales_are_recorded_in_the_ledger(self):
+        bill_id = self.sell(1)
+        self.assertEqual(self.db.get_barcode_item('8901')['quantity'], 0)
+        movements = self.db.get_stock_movements('barcode', self.item['id'])
+        self.assertEqual([(m['reason'], m['delta'], m['bill_id']) for m in movements],
+                         [('sale', -1, bill_id), ('opening', 1, None)])
+
+    def test_stock_may_go_negative_so_checkout_is_never_blocked(self):
+        self.sell(2)
+        self.assertEqual(self.db.get_barcode_item('8901')['quantity'], -1)
+        lowest = self.db.get_low_stock()[0]
+        self.assertEqual((lowest['id'], lowest['quantity']), (self.item['id'], -1))
+
+    def test_rebuild_restores_quantities_from_the_ledger(self):
+        self.sell(1)
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE stock_ledger_state SET reason = 'rebuild' WHERE id = 1")
+            cursor.execute('UPDATE barcode_items SET quantity = 50 WHERE id = ?', (self.item['id'],))
+            cursor.execute("UPDATE stock_ledger_state SET reason = 'adjust' WHERE id = 1")
+        self.assertEqual(self.db.rebuild_stock(), 1)
+        self.assertEqual(self.db.get_barcode_item('8901')['quantity'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
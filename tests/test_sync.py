@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_base import sync
+from data_base.database import Database
+from data_base.sync_client import SyncClient
+from data_base.sync_server import SyncServer
+from tests.test_backup import save_bill
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmp, 'server'))
+        os.mkdir(os.path.join(self.tmp, 'counter'))
+        self.server_db = Database(os.path.join(self.tmp, 'server', 'billing.db'))
+        self.counter_db = Database(os.path.join(self.tmp, 'counter', 'billing.db'))
+        self.server_db.set_counter_id(0)
+        self.counter_db.set_counter_id(3)
+        self.server = SyncServer(self.server_db, port=0)
+        self.server.start_in_thread()
+        self.client = SyncClient(self.counter_db, f'http://127.0.0.1:{self.server.port}')
+
+    def tearDown(self):
+        self.server.stop(timeout=5)
+        self.counter_db.close()
+        self.server_db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_counters_stride_their_bill_ids(self):
+        counter_ids = [save_bill(self.counter_db, f'C{n}') for n in range(3)]
+        server_ids = [save_bill(self.server_db, f'S{n}') for n in range(2)]
+        self.assertTrue(all(bill_id % sync.BILL_ID_STRIDE == 3 for bill_id in counter_ids))
+        self.assertTrue(all(bill_id % sync.BILL_ID_STRIDE == 0 for bill_id in server_ids))
+        self.assertEqual(counter_ids[1] - counter_ids[0], sync.BILL_ID_STRIDE)
+
+    def test_push_bills_and_pull_catalog(self):
+        self.server_db.add_barcode_item('8901', 'Kit Kat', '1806', 10, 20.0, 9, 9)
+        bill_ids = [save_bill(self.counter_db, f'C{n}') for n in range(2)]
+        self.assertEqual(self.counter_db.count_unpushed_bills(), 2)
+
+        result = self.client.sync_once()
+        self.assertEqual(result['pushed'], 2)
+        self.assertEqual(self.counter_db.count_unpushed_bills(), 0)
+        self.assertEqual([self.server_db.get_bill_by_id(bill_id)['customer_name'] for bill_id in bill_ids],
+                         ['C0', 'C1'])
+        self.assertEqual(self.counter_db.get_barcode_item('8901')['name'], 'Kit Kat')
+
+        # Nothing new either way on the next round
+        self.assertEqual(self.client.sync_once(), {'pushed': 0, 'inventory_changes': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()